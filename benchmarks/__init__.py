@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks
+~~~~~~~~~~
+
+This is the benchmark package of zkb.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
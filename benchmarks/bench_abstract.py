@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_abstract
+~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of generating abstract and full body of articles with MORE
+separator, comparing separate conversions with a single pass.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import timeit
+
+from zkb.bodygenerators import BodyGenerator
+from zkb.bodygenerators import MarkdownBodyGenerator
+
+
+_ARTICLES = 100
+
+_SECTION = u'\n\n'.join([
+    u'Some *emphasized* text with a [link](http://example.com/).',
+    u'    ::code lang:python\n'
+    u'    def main():\n'
+    u'        for i in range(10):\n'
+    u'            print i\n'
+    u'        return 0',
+    u'- item 1\n- item 2\n- item 3'])
+
+
+def _time(generate, abstract, body):
+    start = timeit.default_timer()
+    for _ in xrange(_ARTICLES):
+        generate(abstract, body, base='.', url='/')
+    return (timeit.default_timer() - start) * 1000.0 / _ARTICLES
+
+
+def run():
+    generator = MarkdownBodyGenerator()
+
+    def _separate(abstract, body, **options):
+        return BodyGenerator.generate_with_abstract(
+            generator, abstract, body, **options)
+
+    for sections in (1, 5, 20):
+        abstract = u'\n\n'.join([_SECTION] * sections) + u'\n'
+        body = abstract + u'\n' + _SECTION
+        separate_time = _time(_separate, abstract, body)
+        single_time = _time(generator.generate_with_abstract, abstract, body)
+        print('%2d sections in abstract: separate %.3f ms, single pass '
+              '%.3f ms' % (sections, separate_time, single_time))
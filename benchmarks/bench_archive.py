@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_archive
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of rendering the archive and all tag archives of a large site,
+comparing filtering all articles by tag and year in the template with
+passing articles grouped by year to it.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import datetime
+import timeit
+
+from zkb.builder import DefaultSiteBuilder
+from zkb.config import SiteConfig, ArticleConfig
+
+
+_ARTICLES = 10000
+_TAGS = 500
+_TAGS_PER_ARTICLE = 3
+
+#: Loop of the archive template filtering all articles for each page.
+_FILTERING_TEMPLATE = u'''
+          {% set current_year = '' %}
+          {% for article in site.articles_by_date %}
+            {% if (tag | length == 0) or (tag in article.tags) %}
+              {% set article_year = article.date | date('year') %}
+              {% if article_year != current_year %}
+                {% set current_year = article_year %}
+          <h2 class="year">{{ current_year }}</h2>
+              {% endif %}
+          <h1><a href="{{ article.url }}">{{ article.title }}</a></h1>
+            {% endif %}
+          {% endfor %}
+'''
+
+#: Loop of the archive template using articles grouped by year.
+_GROUPED_TEMPLATE = u'''
+          {% for year, articles in archive %}
+          <h2 class="year">{{ articles[0].date | date('year') }}</h2>
+            {% for article in articles %}
+          <h1><a href="{{ article.url }}">{{ article.title }}</a></h1>
+            {% endfor %}
+          {% endfor %}
+'''
+
+
+def _create_config():
+    config = SiteConfig({'url': 'example.com/blog/'})
+    config.template_cache = False
+    config.special_articles = {}
+    config.articles_by_date = []
+    config.articles_by_tag = {}
+    start = datetime.datetime(2014, 1, 1)
+    for i in xrange(_ARTICLES):
+        article = ArticleConfig(config)
+        article.title = u'Article %d' % i
+        article.url = u'/blog/article-%d/' % i
+        article.date = start - datetime.timedelta(hours=i * 8)
+        article.tags = [u'tag%d' % ((i + j * 7) % _TAGS)
+                        for j in range(_TAGS_PER_ARTICLE)]
+        config.articles_by_date.append(article)
+        for tag in article.tags:
+            config.articles_by_tag.setdefault(tag, []).append(article)
+    return config
+
+
+def _time(template, pages):
+    start = timeit.default_timer()
+    for page in pages:
+        u''.join(template.generate(page.context))
+    return timeit.default_timer() - start
+
+
+def run():
+    builder = DefaultSiteBuilder(_create_config())
+    start = timeit.default_timer()
+    pages = builder._get_archive_pages()
+    grouping_time = timeit.default_timer() - start
+    env = builder.archive_template.environment
+    filtering_time = _time(env.from_string(_FILTERING_TEMPLATE), pages)
+    grouped_time = _time(env.from_string(_GROUPED_TEMPLATE), pages)
+    print('%d articles, %d tags, %d archive pages: filtered in template '
+          '%.2f s, grouped by year %.2f s (grouping %.2f s)' %
+          (_ARTICLES, _TAGS, len(pages), filtering_time,
+           grouped_time + grouping_time, grouping_time))
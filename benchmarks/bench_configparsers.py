@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_configparsers
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of parsing typical article headers with different parsers.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import json
+import timeit
+
+from zkb.configparsers import (YamlConfigParser, JsonConfigParser,
+                               KeyValueConfigParser)
+
+
+_HEADER = {
+    'title': 'A Typical Article Title',
+    'date': '2014-06-01',
+    'author': 'Someone',
+    'tag': 'benchmark, header, parser',
+    'article_type': 'post',
+    'more_separator': '--MORE--'
+}
+
+_REPEAT = 2000
+
+
+def _get_key_value_header():
+    return u''.join(u"%s: '%s'\n" % (key, value)
+                    for key, value in sorted(_HEADER.items()))
+
+
+def run():
+    key_value = _get_key_value_header()
+    parsers = [('YAML (pure Python)', YamlConfigParser(use_libyaml=False),
+                key_value),
+               ('YAML (LibYAML)', YamlConfigParser(), key_value),
+               ('key/value', KeyValueConfigParser(), key_value),
+               ('JSON', JsonConfigParser(), json.dumps(_HEADER).decode())]
+    for name, parser, header in parsers:
+        start = timeit.default_timer()
+        for _ in xrange(_REPEAT):
+            parser.parse(header)
+        elapsed = (timeit.default_timer() - start) * 1000.0 / _REPEAT
+        print('%-18s %.4f ms per header' % (name + ':', elapsed))
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_git_changes
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of incremental builds after checking out sources, which resets
+modification time of all of them. All articles have dates in their headers.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import timeit
+
+from zkb.builder import SiteBuilder
+from zkb.config import SiteConfig
+from zkb.manifest import BuildManifest, MANIFEST_FILE
+
+
+_ARTICLES = 1000
+
+
+class _ArticleOnlySiteBuilder(SiteBuilder):
+    def _do_build(self):
+        return 0
+
+
+def _create_builder(dirname, use_git):
+    config = SiteConfig()
+    config.article_dir = dirname
+    config.output_dir = os.path.join(dirname, '_site')
+    config.cache_dir = os.path.join(dirname, '_cache')
+    config.body_cache_size = 0
+    config.highlight_cache_size = 0
+    manifest = BuildManifest.load(
+        os.path.join(config.cache_dir, MANIFEST_FILE), config)
+    return _ArticleOnlySiteBuilder(config, manifest=manifest,
+                                   use_git=use_git)
+
+
+def _git(dirname, *args):
+    with open(os.devnull, 'wb') as devnull:
+        subprocess.check_call(('git',) + args, cwd=dirname, stdout=devnull)
+
+
+def _run(repeat):
+    dirname = tempfile.mkdtemp()
+    try:
+        for i in xrange(_ARTICLES):
+            # Articles are dated explicitly, as articles dated by
+            # modification time are always checked.
+            with open(os.path.join(dirname, '%d.md' % i), 'wb') as f:
+                f.write('title: Article %d\ndate: 2014-01-01\n\n%s\n' %
+                        (i, 'Content. ' * repeat))
+        with open(os.path.join(dirname, '.gitignore'), 'wb') as f:
+            f.write('_site\n_cache\n')
+        _git(dirname, 'init', '-q', '.')
+        _git(dirname, 'add', '.')
+        _git(dirname, '-c', 'user.name=Benchmark',
+             '-c', 'user.email=benchmark@example.com',
+             'commit', '-q', '-m', 'Initial commit')
+        for use_git in (False, True):
+            _create_builder(dirname, use_git).build()
+            for i in xrange(_ARTICLES):
+                os.remove(os.path.join(dirname, '%d.md' % i))
+            _git(dirname, 'checkout', '-q', '--', '.')
+            # Wait and refresh the index, so that git does not compare
+            # content of files checked out in the same second as the index
+            # was written, as if the checkout happened a while ago.
+            time.sleep(1.1)
+            _git(dirname, 'update-index', '-q', '--refresh')
+            # Only finding changed articles is measured, excluding loading
+            # and saving the manifest.
+            builder = _create_builder(dirname, use_git)
+            start = timeit.default_timer()
+            builder._load_articles(builder._get_article_files())
+            elapsed = (timeit.default_timer() - start) * 1000.0
+            print('%d articles of %d KB checked out, %s: %.1f ms' %
+                  (_ARTICLES, repeat * 9 // 1024,
+                   'git' if use_git else 'stat and hash', elapsed))
+    finally:
+        shutil.rmtree(dirname)
+
+
+def run():
+    for repeat in (200, 8000):
+        _run(repeat)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_gutter
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of generating line number gutter and marked lines of large code
+blocks.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import timeit
+
+from zkb.mdext.codeblock import CodeBlockPygmentsHtmlFormatter
+
+
+def _time(lines, hl_lines):
+    formatter = CodeBlockPygmentsHtmlFormatter(linenos=True,
+                                               hl_lines=hl_lines)
+    source = [(1, '<span>line</span>\n')] * lines
+    start = timeit.default_timer()
+    if formatter.hl_lines:
+        source = formatter._highlight_lines(source)
+    for _ in formatter._wrap_tablelinenos(source):
+        pass
+    return (timeit.default_timer() - start) * 1000.0
+
+
+def run():
+    for lines in (1000, 10000, 50000):
+        # Mark every other 10 lines.
+        marks = [i for i in range(1, lines + 1) if (i // 10) % 2 == 1]
+        print('%5d lines: no marks %.3f ms, %d marked lines %.3f ms' %
+              (lines, _time(lines, []), len(marks), _time(lines, marks)))
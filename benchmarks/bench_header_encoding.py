@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_header_encoding
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of reading headers of different length without encoding specified.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import io
+import timeit
+
+from zkb.readers import YamlHeaderedContentReader
+
+
+def _create_content(lines):
+    header = u''.join(u'key%d: value %d\n' % (i, i) for i in range(lines))
+    return (header + u'\nContent.\n').encode('utf-8')
+
+
+def run():
+    reader = YamlHeaderedContentReader()
+    for lines in (5, 50, 500):
+        content = _create_content(lines)
+        repeat = max(1, 500 // lines)
+        start = timeit.default_timer()
+        for _ in xrange(repeat):
+            reader.read(io.BytesIO(content))
+        elapsed = (timeit.default_timer() - start) * 1000.0 / repeat
+        print('%3d header lines: %.3f ms' % (lines, elapsed))
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_highlight_cache
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of generating a code-heavy article, comparing highlighting every
+code block with reading them from the persistent highlight cache.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import shutil
+import tempfile
+import timeit
+
+from zkb.bodygenerators import MarkdownBodyGenerator
+from zkb.cache import DiskCache
+
+
+_BLOCKS = 50
+
+_BLOCK = (u'    ::code lang:python mark:2-3\n' +
+          u''.join(u'    def function_%d(argument):\n'
+                   u'        return argument * %d\n' % (i, i)
+                   for i in range(20)))
+
+
+def _time(generator, body):
+    start = timeit.default_timer()
+    generator.generate(body, base='.', url='/')
+    return (timeit.default_timer() - start) * 1000.0
+
+
+def run():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        body = u'\n\n'.join(u'Paragraph %d.\n\n' % i + _BLOCK.replace(
+            u'argument', u'argument%d' % i) for i in range(_BLOCKS))
+        cache = DiskCache(cache_dir, 64 * 1024 * 1024)
+        cold_time = _time(MarkdownBodyGenerator(highlight_cache=cache), body)
+        warm_time = _time(MarkdownBodyGenerator(highlight_cache=cache), body)
+        print('article of %d code blocks: highlighted %.3f ms, from '
+              'persistent cache %.3f ms' % (_BLOCKS, cold_time, warm_time))
+    finally:
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_markdown_engine
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of per-article setup overhead of Markdown body generator, comparing
+a new generator for each article with a reused one.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import timeit
+
+from zkb.bodygenerators import MarkdownBodyGenerator
+
+
+_ARTICLES = 500
+
+_EMPTY_BODY = u''
+
+_TYPICAL_BODY = u'\n\n'.join([
+    u'Some *emphasized* text with a [link](http://example.com/).',
+    u'    ::code lang:python\n'
+    u'    def main():\n'
+    u'        return 0',
+    u'- item 1\n- item 2\n- item 3',
+    u'More text with `inline code`.'])
+
+
+def _time(generate, body):
+    start = timeit.default_timer()
+    for _ in xrange(_ARTICLES):
+        generate(body)
+    return (timeit.default_timer() - start) * 1000.0 / _ARTICLES
+
+
+def run():
+    def _fresh(body):
+        MarkdownBodyGenerator().generate(body, base='.', url='/')
+
+    reused = MarkdownBodyGenerator()
+
+    def _reused(body):
+        reused.generate(body, base='.', url='/')
+
+    for name, body in (('empty', _EMPTY_BODY), ('typical', _TYPICAL_BODY)):
+        fresh_time = _time(_fresh, body)
+        reused_time = _time(_reused, body)
+        print('%-8s article: new generator %.3f ms, reused generator '
+              '%.3f ms, setup overhead %.3f ms' %
+              (name, fresh_time, reused_time, fresh_time - reused_time))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_preview
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of showing one article of a large site, by building the whole site
+and by rendering pages on demand.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import timeit
+
+from zkb.builder import DefaultSiteBuilder, PreviewSiteBuilder
+from zkb.config import SiteConfig
+from zkb.log import logger, Logger
+
+
+_ARTICLES = 2000
+
+_ARTICLE = '''title: Article %d
+date: 2014-01-01 %02d:%02d:00
+tags: tag%d
+
+Paragraph with *emphasis* and a [link](http://example.com/).
+
+```python
+def function():
+    return %d
+```
+'''
+
+
+def _create_config(dirname):
+    config = SiteConfig({'url': 'example.com/blog/'})
+    config.article_dir = dirname
+    config.output_dir = os.path.join(dirname, '_site')
+    config.cache_dir = os.path.join(dirname, '_cache')
+    config.body_cache_size = 0
+    config.highlight_cache_size = 0
+    return config
+
+
+def run():
+    dirname = tempfile.mkdtemp()
+    level = logger.level
+    logger.level = Logger.LOG_WARN
+    try:
+        for i in xrange(_ARTICLES):
+            with open(os.path.join(dirname, '%d.md' % i), 'wb') as f:
+                f.write(_ARTICLE % (i, i // 60 % 24, i % 60, i % 50, i))
+        start = timeit.default_timer()
+        DefaultSiteBuilder(_create_config(dirname)).build()
+        elapsed = timeit.default_timer() - start
+        print('%d articles, building all pages:     %.2f s' %
+              (_ARTICLES, elapsed))
+        start = timeit.default_timer()
+        builder = PreviewSiteBuilder(_create_config(dirname))
+        builder.load()
+        builder.render('/blog/2014/01/01/article-0/')
+        elapsed = timeit.default_timer() - start
+        print('%d articles, rendering one on demand: %.2f s' %
+              (_ARTICLES, elapsed))
+    finally:
+        logger.level = level
+        shutil.rmtree(dirname)
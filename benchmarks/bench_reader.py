@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_reader
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of reading large articles, comparing reading at byte level with
+reading line by line.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import io
+import timeit
+
+from zkb.readers import YamlHeaderedContentReader
+
+
+def _create_content(lines, encoding):
+    header = u'title: 文章\ndate: 2014-01-01\ntags: [a, b]\n'
+    if encoding != 'utf-8':
+        header = u'encoding: %s\n' % encoding + header
+    body = u''.join(u'这是第%d行。Line %d of the article.\n' % (i, i)
+                    for i in range(lines))
+    return (header + u'\n' + body + u'--MORE--\n' + body).encode(encoding)
+
+
+def _time(read, content):
+    start = timeit.default_timer()
+    read(io.BytesIO(content), True, None)
+    return (timeit.default_timer() - start) * 1000.0
+
+
+def run():
+    reader = YamlHeaderedContentReader()
+    for encoding in ('utf-8', 'gb18030'):
+        for lines in (1000, 10000, 100000):
+            content = _create_content(lines, encoding)
+            print('%-7s %6d lines (%5d KB): line by line %.3f ms, byte level '
+                  '%.3f ms' % (encoding, lines * 2, len(content) // 1024,
+                               _time(reader._read_lines, content),
+                               _time(reader._read_bytes, content)))
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_resource_copy
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of writing resources used in articles into the output directory,
+comparing copying them in every build, skipping existing ones and hard
+linking new ones.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import timeit
+
+from zkb.builder import FileProcessor
+
+
+_RESOURCES = 100
+_RESOURCE_SIZE = 2 * 1024 * 1024
+
+
+def _time(copy, sources, dest_dir):
+    start = timeit.default_timer()
+    for source in sources:
+        copy(source, os.path.join(dest_dir, os.path.basename(source)))
+    return (timeit.default_timer() - start) * 1000.0
+
+
+def run():
+    dirname = tempfile.mkdtemp()
+    try:
+        sources = []
+        for i in range(_RESOURCES):
+            sources.append(os.path.join(dirname, 'image%d.png' % i))
+            with open(sources[-1], 'wb') as f:
+                f.write(os.urandom(_RESOURCE_SIZE))
+        fileproc = FileProcessor()
+        dest_dir = os.path.join(dirname, 'copied')
+        copy_time = _time(fileproc.copy_file, sources, dest_dir)
+        copy_again_time = _time(fileproc.copy_file, sources, dest_dir)
+        skip_time = _time(fileproc.copy_resource, sources, dest_dir)
+        fileproc = FileProcessor(link_resources=True)
+        link_time = _time(fileproc.copy_resource, sources,
+                          os.path.join(dirname, 'linked'))
+        print('%d resources of %d MB: copied %.3f ms, copied again %.3f ms, '
+              'existing skipped %.3f ms, linked %.3f ms' %
+              (_RESOURCES, _RESOURCE_SIZE // (1024 * 1024), copy_time,
+               copy_again_time, skip_time, link_time))
+    finally:
+        shutil.rmtree(dirname)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_resource_hash
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of generating articles embedding the same large images, comparing
+hashing referenced files every time with the site-wide file hash cache, both
+in a fresh build and with hashes persisted by a previous build.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import os
+import multiprocessing
+import shutil
+import tempfile
+import timeit
+
+from zkb.bodygenerators import MarkdownBodyGenerator
+from zkb.cache import FileHashCache
+
+
+_ARTICLES = 200
+_IMAGES = 4
+_IMAGE_SIZE = 4 * 1024 * 1024
+
+
+def _time(create_cache, body, base):
+    start = timeit.default_timer()
+    generator = MarkdownBodyGenerator(hash_cache=create_cache())
+    for _ in range(_ARTICLES):
+        generator.generate(body, base=base, url='/')
+    if generator.hash_cache is not None:
+        generator.hash_cache.save()
+    return (timeit.default_timer() - start) * 1000.0
+
+
+def run():
+    dirname = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    # References are resolved against current directory, as in a build.
+    os.chdir(dirname)
+    try:
+        for i in range(_IMAGES):
+            with open(os.path.join(dirname, 'image%d.png' % i), 'wb') as f:
+                f.write(os.urandom(_IMAGE_SIZE))
+        base = os.path.join(dirname, 'article.md')
+        open(base, 'wb').close()
+        body = u'\n\n'.join(u'Screenshot %d:\n\n![image](image%d.png)' %
+                            (i, i) for i in range(_IMAGES))
+        cache_file = os.path.join(dirname, 'hashes.pickle')
+        plain_time = _time(lambda: None, body, base)
+        serial_time = _time(lambda: FileHashCache(threads=1), body, base)
+        threaded_time = _time(lambda: FileHashCache(cache_file), body, base)
+        persisted_time = _time(lambda: FileHashCache(cache_file), body, base)
+        print('%d articles embedding %d images of %d MB: hashed every time '
+              '%.3f ms, memo %.3f ms, memo on %d threads %.3f ms, persisted '
+              'memo %.3f ms' % (_ARTICLES, _IMAGES,
+                                _IMAGE_SIZE // (1024 * 1024), plain_time,
+                                serial_time, multiprocessing.cpu_count(),
+                                threaded_time, persisted_time))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(dirname)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_template_cache
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of loading all templates of the default theme when a builder is
+created, comparing compiling them with reading them from the persistent
+template cache.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import timeit
+
+from zkb.builder import DefaultSiteBuilder
+from zkb.config import SiteConfig
+
+
+_RUNS = 20
+
+
+def _time(config):
+    start = timeit.default_timer()
+    for _ in range(_RUNS):
+        env = DefaultSiteBuilder(config).archive_template.environment
+        for name in env.list_templates(extensions=['html']):
+            env.get_template(name)
+    return (timeit.default_timer() - start) * 1000.0 / _RUNS
+
+
+def run():
+    dirname = tempfile.mkdtemp()
+    try:
+        config = SiteConfig({'url': 'example.com/blog/'})
+        config.template_dir = os.path.join(dirname, '_template')
+        config.cache_dir = os.path.join(dirname, '_cache')
+        config.template_cache = False
+        compile_time = _time(config)
+        config.template_cache = True
+        # Fill the cache
+        _time(config)
+        cache_time = _time(config)
+        print('loading default templates: compiled %.3f ms, from persistent '
+              'cache %.3f ms' % (compile_time, cache_time))
+    finally:
+        shutil.rmtree(dirname)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_template_resources
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of writing unchanged template resources again, comparing copying
+and writing whole streams in every build with syncing them.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import timeit
+
+from zkb.builder import FileProcessor
+
+
+_RESOURCES = 50
+_RESOURCE_SIZE = 1024 * 1024
+
+
+def _time(func, sources, dest_dir):
+    start = timeit.default_timer()
+    for source in sources:
+        func(source, os.path.join(dest_dir, os.path.basename(source)))
+    return (timeit.default_timer() - start) * 1000.0
+
+
+def run():
+    dirname = tempfile.mkdtemp()
+    try:
+        sources = []
+        for i in range(_RESOURCES):
+            sources.append(os.path.join(dirname, 'image%d.jpg' % i))
+            with open(sources[-1], 'wb') as f:
+                f.write(os.urandom(_RESOURCE_SIZE))
+        fileproc = FileProcessor()
+        dest_dir = os.path.join(dirname, 'out')
+
+        def _write_stream(source, dest):
+            with open(source, 'rb') as stream:
+                fileproc.write_stream(dest, stream)
+
+        def _sync_stream(source, dest):
+            with open(source, 'rb') as stream:
+                fileproc.sync_stream(dest, stream)
+
+        _time(fileproc.copy_file, sources, dest_dir)
+        copy_time = _time(fileproc.copy_file, sources, dest_dir)
+        stream_time = _time(_write_stream, sources, dest_dir)
+        sync_stream_time = _time(_sync_stream, sources, dest_dir)
+        # Modification time of destinations is synced on first run.
+        _time(fileproc.sync_file, sources, dest_dir)
+        sync_file_time = _time(fileproc.sync_file, sources, dest_dir)
+        print('%d unchanged resources of %d MB: copied %.3f ms, written '
+              'from streams %.3f ms, synced streams %.3f ms, synced files '
+              '%.3f ms' % (_RESOURCES, _RESOURCE_SIZE // (1024 * 1024),
+                           copy_time, stream_time, sync_stream_time,
+                           sync_file_time))
+    finally:
+        shutil.rmtree(dirname)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_walker
+~~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of finding article files in a tree with large ignored directories.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import timeit
+
+from zkb.builder import FileProcessor
+from zkb.config import SiteConfig
+
+
+def _create_files(dirname, dirs, files, extension):
+    for i in xrange(dirs):
+        subdir = os.path.join(dirname, '%02x' % i)
+        os.makedirs(subdir)
+        for j in xrange(files):
+            open(os.path.join(subdir, '%d%s' % (j, extension)), 'wb').close()
+
+
+def _walk_all(dirname, ignored_dirs):
+    """Walk the tree the way it was done before, entering every directory and
+    checking it against all ignored directories.
+    """
+    ignored_dirs = [os.path.realpath(path) for path in ignored_dirs]
+    count = 0
+    for root, _, files in os.walk(dirname):
+        real_path = os.path.realpath(root)
+        for ignored_dir in ignored_dirs:
+            relative = os.path.relpath(real_path, ignored_dir)
+            if relative == os.curdir or relative.startswith(os.pardir):
+                break
+        for filename in files:
+            os.path.getmtime(os.path.join(root, filename))
+            count += 1
+    return count
+
+
+def run():
+    dirname = tempfile.mkdtemp()
+    try:
+        _create_files(os.path.join(dirname, '.git', 'objects'), 256, 40, '')
+        _create_files(os.path.join(dirname, '_site'), 100, 20, '.html')
+        _create_files(os.path.join(dirname, 'posts'), 10, 50, '.md')
+        config = SiteConfig()
+        ignored_dirs = [os.path.join(dirname, config.output_dir),
+                        os.path.join(dirname, config.cache_dir)]
+        fileproc = FileProcessor()
+        for name, func in (
+                ('os.walk', lambda: _walk_all(dirname, ignored_dirs)),
+                ('walk_files', lambda: fileproc.get_article_files(
+                    dirname, ignored_dirs, config.ignored_files))):
+            start = timeit.default_timer()
+            func()
+            elapsed = (timeit.default_timer() - start) * 1000.0
+            print('%-11s %.1f ms' % (name + ':', elapsed))
+    finally:
+        shutil.rmtree(dirname)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks.bench_watch
+~~~~~~~~~~~~~~~~~~~~~~
+
+Benchmark of building again after an article is changed, in a new process as
+`zkb build` does and in current process as `zkb build --watch` does.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+from __future__ import print_function
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import zkb
+from zkb.builder import SiteBuilder
+from zkb.config import SiteConfig
+from zkb.manifest import BuildManifest, MANIFEST_FILE
+from zkb.log import logger, Logger
+
+
+_ARTICLES = 200
+
+_ARTICLE = '''title: Article %d
+date: 2014-01-01 00:00:%02d
+tags: tag%d
+
+Paragraph with *emphasis* and a [link](http://example.com/).
+
+```python
+def function():
+    return %d
+```
+'''
+
+
+def _write_article(dirname, index, extra=''):
+    with open(os.path.join(dirname, '%d.md' % index), 'wb') as f:
+        f.write(_ARTICLE % (index, index % 60, index % 10, index) + extra)
+
+
+def run():
+    dirname = tempfile.mkdtemp()
+    level = logger.level
+    logger.level = Logger.LOG_WARN
+    try:
+        with open(os.path.join(dirname, '_config.yml'), 'wb') as f:
+            f.write('url: example.com/blog/\n')
+        for i in xrange(_ARTICLES):
+            _write_article(dirname, i)
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.dirname(os.path.dirname(zkb.__file__))
+        command = (sys.executable, '-W', 'ignore', '-m', 'zkb', 'build')
+        with open(os.devnull, 'wb') as devnull:
+            subprocess.check_call(command, cwd=dirname, env=env,
+                                  stdout=devnull)
+            _write_article(dirname, 0, 'Changed.\n')
+            start = timeit.default_timer()
+            subprocess.check_call(command, cwd=dirname, env=env,
+                                  stdout=devnull)
+            elapsed = (timeit.default_timer() - start) * 1000.0
+        print('new process:     %.1f ms' % elapsed)
+        cwd = os.getcwd()
+        os.chdir(dirname)
+        try:
+            config = SiteConfig({'url': 'example.com/blog/'})
+            manifest = BuildManifest.load(
+                os.path.join(config.cache_dir, MANIFEST_FILE), config)
+            builder = SiteBuilder.from_config(config, manifest=manifest)
+            builder.build()
+            _write_article(dirname, 0, 'Changed again.\n')
+            start = timeit.default_timer()
+            builder.reload([os.path.realpath('0.md')])
+            builder.build()
+            elapsed = (timeit.default_timer() - start) * 1000.0
+        finally:
+            os.chdir(cwd)
+        print('current process: %.1f ms' % elapsed)
+    finally:
+        logger.level = level
+        shutil.rmtree(dirname)
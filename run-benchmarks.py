@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+run-benchmarks.py
+~~~~~~~~~~~~~~~~~
+
+This is the script for running benchmarks of ZKB. Names of benchmarks to run
+can be given as arguments, e.g. ``python run-benchmarks.py markdown_engine``;
+all benchmarks are run if no name is given.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import os
+import sys
+import importlib
+
+if __name__ == '__main__':
+    names = sys.argv[1:]
+    if len(names) == 0:
+        names = sorted(
+            filename[len('bench_'):-len('.py')]
+            for filename in os.listdir('benchmarks')
+            if filename.startswith('bench_') and filename.endswith('.py'))
+    for name in names:
+        module = importlib.import_module('benchmarks.bench_' + name)
+        print('== %s ==' % name)
+        module.run()
@@ -19,7 +19,7 @@ setup(name='zkb',
       author='Yang LIU',
       author_email='zesikliu@gmail.com',
       license='BSD',
-      packages=find_packages(exclude=['test', 'test.*']),
+      packages=find_packages(exclude=['test', 'test.*', 'benchmarks']),
       include_package_data=True,
       install_requires=[
           'pyyaml',
@@ -27,6 +27,9 @@ setup(name='zkb',
           'pygments',
           'jinja2',
           'python-slugify'],
+      extras_require={
+          'scandir': ['scandir'],
+          'watch': ['pyinotify']},
       classifiers=[
           'Development Status :: 3 - Alpha',
           'Environment :: Console',
@@ -1,3 +1,4 @@
+# -*- coding: utf-8 -*-
 """
 test.test_builder
 ~~~~~~~~~~~~~~~~~
@@ -11,14 +12,52 @@ This is the unit test file for site builder.
 import unittest
 import datetime
 import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
 
-from zkb.builder import FileProcessor, SiteBuilder
+import jinja2
+
+import zkb.builder
+from zkb.builder import FileProcessor, SiteBuilder, PreviewSiteBuilder
+from zkb.builder import DefaultSiteBuilder, OutputPage
 from zkb.config import SiteConfig
+from zkb.manifest import BuildManifest
+from zkb.readers import YamlHeaderedContentReader
+from zkb.builder import _get_package_resources
+from zkb import walker
+
+
+def _create_config(site_builder=None, cache_dir=None):
+    """Create site configuration for building a site in tests.
+
+    :param site_builder: name of the site builder class in this module, or
+        None to use the default site builder.
+    :type site_builder: str
+    :param cache_dir: temporary cache directory, or None if all caches
+        should be disabled.
+    :type cache_dir: str
+    :rtype: SiteConfig
+    """
+    config = SiteConfig()
+    if site_builder is not None:
+        config.site_builder = 'test.test_builder/' + site_builder
+    if cache_dir is None:
+        config.body_cache_size = 0
+        config.highlight_cache_size = 0
+        config.file_hash_cache = False
+        config.template_cache = False
+    else:
+        config.cache_dir = cache_dir
+    return config
 
 
 class TestSiteBuilder(unittest.TestCase):
     class MockFileProcessor(FileProcessor):
-        def get_article_files(self, dirname, ignored_dirs=None):
+        def get_article_files(self, dirname, ignored_dirs=None,
+                              ignored_patterns=None):
             return [('article1.md', 'article1', datetime.datetime(2002, 1, 5),
                      'yaml', None),
                     ('article2.md', 'article2', datetime.datetime(2002, 2, 1),
@@ -28,6 +67,8 @@ class TestSiteBuilder(unittest.TestCase):
                     ('about.md', 'about', datetime.datetime(2002, 3, 1),
                      'yaml', None),
                     ('404.html', '404', datetime.datetime(2002, 3, 1),
+                     'yaml', None),
+                    ('draft.md', 'draft', datetime.datetime(2002, 4, 1),
                      'yaml', None)]
 
         def read(self, filename):
@@ -54,6 +95,11 @@ class TestSiteBuilder(unittest.TestCase):
                         u'article_type: 404\n'
                         u'url: /404.html\n'
                         u'\nNot Found')
+            elif filename == 'draft.md':
+                data = (u'title: Draft\n'
+                        u'draft: true\n'
+                        u'tags: tag4\n'
+                        u'\nDraft content')
             else:
                 data = ''
             output.write(data.encode('utf-8', 'replace'))
@@ -68,6 +114,15 @@ class TestSiteBuilder(unittest.TestCase):
         def copy_file(self, source, destination):
             pass
 
+        def copy_resource(self, source, destination):
+            pass
+
+        def sync_file(self, source, destination):
+            pass
+
+        def sync_stream(self, filename, stream):
+            pass
+
         def exists(self, file):
             return True
 
@@ -76,9 +131,7 @@ class TestSiteBuilder(unittest.TestCase):
             return self.config
 
     def test_site_builder(self):
-        config = SiteConfig()
-        config.site_builder = "test.test_builder/" \
-                              "TestSiteBuilder.MockSiteBuilder"
+        config = _create_config('TestSiteBuilder.MockSiteBuilder')
         config = SiteBuilder.from_config(
             config, TestSiteBuilder.MockFileProcessor()).build()
         self.assertEqual(len(config.articles_by_date), 3,
@@ -113,3 +166,543 @@ class TestSiteBuilder(unittest.TestCase):
                          'title of about article should be About')
         self.assertEqual(config.special_articles['404'].title, 'Not Found',
                          'title of 404 article should be Not Found')
+
+    def test_draft_skipped(self):
+        class RecordingFileProcessor(TestSiteBuilder.MockFileProcessor):
+            def __init__(self):
+                self.written = []
+
+            def write_chunks(self, filename, encoding, chunks):
+                self.written.append(filename)
+                return True
+
+        class RecordingGenerator(object):
+            def __init__(self, generator):
+                self.generator = generator
+
+            def generate(self, body, **options):
+                payloads.append(body)
+                return self.generator.generate(body, **options)
+
+            def generate_with_abstract(self, abstract, body, **options):
+                payloads.append(body)
+                return self.generator.generate_with_abstract(
+                    abstract, body, **options)
+
+        def _get_generator(*args):
+            return RecordingGenerator(get_generator(*args))
+
+        payloads = []
+        get_generator = zkb.builder._get_generator
+        config = _create_config()
+        fileproc = RecordingFileProcessor()
+        zkb.builder._get_generator = _get_generator
+        try:
+            DefaultSiteBuilder(config, fileproc).build()
+        finally:
+            zkb.builder._get_generator = get_generator
+        self.assertEqual(len(payloads), 5,
+                         'payloads of all articles except the draft should '
+                         'be generated')
+        self.assertFalse(any(u'Draft content' in payload
+                             for payload in payloads),
+                         'payload of the draft should never be generated')
+        self.assertTrue(len(fileproc.written) > 0, 'pages should be written')
+        self.assertEqual([filename for filename in fileproc.written
+                          if 'draft' in filename or 'tag4' in filename], [],
+                         'no page should be written for the draft')
+
+    def test_headers_parsed_once(self):
+        def _parse_header(self, header, base=None):
+            parsed.append(header)
+            return parse_header(self, header, base)
+
+        parsed = []
+        parse_header = YamlHeaderedContentReader._parse_header
+        config = _create_config('TestSiteBuilder.MockSiteBuilder')
+        YamlHeaderedContentReader._parse_header = _parse_header
+        try:
+            SiteBuilder.from_config(
+                config, TestSiteBuilder.MockFileProcessor()).build()
+        finally:
+            YamlHeaderedContentReader._parse_header = parse_header
+        self.assertEqual(len(parsed), 6,
+                         'header of each article should be parsed once')
+
+    def test_nested_articles(self):
+        article_dir = tempfile.mkdtemp()
+        try:
+            for path in ('post.md', '2014/01/nested.md', '_site/output.md',
+                         '_cache/cached.md', '_template/index.html'):
+                filename = os.path.join(article_dir, *path.split('/'))
+                if not os.path.exists(os.path.dirname(filename)):
+                    os.makedirs(os.path.dirname(filename))
+                with open(filename, 'wb') as f:
+                    f.write('title: %s\n\nContent' %
+                            os.path.basename(path).split('.')[0])
+            config = _create_config('TestSiteBuilder.MockSiteBuilder',
+                                    os.path.join(article_dir, '_cache'))
+            config.article_dir = article_dir
+            config.output_dir = os.path.join(article_dir, '_site')
+            config.template_dir = os.path.join(article_dir, '_template')
+            config = SiteBuilder.from_config(config).build()
+            self.assertEqual(sorted(a.title for a in config.articles_by_date),
+                             ['nested', 'post'],
+                             'articles in subdirectories should be found, '
+                             'except in output, cache and template '
+                             'directories')
+        finally:
+            shutil.rmtree(article_dir)
+
+    def test_site_builder_jobs(self):
+        config = _create_config('TestSiteBuilder.MockSiteBuilder')
+        config = SiteBuilder.from_config(
+            config, TestSiteBuilder.MockFileProcessor(), jobs=2).build()
+        self.assertEqual([a.title for a in config.articles_by_date],
+                         ['Test2', 'Test3', 'Test'],
+                         'articles generated in parallel should be sorted '
+                         'by date')
+        self.assertEqual(len(config.articles_by_tag['tag2']), 2,
+                         'tag2 should have 2 articles')
+        self.assertEqual(config.special_articles['404'].title, 'Not Found',
+                         'title of 404 article should be Not Found')
+
+    def test_render_pages_jobs(self):
+        output_dir = tempfile.mkdtemp()
+        try:
+            config = _create_config()
+            builder = DefaultSiteBuilder(config, jobs=4)
+            template = jinja2.Template(u'{{ content }}')
+            page_dir = os.path.join(output_dir, 'page')
+            pages = [OutputPage(os.path.join(page_dir, '%d.html' % i),
+                                '/page/%d.html' % i, template,
+                                {'content': u'Page %d' % i})
+                     for i in range(64)]
+            exists = os.path.exists
+            # Directories seem missing, as if created by another worker after
+            # being checked.
+            os.path.exists = lambda path: exists(path) and \
+                not os.path.isdir(path)
+            try:
+                builder._render_pages(pages)
+            finally:
+                os.path.exists = exists
+            self.assertEqual(builder._writes, 64,
+                             'all pages should be written by workers '
+                             'creating the same directory')
+            self.assertEqual(len(os.listdir(page_dir)), 64,
+                             'all pages should be written to output')
+        finally:
+            shutil.rmtree(output_dir)
+
+
+class TestIncrementalBuild(unittest.TestCase):
+    class MockFileProcessor(TestSiteBuilder.MockFileProcessor):
+        def __init__(self):
+            self.read_files = []
+            self.sizes = {}
+
+        def read(self, filename):
+            self.read_files.append(filename)
+            return TestSiteBuilder.MockFileProcessor.read(self, filename)
+
+        def stat(self, filename):
+            size = self.sizes.get(filename, 100)
+            return os.stat_result((0, 0, 0, 0, 0, 0, size, 0, 1000, 0))
+
+    class MockSiteBuilder(SiteBuilder):
+        def _do_build(self):
+            return 0
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _build(self, fileproc):
+        config = _create_config('TestIncrementalBuild.MockSiteBuilder',
+                                self.cache_dir)
+        manifest = BuildManifest.load(
+            os.path.join(self.cache_dir, 'manifest'), config)
+        builder = SiteBuilder.from_config(config, fileproc,
+                                          manifest=manifest)
+        self.assertEqual(builder.build(), 0, 'build should succeed')
+        return builder.config
+
+    def test_unchanged_articles_skipped(self):
+        self._build(TestIncrementalBuild.MockFileProcessor())
+        fileproc = TestIncrementalBuild.MockFileProcessor()
+        config = self._build(fileproc)
+        self.assertEqual(fileproc.read_files, [],
+                         'unchanged articles should not be read again')
+        self.assertEqual(len(config.articles_by_date), 3,
+                         'there should be 3 articles in total')
+        self.assertEqual(config.articles_by_date[0].title, 'Test2',
+                         'title of the 1st article should be Test2')
+        self.assertEqual(len(config.special_articles), 2,
+                         'there should be 2 special articles')
+
+    def test_changed_article_read(self):
+        self._build(TestIncrementalBuild.MockFileProcessor())
+        fileproc = TestIncrementalBuild.MockFileProcessor()
+        fileproc.sizes['article2.md'] = 200
+        self._build(fileproc)
+        self.assertEqual(fileproc.read_files, ['article2.md'],
+                         'only changed article should be read again')
+
+    def test_undated_article_touched(self):
+        article_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(article_dir, 'post.md')
+            with open(filename, 'wb') as f:
+                f.write('title: Post\n\nContent')
+            config = _create_config('TestIncrementalBuild.MockSiteBuilder',
+                                    self.cache_dir)
+            config.article_dir = article_dir
+            config.output_dir = os.path.join(article_dir, '_site')
+            manifest_file = os.path.join(self.cache_dir, 'manifest')
+
+            def _build(manifest):
+                builder = SiteBuilder.from_config(config, manifest=manifest)
+                self.assertEqual(builder.build(), 0, 'build should succeed')
+                return builder.config.articles_by_date[0].date
+
+            _build(BuildManifest.load(manifest_file, config))
+            os.utime(filename, (0, 0))
+            self.assertEqual(
+                _build(BuildManifest.load(manifest_file, config)),
+                _build(BuildManifest(manifest_file, config.get_digest())),
+                'article dated by modification time should have the same '
+                'date in incremental and full builds')
+            self.assertEqual(config.articles_by_date[0].date,
+                             datetime.datetime.fromtimestamp(0),
+                             'date of the article should be its new '
+                             'modification time')
+        finally:
+            shutil.rmtree(article_dir)
+
+    def test_undated_article_changed(self):
+        article_dir = tempfile.mkdtemp()
+        try:
+            template_dir = os.path.join(article_dir, '_template')
+            os.makedirs(template_dir)
+            with open(os.path.join(template_dir, 'article.html'), 'wb') as f:
+                f.write('{% if prev %}{{ prev.url }}{% endif %}|'
+                        '{% if next %}{{ next.url }}{% endif %}')
+
+            def _write(name, content, day):
+                filename = os.path.join(article_dir, name + '.md')
+                with open(filename, 'wb') as f:
+                    f.write('title: %s\n\n%s' % (name, content))
+                mtime = time.mktime((2014, 1, day, 0, 0, 0, 0, 0, -1))
+                os.utime(filename, (mtime, mtime))
+
+            def _read(*path):
+                root_parts = filter(None, config.url.split('/'))
+                with open(os.path.join(config.output_dir,
+                                       *(root_parts + list(path))), 'rb') as f:
+                    return f.read()
+
+            config = _create_config(cache_dir=self.cache_dir)
+            config.article_dir = article_dir
+            config.output_dir = os.path.join(article_dir, '_site')
+            config.template_dir = template_dir
+            manifest_file = os.path.join(self.cache_dir, 'manifest')
+            _write('older', 'Content', 1)
+            _write('moved', 'Content', 3)
+            _write('newer', 'Content', 5)
+            self.assertEqual(SiteBuilder.from_config(
+                config, manifest=BuildManifest.load(manifest_file, config)
+            ).build(), 0, 'build should succeed')
+            # Date and URL of the article are derived from its source.
+            _write('moved', 'Edited', 4)
+            self.assertEqual(SiteBuilder.from_config(
+                config, manifest=BuildManifest.load(manifest_file, config)
+            ).build(), 0, 'build should succeed')
+            for path in (('2014', '01', '01', 'older', 'index.html'),
+                         ('2014', '01', '05', 'newer', 'index.html'),
+                         ('archive', 'index.html')):
+                self.assertIn('2014/01/04/moved/', _read(*path),
+                              'new URL of changed article should be shown '
+                              'in %s' % '/'.join(path))
+                self.assertNotIn('2014/01/03/moved/', _read(*path),
+                                 'old URL of changed article should not be '
+                                 'shown in %s' % '/'.join(path))
+        finally:
+            shutil.rmtree(article_dir)
+
+
+class TestPreviewSiteBuilder(unittest.TestCase):
+    def test_render_on_demand(self):
+        config = _create_config()
+        fileproc = TestIncrementalBuild.MockFileProcessor()
+        builder = PreviewSiteBuilder(config, fileproc)
+        builder.load()
+        self.assertEqual([a.full['html'] for a in config.articles_by_date],
+                         ['', '', ''],
+                         'bodies should not be generated when loading')
+        archive = builder.render('/blog/archive/')
+        self.assertIsNotNone(archive, 'archive page should be rendered')
+        self.assertEqual(archive.count('<h2 class="year">2002</h2>'), 1,
+                         'articles of the same year should be grouped')
+        self.assertEqual([a.full['html'] for a in config.articles_by_date],
+                         ['', '', ''],
+                         'bodies should not be generated for archive page')
+        url = '/blog/2002/02/01/test2/'
+        content = builder.render(url)
+        self.assertIn('<p>Content</p>', content,
+                      'article page should be rendered with its body')
+        self.assertEqual([a.full['html'] == '' for a in
+                          config.articles_by_date], [False, True, True],
+                         'only body of the requested article should be '
+                         'generated')
+        self.assertIs(builder.render(url + 'index.html'), content,
+                      'rendered page should be kept')
+        self.assertIsNone(builder.render('/blog/nothing/'),
+                          'nothing should be rendered for unknown URL')
+        fileproc.sizes['article2.md'] = 200
+        fileproc.read = lambda filename: io.BytesIO(
+            b'title: Test2\ntags: tag1, tag2\n\nChanged')
+        builder.load()
+        self.assertIn('<p>Changed</p>', builder.render(url),
+                      'page of changed article should be rendered again')
+
+
+class TestGitIncrementalBuild(unittest.TestCase):
+    class MockFileProcessor(FileProcessor):
+        def __init__(self):
+            FileProcessor.__init__(self)
+            self.read_files = []
+
+        def read(self, filename):
+            self.read_files.append(os.path.basename(filename))
+            return FileProcessor.read(self, filename)
+
+    def setUp(self):
+        self.article_dir = tempfile.mkdtemp()
+        self._write('article1.md', u'title: Test\ndate: 2014-01-01\n\nContent')
+        self._write('article2.md', u'title: Test2\ndate: 2014-01-02\n\n'
+                                   u'Content')
+        self._write('.gitignore', u'_site\n_cache\n')
+        self._git('init', '-q', '.')
+        self._git('add', '.')
+        self._git('-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+                  'commit', '-q', '-m', 'Initial commit')
+
+    def tearDown(self):
+        shutil.rmtree(self.article_dir)
+
+    def _write(self, name, content):
+        with open(os.path.join(self.article_dir, name), 'wb') as f:
+            f.write(content.encode('utf-8'))
+
+    def _git(self, *args):
+        try:
+            subprocess.check_call(('git',) + args, cwd=self.article_dir)
+        except OSError:
+            self.skipTest('git is not available')
+
+    def _build(self):
+        config = _create_config('TestIncrementalBuild.MockSiteBuilder',
+                                os.path.join(self.article_dir, '_cache'))
+        config.article_dir = self.article_dir
+        config.output_dir = os.path.join(self.article_dir, '_site')
+        manifest = BuildManifest.load(
+            os.path.join(config.cache_dir, 'manifest'), config)
+        fileproc = TestGitIncrementalBuild.MockFileProcessor()
+        builder = SiteBuilder.from_config(config, fileproc,
+                                          manifest=manifest, use_git=True)
+        self.assertEqual(builder.build(), 0, 'build should succeed')
+        self.articles = builder.config.articles_by_date
+        return sorted(fileproc.read_files)
+
+    def test_changed_files_from_git(self):
+        self.assertEqual(self._build(), ['article1.md', 'article2.md'],
+                         'all articles should be read in first build')
+        for name in ('article1.md', 'article2.md'):
+            os.utime(os.path.join(self.article_dir, name), (0, 0))
+        self.assertEqual(self._build(), [],
+                         'articles unchanged in git should not be read '
+                         'regardless of modification time')
+        self._write('article2.md', u'title: Changed\ndate: 2014-01-02\n\n'
+                                   u'Content')
+        self._write('article3.md', u'title: Test3\ndate: 2014-01-03\n\n'
+                                   u'Content')
+        self.assertEqual(self._build(), ['article2.md', 'article3.md'],
+                         'changed and untracked articles should be read')
+        self._git('checkout', '-q', '--', 'article2.md')
+        self.assertEqual(self._build(), ['article2.md'],
+                         'article reverted to committed content should be '
+                         'read')
+
+    def test_undated_article_touched(self):
+        self._write('undated.md', u'title: Undated\n\nContent')
+        self._git('add', 'undated.md')
+        self._git('-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+                  'commit', '-q', '-m', 'Add undated article')
+        self._build()
+        os.utime(os.path.join(self.article_dir, 'undated.md'), (0, 0))
+        self.assertEqual(self._build(), ['undated.md'],
+                         'article dated by modification time should be read '
+                         'when only its modification time is changed')
+        self.assertEqual(self.articles[-1].date,
+                         datetime.datetime.fromtimestamp(0),
+                         'date of the article should be its new '
+                         'modification time')
+
+
+class TestFileProcessor(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_write_if_changed(self):
+        fileproc = FileProcessor(write_if_changed=True)
+        filename = os.path.join(self.output_dir, 'page', 'index.html')
+        self.assertTrue(fileproc.write(filename, 'utf-8', u'中文'),
+                        'new file should be written')
+        self.assertFalse(fileproc.write(filename, 'utf-8', u'中文'),
+                         'unchanged file should not be written')
+        self.assertTrue(fileproc.write(filename, 'utf-8', u'日本'),
+                        'file of same size but different content should be '
+                        'written')
+        self.assertFalse(fileproc.write_stream(
+            filename, io.BytesIO(u'日本'.encode('utf-8'))),
+            'unchanged file should not be written from stream')
+        copied = os.path.join(self.output_dir, 'copied.html')
+        self.assertTrue(fileproc.copy_file(filename, copied),
+                        'new file should be copied')
+        self.assertFalse(fileproc.copy_file(filename, copied),
+                         'unchanged file should not be copied')
+
+    def test_copy_resource(self):
+        source = os.path.join(self.output_dir, 'image.png')
+        with open(source, 'wb') as f:
+            f.write('image')
+        for link_resources in (False, True):
+            fileproc = FileProcessor(link_resources=link_resources)
+            dest = os.path.join(self.output_dir, str(link_resources), 'ab',
+                                'image.png')
+            self.assertTrue(fileproc.copy_resource(source, dest),
+                            'new resource should be written')
+            with open(dest, 'rb') as f:
+                self.assertEqual(f.read(), 'image',
+                                 'resource should have the same content')
+            self.assertEqual(os.path.samefile(source, dest), link_resources,
+                             'resource should be linked only if enabled')
+            self.assertFalse(fileproc.copy_resource(source, dest),
+                             'existing resource should not be written')
+        os.remove(dest)
+        with open(dest, 'wb') as f:
+            f.write('ima')
+        self.assertTrue(fileproc.copy_resource(source, dest),
+                        'partially written resource should be written')
+        self.assertEqual(os.listdir(os.path.dirname(dest)), ['image.png'],
+                         'temporary files should be removed')
+
+    def test_sync(self):
+        fileproc = FileProcessor()
+        source = os.path.join(self.output_dir, 'style.css')
+        dest = os.path.join(self.output_dir, 'out', 'style.css')
+        content = 'x' * 100000
+        with open(source, 'wb') as f:
+            f.write(content)
+        self.assertTrue(fileproc.sync_file(source, dest),
+                        'new file should be copied')
+        self.assertFalse(fileproc.sync_file(source, dest),
+                         'unchanged file should not be copied')
+        self.assertFalse(fileproc.sync_stream(dest, io.BytesIO(content)),
+                         'unchanged file should not be written from stream')
+        for changed in (content[:-1] + 'y', content + 'y', content[:-1]):
+            self.assertTrue(fileproc.sync_stream(dest, io.BytesIO(changed)),
+                            'changed file should be written from stream')
+            with open(dest, 'rb') as f:
+                self.assertEqual(f.read(), changed,
+                                 'file should have content of the stream')
+        self.assertTrue(fileproc.sync_file(source, dest),
+                        'changed file should be copied')
+        self.assertEqual(os.listdir(os.path.dirname(dest)), ['style.css'],
+                         'temporary files should be removed')
+
+    def test_get_resource_files(self):
+        for path in ('index.html', 'css/style.css', 'images/a.jpg',
+                     '.git/config'):
+            filename = os.path.join(self.output_dir, *path.split('/'))
+            if not os.path.exists(os.path.dirname(filename)):
+                os.makedirs(os.path.dirname(filename))
+            with open(filename, 'wb') as f:
+                f.write('content')
+        self.assertEqual(sorted(FileProcessor().get_resource_files(
+            self.output_dir, ['.*'])), ['css/style.css', 'images/a.jpg'],
+            'files except templates should be found')
+        self.assertEqual(sorted(_get_package_resources(
+            'templates/default')),
+            ['images/header-1.jpg', 'images/header-2.jpg',
+             'stylesheets/codeblock.css', 'stylesheets/style.css'],
+            'resources of package should be found')
+
+    def test_write_always(self):
+        fileproc = FileProcessor()
+        filename = os.path.join(self.output_dir, 'index.html')
+        self.assertTrue(fileproc.write(filename, 'utf-8', u'content'),
+                        'new file should be written')
+        self.assertTrue(fileproc.write(filename, 'utf-8', u'content'),
+                        'file should always be written by default')
+
+    def test_write_chunks(self):
+        fileproc = FileProcessor(write_if_changed=True)
+        filename = os.path.join(self.output_dir, 'chunks', 'index.html')
+        self.assertTrue(fileproc.write_chunks(
+            filename, 'utf-8', iter([u'中', u'文', u'内容'])),
+            'new file should be written from chunks')
+        with open(filename, 'rb') as f:
+            self.assertEqual(f.read().decode('utf-8'), u'中文内容',
+                             'chunks should be encoded and concatenated')
+        self.assertFalse(fileproc.write_chunks(
+            filename, 'utf-8', iter([u'中文', u'内容'])),
+            'unchanged file should not be written from chunks')
+        self.assertTrue(fileproc.write_chunks(
+            filename, 'utf-8', iter([u'中文'])),
+            'truncated content should be written')
+        self.assertTrue(fileproc.write_chunks(
+            filename, 'utf-8', iter([u'中文', u'内容'])),
+            'extended content should be written')
+        self.assertEqual(os.listdir(os.path.dirname(filename)),
+                         ['index.html'],
+                         'temporary files should be removed')
+
+    def test_get_article_files(self):
+        for path in ('post.md', 'post.json.md', 'notes.txt', 'sub/deep.md',
+                     '_site/out.md', '.git/objects/x.md',
+                     'node_modules/pkg/readme.md', 'drafts/ignored.md'):
+            filename = os.path.join(self.output_dir, *path.split('/'))
+            if not os.path.exists(os.path.dirname(filename)):
+                os.makedirs(os.path.dirname(filename))
+            with open(filename, 'wb') as f:
+                f.write('content')
+        fileproc = FileProcessor()
+        for scandir in (walker.scandir, None):
+            original = walker.scandir
+            walker.scandir = scandir
+            try:
+                files = fileproc.get_article_files(
+                    self.output_dir, [os.path.join(self.output_dir, '_site')],
+                    ['.*', 'node_modules', 'drafts'])
+            finally:
+                walker.scandir = original
+            found = sorted((os.path.relpath(full_path, self.output_dir),
+                            name, header_type)
+                           for full_path, name, _, header_type, _ in files)
+            self.assertEqual(found,
+                             [('post.json.md', 'post', 'json'),
+                              ('post.md', 'post', 'yaml'),
+                              (os.path.join('sub', 'deep.md'), 'deep',
+                               'yaml')],
+                             'articles in subdirectories should be found and '
+                             'ignored subtrees should be skipped')
+            full_path = os.path.join(self.output_dir, 'post.md')
+            self.assertEqual(fileproc.stat(full_path).st_size, 7,
+                             'stat result of found file should be kept')
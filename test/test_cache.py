@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+test.test_cache
+~~~~~~~~~~~~~~~
+
+This is the unit test file for disk cache, file hash cache, template cache
+and cached body generator.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import cPickle as pickle
+
+from jinja2 import Environment, DictLoader
+
+from zkb.cache import DiskCache, FileHashCache, TemplateBytecodeCache
+from zkb.cache import get_cache_key
+from zkb.cache import get_file_hash
+from zkb.bodygenerators import BodyGenerator, CachedBodyGenerator
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_set(self):
+        cache = DiskCache(self.cache_dir, 1024 * 1024)
+        key = get_cache_key('a', 1)
+        self.assertEqual(cache.get(key), None,
+                         'missing entry should not be found')
+        cache.set(key, {'html': u'<p>a</p>'})
+        self.assertEqual(DiskCache(self.cache_dir, 1024 * 1024).get(key),
+                         {'html': u'<p>a</p>'},
+                         'entry should be read from disk')
+
+    def test_trim(self):
+        cache = DiskCache(self.cache_dir, 1024 * 1024)
+        keys = [get_cache_key(i) for i in range(3)]
+        for index, key in enumerate(keys):
+            cache.set(key, 'x' * 1000)
+            os.utime(cache._get_filename(key), (index, index))
+        cache.get(keys[0])
+        size = os.path.getsize(cache._get_filename(keys[0]))
+        cache.max_size = size * 2
+        self.assertEqual(cache.trim(), 1, 'one entry should be removed')
+        self.assertEqual(cache.get(keys[1]), None,
+                         'least recently used entry should be removed')
+        self.assertEqual(cache.get(keys[0]), 'x' * 1000,
+                         'recently used entry should be kept')
+
+
+class TestFileHashCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.cache_dir, 'hashes.pickle')
+        self.files = [os.path.join(self.cache_dir, name)
+                      for name in ('a.png', 'b.png', 'c.png')]
+        for filename in self.files:
+            with open(filename, 'wb') as f:
+                f.write(filename)
+            os.utime(filename, (1000, 1000))
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _rewrite(self, filename, content):
+        # Keep size and modification time, so that only the memo tells the
+        # file was hashed before.
+        with open(filename, 'r+b') as f:
+            f.write(content)
+        os.utime(filename, (1000, 1000))
+
+    def test_memo(self):
+        cache = FileHashCache()
+        file_hash = cache.get_hash(self.files[0])
+        self.assertEqual(file_hash, get_file_hash(self.files[0]),
+                         'hash should be SHA1 of the file')
+        self._rewrite(self.files[0], 'x')
+        self.assertEqual(cache.get_hash(self.files[0]), file_hash,
+                         'unchanged file should not be hashed again')
+        os.utime(self.files[0], (0, 0))
+        self.assertEqual(cache.get_hash(self.files[0]),
+                         get_file_hash(self.files[0]),
+                         'file with new modification time should be hashed '
+                         'again')
+        self.assertEqual(cache.get_hash(self.files[0] + '.missing'), None,
+                         'missing file should have no hash')
+
+    def test_persistence(self):
+        cache = FileHashCache(self.cache_file)
+        hashes = cache.get_hashes(self.files)
+        cache.save()
+        os.remove(self.files[2])
+        self._rewrite(self.files[0], 'x')
+        cache = FileHashCache(self.cache_file)
+        self.assertEqual(cache.get_hash(self.files[0]), hashes[self.files[0]],
+                         'hash should be loaded from previous run')
+        cache.get_hash(self.files[1])
+        cache.update({os.path.realpath(self.files[2]): ((0, 0, 0), 'hash')})
+        cache.save()
+        with open(self.cache_file, 'rb') as f:
+            self.assertEqual(sorted(pickle.load(f).keys()),
+                             [os.path.realpath(filename)
+                              for filename in self.files[:2]],
+                             'only entries of existing files should be saved')
+
+    def test_large_files(self):
+        for filename in self.files:
+            with open(filename, 'wb') as f:
+                f.write(filename * (1024 * 1024 // len(filename) + 1))
+        cache = FileHashCache(threads=2)
+        hashes = cache.get_hashes(self.files)
+        self.assertEqual(hashes, dict((filename, get_file_hash(filename))
+                                      for filename in self.files),
+                         'large files should be hashed correctly in threads')
+        self.assertEqual(sorted(cache.pop_updates().keys()),
+                         sorted(os.path.realpath(filename)
+                                for filename in self.files),
+                         'new entries should be popped')
+        self.assertEqual(cache.pop_updates(), {},
+                         'popped entries should not be popped again')
+
+
+class TestTemplateBytecodeCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _load(self, source):
+        cache = TemplateBytecodeCache(os.path.join(self.cache_dir, 'tpl'))
+        env = Environment(loader=DictLoader({'page.html': source}),
+                          bytecode_cache=cache)
+        compiled = []
+
+        def _compile(*args, **kwargs):
+            compiled.append(args[0])
+            return Environment.compile(env, *args, **kwargs)
+
+        env.compile = _compile
+        return env.get_template('page.html').render(), compiled
+
+    def test_cache(self):
+        self.assertEqual(self._load(u'{{ 1 + 1 }}'), (u'2', [u'{{ 1 + 1 }}']),
+                         'new template should be compiled')
+        self.assertEqual(os.listdir(self.cache_dir), ['tpl'],
+                         'cache directory should be created')
+        self.assertEqual(self._load(u'{{ 1 + 1 }}'), (u'2', []),
+                         'unchanged template should be loaded from cache')
+        self.assertEqual(self._load(u'{{ 1 + 2 }}'), (u'3', [u'{{ 1 + 2 }}']),
+                         'changed template should be compiled again')
+
+
+class TestCachedBodyGenerator(unittest.TestCase):
+    class MockBodyGenerator(BodyGenerator):
+        def __init__(self, resource):
+            super(TestCachedBodyGenerator.MockBodyGenerator, self).__init__()
+            self.resource = resource
+            self.calls = 0
+
+        def generate(self, body, **options):
+            self.calls += 1
+            target = ['resources', 'ab', 'cd', 'ef', 'image.png']
+            return body, {'local_references': {self.resource: target}}
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.article_dir = tempfile.mkdtemp()
+        self.article = os.path.join(self.article_dir, 'article.md')
+        self.resource = os.path.join(self.article_dir, 'image.png')
+        for filename in (self.article, self.resource):
+            with open(filename, 'wb') as f:
+                f.write('content')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        shutil.rmtree(self.article_dir)
+
+    def _generate(self, body):
+        generator = TestCachedBodyGenerator.MockBodyGenerator(self.resource)
+        cached = CachedBodyGenerator(generator,
+                                     DiskCache(self.cache_dir, 1024 * 1024))
+        result = cached.generate(body, base=self.article, url='/')
+        return generator.calls, result
+
+    def test_cache_hit(self):
+        self._generate(u'body')
+        calls, (html, meta) = self._generate(u'body')
+        self.assertEqual(calls, 0,
+                         'wrapped generator should not be called on hit')
+        self.assertEqual(html, u'body', 'cached content should be returned')
+        self.assertEqual(meta['local_references'].keys(), [self.resource],
+                         'local references should be restored')
+        calls, _ = self._generate(u'other body')
+        self.assertEqual(calls, 1,
+                         'wrapped generator should be called for new body')
+
+    def test_reference_changed(self):
+        self._generate(u'body')
+        with open(self.resource, 'wb') as f:
+            f.write('changed content')
+        calls, _ = self._generate(u'body')
+        self.assertEqual(calls, 1,
+                         'entry should be ignored if referenced file changed')
@@ -341,3 +341,74 @@ class TestCodeFormatter(unittest.TestCase):
                           '            \'code\': CodeBlockHtmlFormatter()\n'
                           '        })</code></pre></figure>'),
                          'formatter should not format source code')
+
+    def test_highlight_cache(self):
+        from zkb.cache import MemoryCache
+
+        class MockFormatter(CodeBlockHtmlFormatter):
+            def __init__(self, cache):
+                super(MockFormatter, self).__init__(cache=cache)
+                self.highlighted = 0
+
+            def _highlight(self, *args):
+                self.highlighted += 1
+                return super(MockFormatter, self)._highlight(*args)
+
+        cache = MemoryCache(10)
+        formatter = MockFormatter(cache)
+        result = formatter.format('lang:python mark:1', u'print 1')
+        self.assertEqual(formatter.format('lang:python mark:1', u'print 1'),
+                         result, 'cached block should be the same')
+        self.assertEqual(formatter.highlighted, 1,
+                         'same block should be highlighted only once')
+        formatter.format('lang:python', u'print 1')
+        self.assertEqual(formatter.highlighted, 2,
+                         'block with different header should be highlighted')
+        formatter = MockFormatter(cache)
+        self.assertEqual(formatter.format('lang:python mark:1', u'print 1'),
+                         result, 'block should be read from persistent cache')
+        self.assertEqual(formatter.highlighted, 0,
+                         'block in persistent cache should not be '
+                         'highlighted again')
+
+    def test_lexer_registry(self):
+        from zkb.mdext.codeblock import LexerRegistry
+
+        registry = LexerRegistry()
+        self.assertTrue(registry.get_by_name('python') is
+                        registry.get_by_name('py'),
+                        'lexer should be shared by aliases')
+        self.assertEqual(registry.get_by_name('no-such-language'), None,
+                         'unknown language should not be resolved')
+        code = u'#!/bin/bash\necho 1\n'
+        lexer = registry.guess(code)
+        self.assertTrue(lexer is registry.get_by_name('bash'),
+                        'language should be guessed')
+        self.assertTrue(registry.guess(code) is lexer,
+                        'guessed language should be remembered')
+        guessed, memoized, _ = registry.pop_stats()
+        self.assertEqual((guessed, memoized), (1, 1),
+                         'guesses should be counted')
+        self.assertEqual(registry.pop_stats(), (0, 0, 0.0),
+                         'statistics should be reset')
+
+    def test_gutter_special_anchors(self):
+        from zkb.mdext.codeblock import CodeBlockPygmentsHtmlFormatter
+
+        formatter = CodeBlockPygmentsHtmlFormatter(
+            linenos=True, linenospecial=2, anchorlinenos=True,
+            lineanchors='L', hl_lines=[2])
+        source = [(1, 'a\n'), (1, 'b\n'), (1, 'c\n')]
+        result = ''.join(
+            piece for _, piece in formatter._wrap_tablelinenos(source))
+        self.assertEqual(result,
+                         '<figure class="highlight"><table><tr>'
+                         '<td class="line-numbers"><div><pre>'
+                         '<div class="line-number"><a href="#L-1">1</a>\n'
+                         '</div><div class="line-number special marked start '
+                         'end"><a href="#L-2">2</a>\n'
+                         '</div><div class="line-number"><a href="#L-3">3</a>'
+                         '\n</div></pre></div></td><td class="code">'
+                         'a\nb\nc\n</td></tr></table></figure>',
+                         'gutter should contain special and marked line '
+                         'numbers with anchors')
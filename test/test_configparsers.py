@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+test.test_configparsers
+~~~~~~~~~~~~~~~~~~~~~~~
+
+This is the conformance test file for config parsers, checking that all
+parsers give the same result as the pure Python YAML parser.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import unittest
+
+from zkb.configparsers import YamlConfigParser
+from zkb.configparsers import JsonConfigParser
+from zkb.configparsers import KeyValueConfigParser
+
+
+_YAML_CASES = [
+    u'',
+    u'title: Hello World',
+    u'title: 中文标题\nauthor: 作者',
+    u'title: Test\ndate: 2014-01-01 10:00:00\ntags: tag1, tag2',
+    u'date: 2014-01-01\ntime: 12:30\nratio: 1.5\nmode: 0755',
+    u'draft: yes\nenable_comments: off\nslug: ~\nlocale:',
+    u'tags: [tag1, tag2]\nsite_builder: {name: DefaultSiteBuilder}',
+    u'# comment\ntitle: "Quoted: \\u4e2d"  # comment',
+    u'more_separator: \'--MORE--\'\npage_size: -5',
+]
+
+_KEY_VALUE_CASES = [
+    u'',
+    u'title: Hello World',
+    u'title: 中文标题\nauthor: 作者',
+    u'# comment\ntitle: Test\ntags: tag1, tag2\nlocale: en_US',
+    u'draft: yes\nenable_comments: off\nshow_search_box: True\nslug: null',
+    u'locale:\nurl: example.com/blog/\nemail: author@example.com',
+    u'more_separator: \'--MORE--\'\nquote: \'It\'\'s\'\npage_size: -5',
+    u'count: 0\nsize: +12\ntitle:   Trailing spaces   ',
+    u'article_type: 404\ncopyright: Copyright 2014',
+    u'more_separator: --MORE--\na: -MORE-\nb: ?x\nc: :x',
+    u'date: 2014-01-01 10:00:00\nupdated: 2014-01-01',
+    u'title: 1st place\nduration: 3 days\nversion: 2014-1-5\nsize: -5px',
+]
+
+_KEY_VALUE_UNSUPPORTED = [
+    u'time: 12:30',
+    u'ratio: 1.5',
+    u'mode: 0755',
+    u'slug: ~',
+    u'tags: [tag1, tag2]',
+    u'title: "Quoted"',
+    u'title: Hello # comment',
+    u'title: a: b',
+    u'yes: 1',
+    u'  indented: 1',
+    u'title:value',
+    u'ratio: -.5',
+    u'mask: 0x1f',
+    u'count: 1_000',
+    u'item: - x',
+    u'merge: <<',
+]
+
+_JSON_CASES = [
+    (u'', u''),
+    (u'{"title": "Hello World"}', u'title: Hello World'),
+    (u'{"title": "中文标题",\n "author": "\\u4f5c\\u8005"}',
+     u'title: 中文标题\nauthor: 作者'),
+    (u'{"draft": true, "slug": null, "page_size": 5, "ratio": 1.5}',
+     u'draft: true\nslug: null\npage_size: 5\nratio: 1.5'),
+    (u'{"tags": ["tag1", "tag2"],\n "site_builder": {"name": "Builder"}}',
+     u'tags: [tag1, tag2]\nsite_builder: {name: Builder}'),
+]
+
+
+class TestConfigParsers(unittest.TestCase):
+    def setUp(self):
+        self.reference = YamlConfigParser(use_libyaml=False)
+
+    def test_libyaml(self):
+        parser = YamlConfigParser()
+        for config in _YAML_CASES:
+            self.assertEqual(parser.parse(config),
+                             self.reference.parse(config),
+                             'YAML parser should give the same result with '
+                             'or without LibYAML for %r' % config)
+
+    def test_key_value(self):
+        parser = KeyValueConfigParser()
+        for config in _KEY_VALUE_CASES:
+            result = parser.parse(config)
+            expected = self.reference.parse(config)
+            self.assertEqual(result, expected,
+                             'key/value parser should give the same result as '
+                             'YAML parser for %r' % config)
+            if expected is not None:
+                self.assertEqual(
+                    [type(result[key]) for key in sorted(result)],
+                    [type(expected[key]) for key in sorted(expected)],
+                    'key/value parser should give the same types as YAML '
+                    'parser for %r' % config)
+
+    def test_key_value_unsupported(self):
+        parser = KeyValueConfigParser()
+        for config in _KEY_VALUE_UNSUPPORTED:
+            with self.assertRaises(ValueError):
+                parser.parse(config)
+
+    def test_json(self):
+        parser = JsonConfigParser()
+        for config, yaml_config in _JSON_CASES:
+            self.assertEqual(parser.parse(config),
+                             self.reference.parse(yaml_config),
+                             'JSON parser should give the same result as YAML '
+                             'parser for %r' % config)
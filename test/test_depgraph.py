@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+test.test_depgraph
+~~~~~~~~~~~~~~~~~~
+
+This is the unit test file for dependency graph.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import unittest
+import cPickle as pickle
+
+from zkb.depgraph import DependencyGraph, HEADER, BODY, ALL
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def _create_graph(self, site_key='site', archive=('a', 'b', 'c')):
+        graph = DependencyGraph(site_key)
+        graph.add('a.html', ('a', None, 'b'),
+                  {'a': ALL, 'b': (HEADER,)})
+        graph.add('b.html', ('b', 'a', 'c'),
+                  {'b': ALL, 'a': (HEADER,), 'c': (HEADER,)})
+        graph.add('c.html', ('c', 'b', None),
+                  {'c': ALL, 'b': (HEADER,)})
+        graph.add('archive.html', archive,
+                  dict.fromkeys(archive, (HEADER,)))
+        graph.add('index.html', ['a', 'b'], dict.fromkeys(['a', 'b'], ALL))
+        graph.add('page2.html', ['c'], {'c': ALL})
+        return graph
+
+    def test_no_previous_graph(self):
+        graph = self._create_graph()
+        self.assertEqual(len(graph.get_outdated(None, {})), 6,
+                         'all pages should be outdated without previous '
+                         'graph')
+
+    def test_unchanged(self):
+        previous = self._create_graph()
+        graph = self._create_graph()
+        self.assertEqual(graph.get_outdated(previous, {}), set(),
+                         'no page should be outdated without changes')
+
+    def test_site_key_changed(self):
+        previous = self._create_graph()
+        graph = self._create_graph(site_key='other')
+        self.assertEqual(len(graph.get_outdated(previous, {})), 6,
+                         'all pages should be outdated if site key changes')
+
+    def test_body_changed(self):
+        previous = self._create_graph()
+        graph = self._create_graph()
+        self.assertEqual(graph.get_outdated(previous, {'c': set([BODY])}),
+                         set(['c.html', 'page2.html']),
+                         'only pages showing body of the article should be '
+                         'outdated')
+
+    def test_header_changed(self):
+        previous = self._create_graph()
+        graph = self._create_graph()
+        self.assertEqual(graph.get_outdated(previous, {'c': set(ALL)}),
+                         set(['b.html', 'c.html', 'archive.html',
+                              'page2.html']),
+                         'neighbours and archive should be outdated if '
+                         'header changes')
+
+    def test_key_changed(self):
+        previous = self._create_graph()
+        graph = self._create_graph(archive=('a', 'c'))
+        self.assertEqual(graph.get_outdated(previous, {}),
+                         set(['archive.html']),
+                         'page should be outdated if its key changes')
+
+    def test_pickle(self):
+        previous = pickle.loads(pickle.dumps(self._create_graph()))
+        graph = self._create_graph()
+        self.assertEqual(graph.get_outdated(previous, {}), set(),
+                         'unpickled graph should be equal to original one')
+        self.assertEqual(sorted(previous.get_dependents('a')),
+                         ['a.html', 'archive.html', 'b.html', 'index.html'],
+                         'dependents should be restored after unpickling')
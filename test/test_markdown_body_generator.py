@@ -273,3 +273,100 @@ class TestMarkdownBodyGenerator(unittest.TestCase):
                          'generator should include local reference when '
                          'local file is detected')
 
+    def test_generator_reuse(self):
+        gen = MarkdownBodyGenerator()
+        filename, _, _, _ = self.get_filenames()
+        result, req = gen.generate('An [example link][1]\n\n'
+                                   '[1]: ' + filename + '\n\n'
+                                   '    ::latex\n'
+                                   '    x^2',
+                                   relocator=self.get_relocator())
+        self.assertEqual(len(req['local_references']), 1,
+                         'generator should include local reference in the '
+                         'first document')
+        self.assertTrue('header_scripts' in req,
+                        'generator should include header scripts of LaTeX '
+                        'in the first document')
+        result, req = gen.generate('An [example link][1]',
+                                   relocator=self.get_relocator())
+        self.assertEqual(result, '<p>An [example link][1]</p>',
+                         'references of previous document should not be '
+                         'used when generator is reused')
+        self.assertEqual(len(req['local_references']), 0,
+                         'local references of previous document should not '
+                         'be included when generator is reused')
+        self.assertFalse('header_scripts' in req,
+                         'header scripts of previous document should not be '
+                         'included when generator is reused')
+
+    def test_generate_with_abstract(self):
+        gen = MarkdownBodyGenerator()
+        abstract = 'An [example link](http://example.com/)\n\n' \
+                   '    ::python\n' \
+                   '    print 1\n'
+        body = abstract + '\nThe rest of *the article*.'
+        (abstract_html, _), (full_html, _) = gen.generate_with_abstract(
+            abstract, body, relocator=self.get_relocator())
+        self.assertEqual(abstract_html,
+                         gen.generate(abstract,
+                                      relocator=self.get_relocator())[0],
+                         'abstract generated in one pass should be the same '
+                         'as the one generated separately')
+        self.assertEqual(full_html,
+                         gen.generate(body, relocator=self.get_relocator())[0],
+                         'full body generated in one pass should be the same '
+                         'as the one generated separately')
+
+    def test_generate_with_abstract_metadata(self):
+        gen = MarkdownBodyGenerator()
+        filename, image, _, _ = self.get_filenames()
+        abstract = 'An [local file link](' + filename + ')\n'
+        body = abstract + '\n![image](' + image + ')\n\n' \
+                          '    ::latex\n' \
+                          '    x^2'
+        (_, abstract_meta), (_, full_meta) = gen.generate_with_abstract(
+            abstract, body, relocator=self.get_relocator())
+        _, meta = gen.generate(abstract, relocator=self.get_relocator())
+        self.assertEqual(abstract_meta, meta,
+                         'metadata of abstract generated in one pass should '
+                         'only come from the abstract')
+        _, meta = gen.generate(body, relocator=self.get_relocator())
+        self.assertEqual(full_meta, meta,
+                         'metadata of full body generated in one pass should '
+                         'be the same as the one generated separately')
+
+    def test_generate_with_abstract_in_block(self):
+        gen = MarkdownBodyGenerator()
+        for abstract, rest in (('- item\n', '\n    continued\n\n- next'),
+                               ('> quote\n', '\n> continued'),
+                               ('    print 1\n', '\n    print 2'),
+                               ('```\nprint 1\n', '\nprint 2\n```')):
+            body = abstract + rest
+            (abstract_html, _), (full_html, _) = gen.generate_with_abstract(
+                abstract, body, relocator=self.get_relocator())
+            self.assertEqual(abstract_html,
+                             gen.generate(abstract,
+                                          relocator=self.get_relocator())[0],
+                             'abstract should be generated separately if '
+                             'MORE separator is inside a block')
+            self.assertEqual(full_html,
+                             gen.generate(body,
+                                          relocator=self.get_relocator())[0],
+                             'full body should be generated separately if '
+                             'MORE separator is inside a block')
+
+    def test_generate_with_abstract_fallback(self):
+        gen = MarkdownBodyGenerator()
+        abstract = '<div>\nAn unclosed HTML block'
+        body = abstract + '\nwhich continues here.\n</div>'
+        (abstract_html, _), (full_html, _) = gen.generate_with_abstract(
+            abstract, body, relocator=self.get_relocator())
+        self.assertEqual(abstract_html,
+                         gen.generate(abstract,
+                                      relocator=self.get_relocator())[0],
+                         'abstract should be generated separately if MORE '
+                         'separator is not surrounded by blank lines')
+        self.assertEqual(full_html,
+                         gen.generate(body, relocator=self.get_relocator())[0],
+                         'full body should be generated separately if MORE '
+                         'separator is not surrounded by blank lines')
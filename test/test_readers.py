@@ -200,6 +200,26 @@ class TestYamlReader(unittest.TestCase):
                           'content should be none if requesting to read '
                           'header only')
 
+    def test_read_parsed_header(self):
+        class Reader(YamlHeaderedContentReader):
+            def _parse_header(self, header, base=None):
+                raise AssertionError('header should not be parsed again')
+
+        reader = YamlHeaderedContentReader()
+        s = [self._create_stream_f_utf8(),
+             self._create_stream_f_gb18030(),
+             self._create_stream_f_euc_jp(),
+             self._create_stream_fm_utf8()]
+        for stream in s:
+            expected = reader.read(stream)
+            result = Reader().read(stream, parsed_header=expected[0])
+            self.assertEqual(result, expected,
+                             'payload should be read the same with header '
+                             'parsed before')
+            self.assertIs(result[0], expected[0],
+                          'header parsed before should be returned')
+        self._destroy_buffers(s)
+
     def test_read_entire_file(self):
         reader = YamlHeaderedContentReader()
         s = [self._create_stream_h_utf8(),
@@ -329,3 +349,66 @@ class TestYamlReader(unittest.TestCase):
                          'content should be correctly parsed and default '
                          'separator should remain in the content when '
                          'customize separator is found')
+
+    def test_read_encoding_not_on_first_line(self):
+        reader = YamlHeaderedContentReader()
+        data = [(u'title: 中文标题\n'
+                 u'"encoding" : gb18030  # comment\n'
+                 u'\n'
+                 u'内容\n'),
+                (u'{title: 中文标题,\n'
+                 u' encoding: gb18030}\n'
+                 u'\n'
+                 u'内容\n')]
+        for item in data:
+            header, _, body = reader.read(
+                io.BytesIO(item.encode('gb18030')))
+            self.assertEqual(header['title'], u'中文标题',
+                             'title should be decoded with encoding '
+                             'specified after other settings')
+            self.assertEqual(body, u'内容',
+                             'content should be decoded with encoding '
+                             'specified after other settings')
+
+    def test_read_bytes_same_as_lines(self):
+        reader = YamlHeaderedContentReader()
+        data = [u'title: Test\n\nLine 1\r\nLine 2\r\n--MORE--\r\nLine 3\r\n',
+                u'title: Test\n\n--MORE--\nLine 1\n\n',
+                u'title: Test\n\nLine 1\n--MORE--',
+                u'title: Test\n\n\n\n--MORE--\n\n',
+                u'title: Test\n',
+                u'\nLine 1\n',
+                u'title: Test\n\nLine 1\rLine 2\n',
+                u'title: Test\n\nLine 1\u2028Line 2\n',
+                u'encoding: latin-1\n\nCaf\xe9\n']
+        streams = [self._create_stream_f_utf8(),
+                   self._create_stream_f_gb18030(),
+                   self._create_stream_f_euc_jp(),
+                   self._create_stream_fm_utf8(),
+                   self._create_stream_fnm_utf8()]
+        streams.extend(io.BytesIO(item.encode('utf-8')) for item in data)
+        for s in streams:
+            for read_payload in (True, False):
+                self.assertEqual(reader.read(s, read_payload),
+                                 reader._read_lines(s, read_payload, None),
+                                 'reading at byte level should give the '
+                                 'same result as reading line by line')
+        self._destroy_buffers(streams)
+
+    def test_read_other_header_formats(self):
+        data = [('.json', u'{"encoding": "gb18030", "title": "中文标题",\n'
+                          u' "more_separator": "-MORE-"}\n'),
+                ('.kv', u'title: 中文标题\n'
+                        u'encoding: gb18030\n'
+                        u"more_separator: '-MORE-'\n")]
+        for extension, header in data:
+            reader = HeaderedContentReader.from_extension(extension)
+            s = io.BytesIO((header + u'\n摘要\n-MORE-\n内容\n').encode(
+                'gb18030'))
+            result = reader.read(s)
+            self.assertEqual(result[0]['title'], u'中文标题',
+                             'header should be parsed with encoding '
+                             'specified in %s header' % extension)
+            self.assertEqual(result[1:], (u'摘要', u'摘要\n内容'),
+                             'payload should be separated with separator '
+                             'specified in %s header' % extension)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+test.test_watcher
+~~~~~~~~~~~~~~~~~
+
+This is the unit test file for watchers of changed files.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+
+from zkb.watcher import PollingWatcher
+
+
+class TestPollingWatcher(unittest.TestCase):
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        os.makedirs(os.path.join(self.root, '_site'))
+        self._write('article.md', 'content')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _write(self, name, content):
+        filename = os.path.join(self.root, name)
+        with open(filename, 'wb') as f:
+            f.write(content)
+        return filename
+
+    def test_wait(self):
+        watcher = PollingWatcher([self.root, os.path.join(self.root, '_site')],
+                                 [os.path.join(self.root, '_site')], ['.*'],
+                                 interval=0.05)
+        self.assertEqual(watcher.roots, [self.root],
+                         'directory inside watched one should not be '
+                         'watched twice')
+        self.assertEqual(watcher.wait(0.1), set(),
+                         'nothing should be changed')
+        self._write(os.path.join('_site', 'index.html'), 'output')
+        self._write('.article.md.swp', 'swap')
+        self.assertEqual(watcher.wait(0.1), set(),
+                         'ignored files should not be reported')
+        changed = self._write('article.md', 'changed content')
+        added = self._write('new.md', 'new')
+        self.assertEqual(watcher.wait(1), set([changed, added]),
+                         'changed and added files should be reported')
+        os.remove(added)
+        self.assertEqual(watcher.wait(1), set([added]),
+                         'removed files should be reported')
@@ -11,8 +11,12 @@ Converter from payload of input file to body content of output.
 
 import re
 import os
+import cgi
+import uuid
 import hashlib
 
+import markdown
+import pygments
 from markdown import Markdown
 from markdown.inlinepatterns import LinkPattern
 from markdown.inlinepatterns import ReferencePattern
@@ -23,7 +27,12 @@ from markdown.inlinepatterns import REFERENCE_RE
 from markdown.inlinepatterns import IMAGE_LINK_RE
 from markdown.inlinepatterns import IMAGE_REFERENCE_RE
 from markdown.inlinepatterns import SHORT_REF_RE
+from markdown.treeprocessors import Treeprocessor
+from markdown.util import etree
 
+from zkb import __version__
+from zkb.cache import get_cache_key
+from zkb.cache import get_file_hash
 from zkb.log import logger
 from zkb.mdext.blockformatter import BlockHtmlFormatterExtension
 from zkb.mdext.blockformatter import CODE_HIGHLIGHT_CLASS
@@ -32,7 +41,17 @@ from zkb.mdext.latexblock import LatexBlockHtmlFormatter
 
 
 _REMOTE_LINK_PATTERN = re.compile(r'(\w+:)?//.+')
-_BLOCK_SIZE = 65536
+# Targets of inline links and images, and of reference definitions. Files
+# found by this pattern are hashed together before converting the payload.
+_LINK_TARGET_PATTERN = re.compile(
+    r'\]\(\s*<?([^\s)>]+)|^ {0,3}\[[^\]]+\]:\s*<?([^\s>]+)', re.M)
+
+# First line of the payload after MORE separator which continues a list,
+# a quote or a code block of the abstract.
+_CONTINUATION_PATTERN = re.compile(r'\s|[*+-]\s|\d+\.\s|>')
+
+#: Versions of packages affecting generated content, used in cache keys.
+_CACHE_VERSIONS = (__version__, markdown.version, pygments.__version__)
 
 
 class RelocatingImagePattern(ImagePattern):
@@ -127,18 +146,139 @@ class RelocatingReferencePattern(ReferencePattern):
         return el
 
 
+class AbstractMarkerTreeprocessor(Treeprocessor):
+    """Markdown tree processor finding the marker paragraph put at the
+    position of MORE separator, which is run before block formatting. If the
+    marker is a top-level paragraph, blocks before it are formatted first,
+    so that requisites of the abstract are known.
+
+    :param md: markdown instance.
+    :param extension: the block formatter extension.
+    :type extension: BlockHtmlFormatterExtension
+    """
+
+    def __init__(self, md, extension):
+        super(AbstractMarkerTreeprocessor, self).__init__(md)
+        self.extension = extension
+        self.marker = None
+        self.requisites = None
+
+    def run(self, root):
+        self.requisites = None
+        if self.marker is None:
+            return
+        for index, child in enumerate(root):
+            if child.tag == 'p' and child.text == self.marker \
+                    and len(child) == 0:
+                abstract = etree.Element('div')
+                abstract.extend(root[:index])
+                # Formatted blocks are not formatted again with the document.
+                self.markdown.treeprocessors['blockformatter'].run(abstract)
+                self.requisites = self.extension.get_requisites()
+                return
+
+
+def _get_resource_url(target):
+    """Get URL of a relocated resource.
+
+    :param target: parts of the relocated path.
+    :type target: list
+    :rtype: str
+    """
+    return '/' + '/'.join(target)
+
+
+def _get_base_dir(base):
+    """Get the directory where local references are resolved, in the same way
+    as :class:`ResourceRelocator`.
+
+    :param base: the article file or its directory.
+    :type base: str
+    :rtype: str
+    """
+    if os.path.isfile(base):
+        return os.path.dirname(os.path.abspath(base))
+    return os.path.abspath(base)
+
+
+def _get_relative_path(filename, start):
+    """Get a path relative to a directory, or the path itself if it is not
+    possible.
+
+    :param filename: the path.
+    :type filename: str
+    :param start: the directory.
+    :type start: str
+    :rtype: str
+    """
+    try:
+        return os.path.relpath(filename, start)
+    except ValueError:
+        # On another drive
+        return filename
+
+
+def _map_references(result, func):
+    """Map file names of local references in the result of a body generator.
+
+    :param result: the result of :func:`BodyGenerator.generate` or
+        :func:`BodyGenerator.generate_with_abstract`.
+    :type result: tuple
+    :param func: function taking a file name and its relocated path, and
+        returning the new file name.
+    :return: a new result.
+    :rtype: tuple
+    """
+    if isinstance(result[0], tuple):
+        return tuple(_map_references(item, func) for item in result)
+    html, meta = result
+    meta = dict(meta)
+    meta['local_references'] = dict(
+        (func(filename, target), target)
+        for filename, target in meta.get('local_references', {}).iteritems())
+    return html, meta
+
+
+def _is_blank_line(line):
+    """Check whether a line of Markdown is blank.
+
+    :param line: the line.
+    :type line: str
+    :rtype: bool
+    """
+    return len(line.strip()) == 0
+
+
+def _starts_new_block(payload):
+    """Check whether Markdown payload starts a new top-level block, rather
+    than continuing a list, a quote or a code block before it.
+
+    :param payload: the payload.
+    :type payload: str
+    :rtype: bool
+    """
+    for line in payload.split(u'\n'):
+        if not _is_blank_line(line):
+            return _CONTINUATION_PATTERN.match(line) is None
+    return True
+
+
 class ResourceRelocator(object):
-    """Relocate resources to a specific directory."""
+    """Relocate resources to a specific directory.
 
-    def __init__(self, base, prefix='resources', url_prefix=None):
+    :param hash_cache: memo of file hashes shared by all articles, or None if
+        files should be hashed every time.
+    :type hash_cache: FileHashCache
+    """
+
+    def __init__(self, base, prefix='resources', url_prefix=None,
+                 hash_cache=None):
         super(ResourceRelocator, self).__init__()
         self.resources = {}
-        if os.path.isfile(base):
-            self.base_dir = os.path.dirname(os.path.abspath(base))
-        else:
-            self.base_dir = os.path.abspath(base)
+        self.base_dir = _get_base_dir(base)
         self.prefix = prefix
         self.url_prefix = url_prefix
+        self.hash_cache = hash_cache
 
     def _should_relocate(self, src):
         """Check whether a reference should be relocated.
@@ -156,17 +296,30 @@ class ResourceRelocator(object):
         :type filename: str
         :rtype: str
         """
-        hasher = hashlib.sha1()
-        try:
-            with open(filename, 'rb') as stream:
-                buf = stream.read(_BLOCK_SIZE)
-                while len(buf) > 0:
-                    hasher.update(buf)
-                    buf = stream.read(_BLOCK_SIZE)
-            return hasher.hexdigest()
-        except IOError as e:
-            logger.debug('Error while hashing file: %s' % e.strerror)
-        return None
+        if self.hash_cache is not None:
+            return self.hash_cache.get_hash(filename)
+        return get_file_hash(filename)
+
+    def prefetch(self, body):
+        """Hash files that are likely referenced by a Markdown payload all at
+        once, so that large files are hashed in parallel before they are
+        relocated one by one.
+
+        :param body: the payload.
+        :type body: str
+        """
+        if self.hash_cache is None:
+            return
+        filenames = []
+        for match in _LINK_TARGET_PATTERN.finditer(body):
+            src = match.group(1) or match.group(2)
+            if _REMOTE_LINK_PATTERN.match(src):
+                continue
+            filename = os.path.join(self.base_dir, src)
+            if os.path.isfile(filename):
+                filenames.append(filename)
+        if len(filenames) > 1:
+            self.hash_cache.get_hashes(filenames)
 
     def _get_relocate_dir(self, filename):
         """Relocate a local file into specific directory.
@@ -195,28 +348,30 @@ class ResourceRelocator(object):
         :return: relocated resource path.
         :rtype: str
         """
-
-        def _to_url(array):
-            return '/' + '/'.join(array)
-
         if not self._should_relocate(src):
             return None
         filename = os.path.join(self.base_dir, src)
         if filename in self.resources:
-            return _to_url(self.resources[filename])
+            return _get_resource_url(self.resources[filename])
         target = self._get_relocate_dir(filename)
         if target is not None:
             self.resources[filename] = target
-            return _to_url(target)
+            return _get_resource_url(target)
         return None
 
 
 class BodyGenerator(object):
     """Base generator class for creating main content of the article from body
     of the article file.
+
+    :param options: options of the generator. Options not supported by the
+        generator are ignored.
     """
 
-    def __init__(self):
+    #: Whether generated content is worth being cached.
+    cacheable = False
+
+    def __init__(self, **options):
         super(BodyGenerator, self).__init__()
 
     @classmethod
@@ -262,11 +417,73 @@ class BodyGenerator(object):
         """
         pass
 
+    def generate_with_abstract(self, abstract, body, **options):
+        """Generate the content of both the abstract and the full body of the
+        payload of a file. The default implementation calls :func:`generate`
+        for each of them.
+
+        :param abstract: payload content before MORE separator.
+        :type abstract: str
+        :param body: full payload content, which starts with the abstract.
+        :type body: str
+        :return: a tuple of two elements, which are tuples of generated content
+            and metadata dictionary of the abstract and the full body,
+            respectively.
+        :rtype: tuple
+        """
+        return (self.generate(abstract, **options),
+                self.generate(body, **options))
+
 
 class MarkdownBodyGenerator(BodyGenerator):
     """Generator for generating body content from Markdown payload.
+
+    The Markdown instance, its extensions and patterns are created on first
+    use and reused by following calls of :func:`generate`, being reset
+    between documents.
+
+    :param highlight_cache: persistent cache of highlighted code blocks, or
+        None if highlighted code blocks should only be kept in memory.
+    :param hash_cache: memo of hashes of referenced files, or None if files
+        should be hashed every time they are referenced.
     """
 
+    cacheable = True
+
+    def __init__(self, highlight_cache=None, hash_cache=None, **options):
+        super(MarkdownBodyGenerator, self).__init__(**options)
+        self.highlight_cache = highlight_cache
+        self.hash_cache = hash_cache
+        self._md = None
+        self._ext = None
+        self._marker = None
+        self._patterns = None
+
+    def _create_engine(self):
+        """Create the Markdown instance with all extensions and patterns.
+        """
+        self._ext = BlockHtmlFormatterExtension({
+            'code': CodeBlockHtmlFormatter(css_class=CODE_HIGHLIGHT_CLASS,
+                                           cache=self.highlight_cache),
+            'latex': LatexBlockHtmlFormatter()
+        })
+        md = Markdown(output_format='html5', extensions=[self._ext])
+        self._marker = AbstractMarkerTreeprocessor(md, self._ext)
+        md.treeprocessors.add('abstractmarker', self._marker,
+                              '<blockformatter')
+        self._patterns = {
+            'reference': RelocatingReferencePattern(REFERENCE_RE, md, None),
+            'link': RelocatingLinkPattern(LINK_RE, md, None),
+            'image_link': RelocatingImagePattern(IMAGE_LINK_RE, md, None),
+            'image_reference': RelocatingImageReferencePattern(
+                IMAGE_REFERENCE_RE, md, None),
+            'short_reference': RelocatingReferencePattern(
+                SHORT_REF_RE, md, None),
+        }
+        for pattern, instance in self._patterns.iteritems():
+            md.inlinePatterns[pattern] = instance
+        self._md = md
+
     def generate(self, body, **options):
         """Override to generate content from Markdown payload.
 
@@ -276,35 +493,224 @@ class MarkdownBodyGenerator(BodyGenerator):
             dictionary, respectively.
         :rtype: tuple
         """
-        ext = BlockHtmlFormatterExtension({
-            'code': CodeBlockHtmlFormatter(css_class=CODE_HIGHLIGHT_CLASS),
-            'latex': LatexBlockHtmlFormatter()
-        })
-        md = Markdown(output_format='html5', extensions=[ext])
+        if self._md is None:
+            self._create_engine()
+        else:
+            self._md.reset()
         if 'relocator' in options:
             relocator = options['relocator']
         elif 'url' in options:
             relocator = ResourceRelocator(options['base'],
-                                          url_prefix=options['url'][1:-1])
+                                          url_prefix=options['url'][1:-1],
+                                          hash_cache=self.hash_cache)
         else:
-            relocator = ResourceRelocator(options['base'])
-        recorded_patterns = {
-            'reference': RelocatingReferencePattern(
-                REFERENCE_RE, md, relocator),
-            'link': RelocatingLinkPattern(LINK_RE, md, relocator),
-            'image_link': RelocatingImagePattern(IMAGE_LINK_RE, md, relocator),
-            'image_reference': RelocatingImageReferencePattern(
-                IMAGE_REFERENCE_RE, md, relocator),
-            'short_reference': RelocatingReferencePattern(
-                SHORT_REF_RE, md, relocator),
-        }
-        for pattern, instance in recorded_patterns.iteritems():
-            md.inlinePatterns[pattern] = instance
-        output = md.convert(body)
-        meta = ext.get_requisites()
+            relocator = ResourceRelocator(options['base'],
+                                          hash_cache=self.hash_cache)
+        relocator.prefetch(body)
+        for instance in self._patterns.itervalues():
+            instance.relocator = relocator
+        output = self._md.convert(body)
+        meta = self._ext.get_requisites()
         meta['local_references'] = relocator.resources
         return output, meta
 
+    def generate_with_abstract(self, abstract, body, **options):
+        """Override to convert the full body only once, with a marker paragraph
+        put at the position of MORE separator. The abstract is then cut from
+        the generated content at the marker.
+
+        Metadata of the abstract only includes requisites of blocks before the
+        marker, and local references shown in the abstract.
+
+        If the MORE separator is not surrounded by a blank line, the payload
+        after it continues a list, a quote or a code block, or the marker does
+        not come out as a top-level paragraph (e.g. when the abstract ends
+        inside a fenced code block), the abstract and the full body are
+        converted separately.
+
+        :param abstract: payload content before MORE separator.
+        :type abstract: str
+        :param body: full payload content, which starts with the abstract.
+        :type body: str
+        :return: a tuple of two elements, which are tuples of generated content
+            and metadata dictionary of the abstract and the full body,
+            respectively.
+        :rtype: tuple
+        """
+        if body.startswith(abstract):
+            rest = body[len(abstract) + 1:]
+            if (_is_blank_line(abstract.rsplit(u'\n', 1)[-1]) or
+                    _is_blank_line(rest.split(u'\n', 1)[0])) and \
+                    _starts_new_block(rest):
+                marker = u'zkbmore' + uuid.uuid4().hex
+                if self._md is None:
+                    self._create_engine()
+                self._marker.marker = marker
+                try:
+                    output, meta = self.generate(
+                        abstract + u'\n\n' + marker + u'\n\n' + rest,
+                        **options)
+                    requisites = self._marker.requisites
+                finally:
+                    self._marker.marker = None
+                parts = output.split(u'<p>' + marker + u'</p>')
+                if requisites is not None and len(parts) == 2 and \
+                        marker not in parts[0] and marker not in parts[1]:
+                    abstract_html = parts[0].rstrip(u'\n')
+                    rest_html = parts[1].lstrip(u'\n')
+                    if len(abstract_html) == 0 or len(rest_html) == 0:
+                        full_html = abstract_html + rest_html
+                    else:
+                        full_html = abstract_html + u'\n' + rest_html
+                    abstract_meta = dict(requisites)
+                    abstract_meta['local_references'] = dict(
+                        (filename, target) for filename, target in
+                        meta['local_references'].iteritems()
+                        if cgi.escape(_get_resource_url(target), True)
+                        in abstract_html)
+                    meta['local_references'] = dict(
+                        meta['local_references'])
+                    return (abstract_html, abstract_meta), (full_html, meta)
+        logger.debug('Converting abstract and full body separately.')
+        return super(MarkdownBodyGenerator, self).generate_with_abstract(
+            abstract, body, **options)
+
+
+class CachedBodyGenerator(BodyGenerator):
+    """Generator caching content generated by another generator in a
+    :class:`~zkb.cache.DiskCache`.
+
+    Entries are keyed by type of the wrapped generator, the payload, site URL,
+    directory of the article relative to current directory and versions of
+    ZKB, Markdown and Pygments, so that they are still valid after the source
+    is checked out again. Local references are recorded relative to directory
+    of the article, and an entry is ignored if any referenced file no longer
+    has the same content.
+
+    Generation with a relocator specified in options is never cached.
+
+    :param generator: the generator to be wrapped.
+    :type generator: BodyGenerator
+    :param cache: cache of generated content.
+    :type cache: DiskCache
+    :param hash_cache: memo of hashes of referenced files, or None if files
+        should be hashed every time they are checked.
+    :type hash_cache: FileHashCache
+    """
+
+    def __init__(self, generator, cache, hash_cache=None):
+        super(CachedBodyGenerator, self).__init__()
+        self.generator = generator
+        self.cache = cache
+        self.hash_cache = hash_cache
+
+    def generate(self, body, **options):
+        """Override to generate content with the wrapped generator, or get it
+        from cache.
+        """
+        return self._generate('generate', (body,), options)
+
+    def generate_with_abstract(self, abstract, body, **options):
+        """Override to generate content of abstract and full body with the
+        wrapped generator, or get it from cache.
+        """
+        return self._generate('generate_with_abstract', (abstract, body),
+                              options)
+
+    def _generate(self, method, payloads, options):
+        """Call a method of the wrapped generator, or get its result from
+        cache.
+
+        :param method: name of the method.
+        :type method: str
+        :param payloads: payload arguments of the method.
+        :type payloads: tuple
+        :param options: options of the method.
+        :type options: dict
+        :rtype: tuple
+        """
+        generate = getattr(self.generator, method)
+        if 'relocator' in options or 'base' not in options:
+            return generate(*payloads, **options)
+        base_dir = _get_base_dir(options['base'])
+        key = get_cache_key(
+            method, type(self.generator).__name__, _CACHE_VERSIONS,
+            options.get('url'), _get_relative_path(base_dir, os.curdir),
+            [hashlib.sha1(payload.encode('utf-8')).hexdigest()
+             for payload in payloads])
+        value = self.cache.get(key)
+        if value is not None:
+            result = self._restore(key, value, base_dir)
+            if result is not None:
+                return result
+        result = generate(*payloads, **options)
+        value = self._store(result, base_dir)
+        if value is not None:
+            self.cache.set(key, value)
+        return result
+
+    def _store(self, result, base_dir):
+        """Create a cache entry from a result of the wrapped generator.
+
+        :return: the entry, or None if the result cannot be cached.
+        :rtype: dict
+        """
+        references = {}
+
+        def _to_relative(filename, target):
+            name = _get_relative_path(filename, base_dir)
+            if name not in references:
+                st = os.stat(filename)
+                references[name] = (st.st_size, st.st_mtime,
+                                    ''.join(target[-4:-1]))
+            return name
+
+        try:
+            result = _map_references(result, _to_relative)
+        except OSError:
+            return None
+        return {'result': result, 'references': references}
+
+    def _restore(self, key, value, base_dir):
+        """Restore a result of the wrapped generator from a cache entry.
+        Referenced files whose size or modification time changed are hashed
+        again, and the entry is updated if they still have the same content.
+
+        :return: the result, or None if the entry is outdated.
+        :rtype: tuple
+        """
+
+        def _to_absolute(name, _):
+            return os.path.normpath(os.path.join(base_dir, name))
+
+        references = value['references']
+        changed = {}
+        for name, (size, mtime, file_hash) in references.iteritems():
+            filename = _to_absolute(name, None)
+            try:
+                st = os.stat(filename)
+            except OSError:
+                return None
+            if st.st_size != size:
+                return None
+            if st.st_mtime != mtime:
+                changed[filename] = (name, st.st_mtime)
+        updated = len(changed) > 0
+        if updated:
+            if self.hash_cache is not None:
+                hashes = self.hash_cache.get_hashes(changed)
+            else:
+                hashes = dict((filename, get_file_hash(filename))
+                              for filename in changed)
+            for filename, (name, mtime) in changed.iteritems():
+                size, _, file_hash = references[name]
+                if hashes[filename] != file_hash:
+                    return None
+                references[name] = (size, mtime, file_hash)
+        if updated:
+            self.cache.set(key, value)
+        return _map_references(value['result'], _to_absolute)
+
 
 class HtmlBodyGenerator(BodyGenerator):
     """Generator for generating body content from HTML payload.
@@ -11,11 +11,16 @@ Build content of the article, convert to source format to HTML format.
 
 import datetime
 import codecs
+import io
 import os
+import hashlib
 import shutil
+import filecmp
+import multiprocessing
 import types
 import sys
-from itertools import tee, islice, chain, izip
+from itertools import tee, islice, chain, izip, groupby
+from multiprocessing.pool import ThreadPool
 
 import pkg_resources
 from slugify import slugify
@@ -23,79 +28,428 @@ from jinja2 import Environment, PackageLoader, FileSystemLoader, ChoiceLoader
 
 from zkb.readers import HeaderedContentReader
 from zkb.bodygenerators import BodyGenerator, SUPPORTED_GENERATOR_EXTENSIONS
+from zkb.bodygenerators import CachedBodyGenerator
+from zkb.cache import DiskCache, FileHashCache, TemplateBytecodeCache
+from zkb.walker import walk_files, filter_files
+from zkb.mdext.codeblock import lexer_registry
 from zkb.localization import LocalizationData
 from zkb.utils import UnknownBuilderError
 from zkb.config import SiteConfig, ArticleConfig
+from zkb.manifest import ManifestEntry, BuildManifest
+from zkb.manifest import get_content_hash, get_header_digest
+from zkb import depgraph
+from zkb import vcs
 from zkb.log import logger
 
 
 _INDEX_PAGE = 'index.html'
 _404_PAGE = '404.html'
+_BLOCK_SIZE = 65536
+_BODY_CACHE_DIR = 'bodies'
+_HIGHLIGHT_CACHE_DIR = 'highlights'
+_FILE_HASH_CACHE_FILE = 'hashes.pickle'
+_TEMPLATE_CACHE_DIR = 'templates'
+_TEMPLATE_EXTENSION = '.html'
+_PACKAGE_TEMPLATE_DIR = 'templates/default'
 
 
 class FileProcessor(object):
     _ARTICLE_HEADER_TYPE = 'yaml'
 
     """Actual handler of file operation.
+
+    :param write_if_changed: if True, a file is not written when its existing
+        content is the same as the content to be written, so that its
+        modification time is kept.
+    :type write_if_changed: bool
+    :param link_resources: if True, resources are hard linked to their source
+        files instead of being copied where possible.
+    :type link_resources: bool
     """
 
-    def get_article_files(self, dirname, ignored_dirs=None):
+    def __init__(self, write_if_changed=False, link_resources=False):
+        super(FileProcessor, self).__init__()
+        self.write_if_changed = write_if_changed
+        self.link_resources = link_resources
+        self._stats = {}
+
+    def get_article_files(self, dirname, ignored_dirs=None,
+                          ignored_patterns=None):
+        """Find all article files in a directory tree.
+
+        Stat results of found files are kept, so that :func:`stat` does not
+        query them again until the next call of this function.
+
+        :param dirname: root of the tree.
+        :type dirname: str
+        :param ignored_dirs: directories whose subtrees are ignored.
+        :type ignored_dirs: list of str
+        :param ignored_patterns: glob patterns of names of ignored files and
+            directories.
+        :type ignored_patterns: list of str
+        :return: a list of tuples of full path, name, modification time, header
+            type and content type (always None) of each article.
+        :rtype: list
+        """
         all_article_files = []
-        if ignored_dirs is None:
-            ignored_dirs = []
-        else:
-            ignored_dirs = [os.path.realpath(path) for path in ignored_dirs]
-        for root, dirs, files in os.walk(dirname):
-            real_path = os.path.realpath(root)
-            should_ignore = False
-            for ignored_dir in ignored_dirs:
-                relative = os.path.relpath(ignored_dir, real_path)
-                if relative == os.curdir or relative == os.pardir \
-                        or relative.startswith(os.pardir + os.sep):
-                    should_ignore = True
-                    break
-            if should_ignore:
+        self._stats = {}
+        for full_path, st in walk_files(dirname, ignored_dirs,
+                                        ignored_patterns,
+                                        SUPPORTED_GENERATOR_EXTENSIONS):
+            self._stats[full_path] = st
+            all_article_files.append(
+                self._get_article_file(full_path, st.st_mtime))
+        return all_article_files
+
+    def get_resource_files(self, dirname, ignored_patterns=None):
+        """Find all files in a template directory which are not templates.
+
+        :param dirname: the template directory.
+        :type dirname: str
+        :param ignored_patterns: glob patterns of names of ignored files and
+            directories.
+        :type ignored_patterns: list of str
+        :return: paths of the files relative to the directory and separated
+            by ``/``.
+        :rtype: list of str
+        """
+        resource_files = []
+        for full_path, _ in walk_files(dirname, None, ignored_patterns):
+            if os.path.splitext(full_path)[1].lower() == _TEMPLATE_EXTENSION:
                 continue
-            for filename in files:
-                full_path = os.path.join(root, filename)
-                extension = os.path.splitext(filename)[1].lower()
-                if extension not in SUPPORTED_GENERATOR_EXTENSIONS:
-                    continue
-                item = (full_path,
-                        os.path.splitext(filename)[0],
-                        datetime.datetime.fromtimestamp(
-                            os.path.getmtime(full_path)),
-                        FileProcessor._ARTICLE_HEADER_TYPE,
-                        None)
-                all_article_files.append(item)
+            resource_files.append('/'.join(os.path.relpath(
+                full_path, dirname).split(os.sep)))
+        return resource_files
+
+    def get_changed_article_files(self, dirname, known_files, changed_files,
+                                  ignored_dirs=None, ignored_patterns=None):
+        """Find all article files in a directory tree, given the article files
+        found before and files changed since then, without walking the tree.
+
+        :param dirname: root of the tree.
+        :type dirname: str
+        :param known_files: a dictionary whose keys are full paths of article
+            files found before, and values are their modification times.
+        :type known_files: dict
+        :param changed_files: paths of files changed since then, relative to
+            the root and separated by ``/``, including removed files.
+        :type changed_files: list of str
+        :param ignored_dirs: directories whose subtrees are ignored.
+        :type ignored_dirs: list of str
+        :param ignored_patterns: glob patterns of names of ignored files and
+            directories.
+        :type ignored_patterns: list of str
+        :return: a list in the same form as :func:`get_article_files` returns.
+        :rtype: list
+        """
+        self._stats = {}
+        changed = set(os.path.join(dirname, *path.split('/'))
+                      for path in changed_files)
+        all_article_files = [
+            self._get_article_file(full_path, mtime)
+            for full_path, mtime in sorted(known_files.iteritems())
+            if full_path not in changed]
+        for full_path, st in filter_files(dirname, changed_files,
+                                          ignored_dirs, ignored_patterns,
+                                          SUPPORTED_GENERATOR_EXTENSIONS):
+            self._stats[full_path] = st
+            all_article_files.append(
+                self._get_article_file(full_path, st.st_mtime))
         return all_article_files
 
+    def _get_article_file(self, full_path, mtime):
+        """Get the item describing an article file.
+
+        :param full_path: path of the file.
+        :type full_path: str
+        :param mtime: modification time of the file.
+        :type mtime: float
+        :return: a tuple of full path, name, modification time, header type and
+            content type (always None) of the article.
+        :rtype: tuple
+        """
+        name = os.path.splitext(os.path.basename(full_path))[0]
+        # Header format can be specified by a secondary extension, such as
+        # 'article.json.md'.
+        name, header_extension = os.path.splitext(name)
+        header_type = HeaderedContentReader.get_type(header_extension)
+        if header_type is None:
+            name += header_extension
+            header_type = FileProcessor._ARTICLE_HEADER_TYPE
+        return (full_path,
+                name,
+                datetime.datetime.fromtimestamp(mtime),
+                header_type,
+                None)
+
     def read(self, filename):
         logger.debug('Reading from \'%s\'...' % filename)
         return open(filename, 'r')
 
+    def _is_unchanged(self, filename, content):
+        """Check whether a file exists and has exactly the given content.
+
+        :param filename: file name.
+        :type filename: str
+        :param content: raw content.
+        :type content: str
+        :rtype: bool
+        """
+        try:
+            if os.path.getsize(filename) != len(content):
+                return False
+            with open(filename, 'rb') as f:
+                offset = 0
+                buf = f.read(_BLOCK_SIZE)
+                while len(buf) > 0:
+                    if buf != content[offset:offset + len(buf)]:
+                        return False
+                    offset += len(buf)
+                    buf = f.read(_BLOCK_SIZE)
+            return offset == len(content)
+        except (IOError, OSError):
+            return False
+
+    def _is_same_file(self, source, destination):
+        """Check whether two files exist and have the same content.
+
+        :param source: source file name.
+        :type source: str
+        :param destination: destination file name.
+        :type destination: str
+        :rtype: bool
+        """
+        try:
+            if os.path.getsize(source) != os.path.getsize(destination):
+                return False
+            return filecmp.cmp(source, destination, shallow=False)
+        except (IOError, OSError):
+            return False
+
+    def _make_dirs(self, dirname):
+        """Create a directory and its parents if they do not exist. Pages
+        are written by concurrent workers, so the directory may be created
+        by another one in the meantime.
+        """
+        if not os.path.exists(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # Created by another worker
+                if not os.path.isdir(dirname):
+                    raise
+
     def write(self, filename, encoding, content):
+        """Write content to a file.
+
+        :return: True if the file is written; False if writing is skipped
+            because content of the file is unchanged.
+        :rtype: bool
+        """
+        content = content.encode(encoding)
+        if self.write_if_changed and self._is_unchanged(filename, content):
+            logger.debug('Skipping unchanged \'%s\'...' % filename)
+            return False
         logger.debug('Writing to \'%s\'...' % filename)
-        dest_dir = os.path.dirname(filename)
-        if not os.path.exists(dest_dir):
-            os.makedirs(dest_dir)
+        self._make_dirs(os.path.dirname(filename))
         with open(filename, 'w+') as f:
-            f.write(content.encode(encoding))
+            f.write(content)
+        return True
+
+    def write_chunks(self, filename, encoding, chunks):
+        """Write unicode chunks to a file, encoding them incrementally, so
+        that the whole content never needs to be held in memory.
+
+        :param chunks: an iterable of unicode strings, such as the generator
+            returned by :func:`jinja2.Template.generate`.
+        :type chunks: iterable
+        :return: True if the file is written; False if writing is skipped
+            because content of the file is unchanged.
+        :rtype: bool
+        """
+        logger.debug('Writing to \'%s\' with chunks...' % filename)
+        self._make_dirs(os.path.dirname(filename))
+        encoder = codecs.getincrementalencoder(encoding)()
+        if not self.write_if_changed:
+            with open(filename, 'wb+') as f:
+                for chunk in chunks:
+                    f.write(encoder.encode(chunk))
+                f.write(encoder.encode(u'', True))
+            return True
+        # Write into a temporary file while comparing with existing content
+        temp_filename = filename + '.tmp'
+        try:
+            existing = open(filename, 'rb')
+        except IOError:
+            existing = None
+        unchanged = existing is not None
+        try:
+            with open(temp_filename, 'wb+') as f:
+                for chunk in chunks:
+                    data = encoder.encode(chunk)
+                    f.write(data)
+                    if unchanged:
+                        unchanged = existing.read(len(data)) == data
+                data = encoder.encode(u'', True)
+                f.write(data)
+                if unchanged:
+                    unchanged = existing.read(len(data)) == data \
+                        and len(existing.read(1)) == 0
+        finally:
+            if existing is not None:
+                existing.close()
+        if unchanged:
+            logger.debug('Skipping unchanged \'%s\'...' % filename)
+            os.remove(temp_filename)
+            return False
+        if os.path.exists(filename):
+            os.remove(filename)
+        os.rename(temp_filename, filename)
+        return True
 
     def write_stream(self, filename, stream):
+        """Write content of a stream to a file in chunks.
+
+        :return: True if the file is written; False if writing is skipped
+            because content of the file is unchanged.
+        :rtype: bool
+        """
+        if self.write_if_changed:
+            return self.sync_stream(filename, stream)
         logger.debug('Writing to \'%s\' with stream...' % filename)
-        dest_dir = os.path.dirname(filename)
-        if not os.path.exists(dest_dir):
-            os.makedirs(dest_dir)
+        self._make_dirs(os.path.dirname(filename))
         with open(filename, 'wb+') as f:
-            f.write(stream.read())
+            shutil.copyfileobj(stream, f, _BLOCK_SIZE)
+        return True
+
+    def sync_stream(self, filename, stream):
+        """Write content of a stream to a file in chunks, unless the file
+        already has the same content. The stream is read only once; content
+        is compared with the file until the first difference, and then
+        written into a temporary file replacing the file.
+
+        :return: True if the file is written; False if writing is skipped
+            because content of the file is unchanged.
+        :rtype: bool
+        """
+        try:
+            existing = open(filename, 'rb')
+        except IOError:
+            existing = None
+        offset = 0
+        buf = stream.read(_BLOCK_SIZE)
+        if existing is not None:
+            with existing:
+                while len(buf) > 0 and existing.read(len(buf)) == buf:
+                    offset += len(buf)
+                    buf = stream.read(_BLOCK_SIZE)
+                if len(buf) == 0 and len(existing.read(1)) == 0:
+                    logger.debug('Skipping unchanged \'%s\'...' % filename)
+                    return False
+        logger.debug('Writing to \'%s\' with stream...' % filename)
+        self._make_dirs(os.path.dirname(filename))
+        temp_filename = filename + '.tmp'
+        with open(temp_filename, 'wb+') as f:
+            if offset > 0:
+                # Content already compared is the same as the existing one
+                with open(filename, 'rb') as existing:
+                    while offset > 0:
+                        data = existing.read(min(offset, _BLOCK_SIZE))
+                        if len(data) == 0:
+                            break
+                        f.write(data)
+                        offset -= len(data)
+            while len(buf) > 0:
+                f.write(buf)
+                buf = stream.read(_BLOCK_SIZE)
+        if os.path.exists(filename):
+            os.remove(filename)
+        os.rename(temp_filename, filename)
+        return True
+
+    def sync_file(self, source, destination):
+        """Copy a file in chunks, unless the destination already has the same
+        content. A destination of the same size and modification time as the
+        source is taken as unchanged without being read, as modification
+        time is copied as well.
+
+        :return: True if the file is copied; False if copying is skipped
+            because content of the destination is unchanged.
+        :rtype: bool
+        """
+        st = os.stat(source)
+        try:
+            dest_st = os.stat(destination)
+            # Modification time is copied with less precision on some
+            # platforms.
+            if dest_st.st_size == st.st_size and \
+                    abs(dest_st.st_mtime - st.st_mtime) < 0.001:
+                logger.debug('Skipping unchanged \'%s\'...' % destination)
+                return False
+        except OSError:
+            pass
+        with open(source, 'rb') as stream:
+            written = self.sync_stream(destination, stream)
+        shutil.copystat(source, destination)
+        return written
 
     def copy_file(self, source, destination):
+        """Copy a file.
+
+        :return: True if the file is copied; False if copying is skipped
+            because content of the destination is unchanged.
+        :rtype: bool
+        """
+        if self.write_if_changed and self._is_same_file(source, destination):
+            logger.debug('Skipping unchanged \'%s\'...' % destination)
+            return False
         logger.debug('Copying \'%s\' to \'%s\'...' % (source, destination))
-        dest_dir = os.path.dirname(destination)
-        if not os.path.exists(dest_dir):
-            os.makedirs(dest_dir)
+        self._make_dirs(os.path.dirname(destination))
         shutil.copy2(source, destination)
+        return True
+
+    def copy_resource(self, source, destination):
+        """Copy a resource whose destination is named by hash of its content,
+        so that an existing destination of the same size is known to be
+        unchanged and is never written again. Otherwise, the resource is
+        hard linked to the source if linking resources is enabled and
+        possible, or copied.
+
+        :return: True if the resource is written; False if writing is skipped
+            because the destination already exists.
+        :rtype: bool
+        """
+        try:
+            if os.path.getsize(destination) == os.path.getsize(source):
+                logger.debug('Skipping existing \'%s\'...' % destination)
+                return False
+            # Left by an interrupted copy
+            os.remove(destination)
+        except OSError:
+            pass
+        self._make_dirs(os.path.dirname(destination))
+        if self.link_resources and hasattr(os, 'link'):
+            logger.debug('Linking \'%s\' to \'%s\'...' %
+                         (source, destination))
+            try:
+                os.link(source, destination)
+                return True
+            except OSError as e:
+                # Possibly on different file systems
+                logger.debug('Failed to link, copying instead: %s' % e)
+        logger.debug('Copying \'%s\' to \'%s\'...' % (source, destination))
+        # Copy into a temporary file, so that an interrupted copy is never
+        # taken as complete.
+        temp_filename = '%s.%d.tmp' % (destination, os.getpid())
+        shutil.copy2(source, temp_filename)
+        os.rename(temp_filename, destination)
+        return True
+
+    def stat(self, filename):
+        st = self._stats.get(filename)
+        if st is None:
+            st = os.stat(filename)
+        return st
 
     def exists(self, file):
         logger.debug('Checking file \'%s\'...' % (file))
@@ -111,18 +465,37 @@ class SiteBuilder(object):
     :type config: SiteConfig
     :param fileproc: file processor.
     :type fileproc: FileProcessor
+    :param manifest: manifest of previous build. If provided, unchanged
+        articles will not be parsed again, and the manifest will be updated
+        after building.
+    :type manifest: BuildManifest
+    :param jobs: number of processes used for generating articles. If less
+        than 1, number of CPUs will be used.
+    :type jobs: int
+    :param use_git: if True and article sources are stored in a git
+        repository, only files changed since the commit recorded in the
+        manifest are checked, instead of all files in the article directory.
+    :type use_git: bool
     """
 
-    def __init__(self, config, fileproc=None):
+    def __init__(self, config, fileproc=None, manifest=None, jobs=1,
+                 use_git=False):
         super(SiteBuilder, self).__init__()
         self.config = config
         if fileproc is None:
             self.fileproc = FileProcessor()
         else:
             self.fileproc = fileproc
+        self.manifest = manifest
+        self.use_git = use_git
+        self.changes = {}
+        self._unchanged_sources = None
+        if jobs < 1:
+            jobs = multiprocessing.cpu_count()
+        self.jobs = jobs
 
     @classmethod
-    def from_config(cls, config, fileproc=None):
+    def from_config(cls, config, fileproc=None, **kwargs):
         name = config.site_builder
         try:
             if type(name) not in types.StringTypes or len(name) == 0:
@@ -144,69 +517,35 @@ class SiteBuilder(object):
             raise UnknownBuilderError(name)
         except ImportError:
             raise UnknownBuilderError(name)
-        return constructor(config, fileproc)
+        return constructor(config, fileproc, **kwargs)
 
     def build(self):
         """Main logic for building the site.
         """
+        sources = self._load_site()
+        result = self._do_build()
+        if self.manifest is not None and result == 0:
+            self._save_manifest(sources)
+        return result
+
+    def _load_site(self):
+        """Load all articles into site configuration.
+
+        :return: paths of all source files found.
+        :rtype: list of str
+        """
         articles_by_date = []
         articles_by_tag = {}
         special_articles = {}
-        for full_path, filename, mtime, header_type, content_type in \
-                self.fileproc.get_article_files(
-                        self.config.article_dir, [self.config.output_dir]):
-            # Read article
-            logger.info('Parsing \'%s\'...' % full_path)
-            with self.fileproc.read(full_path) as stream:
-                reader = HeaderedContentReader.from_type(header_type)
-                header, abstract, body = reader.read(stream)
-            article = ArticleConfig(self.config, header)
+        article_files = self._get_article_files()
+        sources = [item[0] for item in article_files]
+        for article in self._load_articles(article_files):
             # Ignore all draft articles
-            if article.draft:
+            if article is None:
                 continue
-            article.source_file = full_path
-            if len(article.title) == 0:
-                article.title = filename
-            article.content_source = body
-            # Generate body
-            if content_type is None:
-                extension = os.path.splitext(full_path)[1].lower()
-                generator = BodyGenerator.from_extension(extension)
-            else:
-                generator = BodyGenerator.from_type(content_type)
-            if abstract is None:
-                article.abstract = None
-            else:
-                article.abstract['html'], meta = generator.generate(
-                    abstract, base=full_path, url=self.config.url)
-                article.abstract.update(meta)
-            article.full['html'], meta = generator.generate(
-                body, base=full_path, url=self.config.url)
-            article.full.update(meta)
-            # Add date object
-            if isinstance(article.date, datetime.date):
-                article.date = datetime.datetime.combine(
-                    article.date, datetime.time(0, 0))
-            elif not isinstance(article.date, datetime.datetime):
-                if len(article.date) == 0:
-                    article.date = mtime
-                else:
-                    article.date = datetime.datetime.strptime(
-                        article.date, self.config.date_format)
-            # Add slug info
-            if len(article.slug) == 0:
-                article.slug = slugify(article.title)
-            # Add tag info
-            if not isinstance(article.tags, str):
-                article.tags = str(article.tags)
-            article.tags = filter(
-                None, [tag.strip() for tag in article.tags.split(',')])
             # Special procedure for special pages.
-            if not isinstance(article.article_type, str):
-                article.article_type = str(article.article_type)
             if article.article_type == ArticleConfig.ABOUT_PAGE \
                     or article.article_type == ArticleConfig.NOT_FOUND_PAGE:
-                article.tags = []
                 special_articles[article.article_type] = article
                 continue
             # Add article reference.
@@ -221,7 +560,237 @@ class SiteBuilder(object):
         self.config.articles_by_date = articles_by_date
         self.config.articles_by_tag = articles_by_tag
         self.config.special_articles = special_articles
-        return self._do_build()
+        return sources
+
+    def reload(self, changed_files):
+        """Prepare for building again in the same process after some files
+        are changed. Unchanged articles are kept in the manifest, so they
+        are not loaded again.
+
+        :param changed_files: real paths of changed files.
+        :type changed_files: iterable of str
+        """
+        pass
+
+    def _get_article_files(self):
+        """Find all article files.
+
+        If git is used and the commit checked out in previous build is known,
+        files are not looked for in the whole article directory. Instead,
+        sources recorded in the manifest are combined with files changed
+        since that commit, and sources not changed are marked so that they
+        are not checked again, except those of articles dated by modification
+        time. Files ignored by git are only found in builds not using git.
+
+        :return: a list of article files returned by
+            :func:`FileProcessor.get_article_files`.
+        :rtype: list
+        """
+        dirname = self.config.article_dir
+        ignored_dirs = [self.config.output_dir, self.config.cache_dir,
+                        self.config.template_dir]
+        self._unchanged_sources = None
+        if not self.use_git or self.manifest is None:
+            return self.fileproc.get_article_files(
+                dirname, ignored_dirs, self.config.ignored_files)
+        commit = vcs.get_head_commit(dirname)
+        current_changes = None
+        if commit is not None:
+            current_changes = vcs.get_changed_files(dirname, commit)
+        changed_files = None
+        if self.manifest.commit is not None and current_changes is not None:
+            if self.manifest.commit == commit:
+                changed_files = list(current_changes)
+            else:
+                changed_files = vcs.get_changed_files(dirname,
+                                                      self.manifest.commit)
+        if changed_files is not None:
+            # Files changed in working tree when previous build started may
+            # be reverted to the content of the commit since then.
+            changed_files = set(changed_files)
+            changed_files.update(self.manifest.changed_files or [])
+        # Record state of the working tree for next build.
+        if current_changes is None:
+            commit = None
+        self.manifest.commit = commit
+        self.manifest.changed_files = current_changes
+        if changed_files is None:
+            logger.info('Changes since previous build are unknown to git, '
+                        'looking for all articles...')
+            return self.fileproc.get_article_files(
+                dirname, ignored_dirs, self.config.ignored_files)
+        logger.info('%d files changed since previous build according to '
+                    'git.' % len(changed_files))
+        changed_paths = set(os.path.abspath(os.path.join(
+            dirname, *path.split('/'))) for path in changed_files)
+        known_files = {}
+        self._unchanged_sources = set()
+        for source, entry in self.manifest.entries.iteritems():
+            known_files[source] = entry.mtime
+            if entry.dated_by_mtime:
+                # Modification time may change without changing content.
+                changed_files.add('/'.join(
+                    os.path.relpath(source, dirname).split(os.sep)))
+                continue
+            if os.path.abspath(source) in changed_paths:
+                continue
+            if any(os.path.abspath(filename) in changed_paths
+                   for filename in entry.references):
+                continue
+            self._unchanged_sources.add(source)
+        return self.fileproc.get_changed_article_files(
+            dirname, known_files, list(changed_files), ignored_dirs,
+            self.config.ignored_files)
+
+    def _load_articles(self, article_files):
+        """Load all articles, reusing the result of previous build recorded in
+        the manifest for sources that are not changed.
+
+        Other articles are loaded in two phases. Headers of all of them are
+        scanned first, so that drafts are dropped without reading their
+        payload. Bodies of the remaining articles are then generated with
+        :func:`_generate_bodies`.
+
+        :param article_files: list of article files returned by
+            :func:`FileProcessor.get_article_files`.
+        :type article_files: list
+        :return: a list of articles in the same order of *article_files*,
+            with None in place of draft articles.
+        :rtype: list
+        """
+        articles = []
+        pending = []
+        for full_path, filename, mtime, header_type, content_type in \
+                article_files:
+            entry, st, content, content_hash = self._find_unchanged(full_path)
+            if entry is not None:
+                logger.debug('Skipping unchanged \'%s\'...' % full_path)
+                articles.append(entry.article)
+                continue
+            article, header = _scan_article(self.config, full_path,
+                                            filename, mtime, header_type,
+                                            content)
+            pending.append((len(articles), st, content_hash, header,
+                            (article, header_type, content_type, content,
+                             header)))
+            articles.append(article)
+        tasks = [task for _, _, _, _, task in pending if task[0] is not None]
+        results = iter(self._generate_bodies(tasks))
+        self.changes = {}
+        for index, st, content_hash, header, task in pending:
+            if task[0] is not None:
+                # Generated articles are copies when made by workers
+                articles[index] = next(results)
+            article = articles[index]
+            if self.manifest is not None:
+                entry = ManifestEntry(article_files[index][0], st.st_size,
+                                      st.st_mtime, content_hash,
+                                      get_header_digest(header, article),
+                                      article)
+                entry.dated_by_mtime = article is not None \
+                    and article.date == article_files[index][2]
+                previous = self.manifest.entries.get(entry.source)
+                if previous is not None \
+                        and previous.header_digest == entry.header_digest:
+                    self.changes[entry.source] = set([depgraph.BODY])
+                else:
+                    self.changes[entry.source] = set(depgraph.ALL)
+                self.manifest.update(entry, self.fileproc.stat)
+        return articles
+
+    def _generate_bodies(self, tasks):
+        """Generate bodies of scanned articles, in worker processes if more
+        than one job is allowed.
+
+        :param tasks: a list of tuples of arguments of
+            :func:`_generate_body` except the site configuration.
+        :type tasks: list
+        :return: articles with body generated, in the same order of *tasks*.
+        :rtype: list of ArticleConfig
+        """
+        if self.jobs > 1 and len(tasks) > 1:
+            pool = multiprocessing.Pool(min(self.jobs, len(tasks)),
+                                        _init_worker, (self.config,))
+            try:
+                chunk_size = max(1, len(tasks) // (self.jobs * 4))
+                results = pool.map(_generate_body_task, tasks, chunk_size)
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            lexer_registry.pop_stats()
+            results = [(_generate_body(self.config, *task),
+                        lexer_registry.pop_stats(), {}) for task in tasks]
+        hash_cache = _get_hash_cache(self.config)
+        for _, _, hash_updates in results:
+            hash_cache.update(hash_updates)
+        hash_cache.save()
+        guess_stats = [sum(values) for values in
+                       zip((0, 0, 0.0), *[stats for _, stats, _ in results])]
+        if guess_stats[0] + guess_stats[1] > 0:
+            logger.info('Languages of %d code blocks guessed in %.3f '
+                        'seconds, %d more remembered.' %
+                        (guess_stats[0], guess_stats[2], guess_stats[1]))
+        results = [result for result, _, _ in results]
+        if len(tasks) > 0:
+            for cache in (_get_body_cache(self.config),
+                          _get_highlight_cache(self.config)):
+                if cache is not None:
+                    cache.trim()
+        return results
+
+    def _find_unchanged(self, full_path):
+        """Find the manifest entry of a source if the source is not changed
+        since previous build. Content of the source is read if size or
+        modification time of the source has changed, unless the source is
+        known to be unchanged according to git.
+
+        :param full_path: path of the source file.
+        :type full_path: str
+        :return: a tuple of four elements, respectively the manifest entry
+            (None if not found), stat result of the source, raw content of the
+            source and its hash (both None if not read).
+        :rtype: tuple
+        """
+        st = None
+        if self._unchanged_sources is not None \
+                and full_path in self._unchanged_sources:
+            return self.manifest.entries[full_path], st, None, None
+        if self.manifest is not None:
+            st = self.fileproc.stat(full_path)
+            entry = self.manifest.find(full_path, st.st_size, st.st_mtime,
+                                       self.fileproc.stat)
+            if entry is not None:
+                return entry, st, None, None
+        with self.fileproc.read(full_path) as stream:
+            stream.seek(0)
+            content = stream.read()
+        if self.manifest is None:
+            return None, st, content, None
+        content_hash = get_content_hash(content)
+        entry = self.manifest.find_by_content(
+            full_path, st.st_size, st.st_mtime, content_hash,
+            self.fileproc.stat)
+        return entry, st, content, content_hash
+
+    def _save_manifest(self, sources):
+        """Record outputs of all articles and write the manifest.
+
+        :param sources: paths of all source files found in this build.
+        :type sources: list
+        """
+        self.manifest.retain(sources)
+        graph = self.manifest.graph
+        for entry in self.manifest.entries.itervalues():
+            if graph is not None:
+                entry.outputs = graph.get_dependents(entry.source)
+            elif entry.article is not None \
+                    and len(entry.article.output_file) != 0:
+                entry.outputs = [entry.article.output_file]
+            else:
+                entry.outputs = []
+        self.manifest.save()
 
     def _do_build(self):
         """Write output data for the blog.
@@ -229,6 +798,235 @@ class SiteBuilder(object):
         pass
 
 
+#: Site config used by article generating worker processes.
+_worker_config = None
+
+
+def _init_worker(config):
+    """Initialize a worker process for generating articles.
+
+    :param config: site configuration.
+    :type config: SiteConfig
+    """
+    global _worker_config
+    _worker_config = config
+
+
+#: Body generators shared by all articles generated in current process.
+_generators = {}
+
+#: Memos of file hashes used in current process, keyed by their files.
+_hash_caches = {}
+
+
+def _get_body_cache(config):
+    """Get the cache of generated article bodies.
+
+    :param config: site configuration.
+    :type config: SiteConfig
+    :return: the cache, or None if the cache is disabled.
+    :rtype: DiskCache
+    """
+    if config.body_cache_size <= 0:
+        return None
+    return DiskCache(os.path.join(config.cache_dir, _BODY_CACHE_DIR),
+                     config.body_cache_size * 1024 * 1024)
+
+
+def _get_highlight_cache(config):
+    """Get the cache of highlighted code blocks.
+
+    :param config: site configuration.
+    :type config: SiteConfig
+    :return: the cache, or None if the cache is disabled.
+    :rtype: DiskCache
+    """
+    if config.highlight_cache_size <= 0:
+        return None
+    return DiskCache(os.path.join(config.cache_dir, _HIGHLIGHT_CACHE_DIR),
+                     config.highlight_cache_size * 1024 * 1024)
+
+
+def _get_template_cache(config):
+    """Get the cache of compiled templates.
+
+    :param config: site configuration.
+    :type config: SiteConfig
+    :return: the cache, or None if the cache is disabled.
+    :rtype: TemplateBytecodeCache
+    """
+    if not config.template_cache:
+        return None
+    return TemplateBytecodeCache(os.path.join(config.cache_dir,
+                                              _TEMPLATE_CACHE_DIR))
+
+
+def _get_hash_cache(config):
+    """Get the memo of hashes of files referenced by articles, which is
+    shared by all articles generated in current process.
+
+    :param config: site configuration.
+    :type config: SiteConfig
+    :return: the memo, which is only kept in memory if disabled in site
+        configuration.
+    :rtype: FileHashCache
+    """
+    filename = None
+    if config.file_hash_cache:
+        filename = os.path.abspath(os.path.join(config.cache_dir,
+                                                _FILE_HASH_CACHE_FILE))
+    if filename not in _hash_caches:
+        _hash_caches[filename] = FileHashCache(filename)
+    return _hash_caches[filename]
+
+
+def _get_generator(config, full_path, content_type):
+    """Get the body generator for an article, creating it on first use so
+    that its engine is reused by following articles. The generator is wrapped
+    with the body cache if its content is worth being cached.
+
+    :param config: site configuration.
+    :type config: SiteConfig
+    :param full_path: path of the article source.
+    :type full_path: str
+    :param content_type: content type of the article, or None if it should
+        be judged from the extension of the source.
+    :type content_type: str
+    :rtype: BodyGenerator
+    """
+    if content_type is None:
+        key = os.path.splitext(full_path)[1].lower()
+    else:
+        key = content_type
+    highlight_cache = _get_highlight_cache(config)
+    hash_cache = _get_hash_cache(config)
+    generator_key = (key, None if highlight_cache is None
+                     else highlight_cache.directory, hash_cache.filename)
+    if generator_key not in _generators:
+        if content_type is None:
+            _generators[generator_key] = BodyGenerator.from_extension(
+                key, highlight_cache=highlight_cache, hash_cache=hash_cache)
+        else:
+            _generators[generator_key] = BodyGenerator.from_type(
+                content_type, highlight_cache=highlight_cache,
+                hash_cache=hash_cache)
+    generator = _generators[generator_key]
+    if generator is not None and generator.cacheable:
+        cache = _get_body_cache(config)
+        if cache is not None:
+            return CachedBodyGenerator(generator, cache, hash_cache)
+    return generator
+
+
+def _generate_body_task(task):
+    lexer_registry.pop_stats()
+    article = _generate_body(_worker_config, *task)
+    return article, lexer_registry.pop_stats(), \
+        _get_hash_cache(_worker_config).pop_updates()
+
+
+def _scan_article(config, full_path, filename, mtime, header_type, content):
+    """Parse header of an article source, without reading its payload.
+
+    :param config: site configuration.
+    :type config: SiteConfig
+    :return: a tuple of two elements, the article without body (None if the
+        article is a draft) and the parsed header, respectively.
+    :rtype: tuple
+    """
+    logger.debug('Scanning \'%s\'...' % full_path)
+    reader = HeaderedContentReader.from_type(header_type)
+    header, _, _ = reader.read(io.BytesIO(content), False)
+    article = ArticleConfig(config, header)
+    # Ignore all draft articles
+    if article.draft:
+        return None, header
+    article.source_file = full_path
+    if len(article.title) == 0:
+        article.title = filename
+    # Add date object
+    if isinstance(article.date, datetime.date):
+        article.date = datetime.datetime.combine(
+            article.date, datetime.time(0, 0))
+    elif not isinstance(article.date, datetime.datetime):
+        if len(article.date) == 0:
+            article.date = mtime
+        else:
+            article.date = datetime.datetime.strptime(
+                article.date, config.date_format)
+    # Add slug info
+    if len(article.slug) == 0:
+        article.slug = slugify(article.title)
+    # Add tag info
+    if not isinstance(article.tags, basestring):
+        article.tags = str(article.tags)
+    article.tags = filter(
+        None, [tag.strip() for tag in article.tags.split(',')])
+    # Special procedure for special pages.
+    if not isinstance(article.article_type, basestring):
+        article.article_type = str(article.article_type)
+    if article.article_type == ArticleConfig.ABOUT_PAGE \
+            or article.article_type == ArticleConfig.NOT_FOUND_PAGE:
+        article.tags = []
+    return article, header
+
+
+def _generate_body(config, article, header_type, content_type, content,
+                   header):
+    """Read payload of a scanned article and generate its body.
+
+    :param config: site configuration.
+    :type config: SiteConfig
+    :param article: article returned by :func:`_scan_article`.
+    :type article: ArticleConfig
+    :param header: header returned by :func:`_scan_article`, which is not
+        parsed again.
+    :type header: dict
+    :return: the article with body generated.
+    :rtype: ArticleConfig
+    """
+    full_path = article.source_file
+    logger.info('Parsing \'%s\'...' % full_path)
+    reader = HeaderedContentReader.from_type(header_type)
+    _, abstract, body = reader.read(io.BytesIO(content), parsed_header=header)
+    article.content_source = body
+    # Generate body
+    generator = _get_generator(config, full_path, content_type)
+    if abstract is None:
+        article.abstract = None
+        article.full['html'], meta = generator.generate(
+            body, base=full_path, url=config.url)
+    else:
+        (article.abstract['html'], abstract_meta), \
+            (article.full['html'], meta) = generator.generate_with_abstract(
+                abstract, body, base=full_path, url=config.url)
+        article.abstract.update(abstract_meta)
+    article.full.update(meta)
+    return article
+
+
+def _get_package_resources(dirname):
+    """Find all files in a directory of ZKB package which are not templates.
+
+    :param dirname: the directory relative to the package.
+    :type dirname: str
+    :return: paths of the files relative to the directory.
+    :rtype: list of str
+    """
+    resource_files = []
+    pending = ['']
+    while len(pending) > 0:
+        path = pending.pop()
+        for name in pkg_resources.resource_listdir(
+                'zkb', (dirname + '/' + path).rstrip('/')):
+            filename = path + name
+            if pkg_resources.resource_isdir('zkb', dirname + '/' + filename):
+                pending.append(filename + '/')
+            elif os.path.splitext(name)[1].lower() != _TEMPLATE_EXTENSION:
+                resource_files.append(filename)
+    return resource_files
+
+
 def _get_chunks(arr, chunk_size):
     chunks = [arr[start:start + chunk_size] for start in
               range(0, len(arr), chunk_size)]
@@ -242,15 +1040,79 @@ def _get_prev_and_next(iterator):
     return izip(prevs, items, nexts)
 
 
+def _group_by_year(articles):
+    """Group articles sorted by date by the year they are published.
+
+    :param articles: the articles.
+    :type articles: list of ArticleConfig
+    :return: a list of tuples of year and articles published in that year.
+    :rtype: list
+    """
+    return [(year, list(group)) for year, group in
+            groupby(articles, key=lambda article: article.date.year)]
+
+
 def _get_safe_tag_url(value):
     return ''.join([x if x.isalnum() else '_' for x in value])
 
 
+class OutputPage(object):
+    """A page to be rendered by a site builder.
+
+    :param dest_file: output file of the page.
+    :type dest_file: str
+    :param url: URL of the page.
+    :type url: str
+    :param template: template used to render the page.
+    :type template: jinja2.Template
+    :param context: variables passed to the template.
+    :type context: dict
+    :param key: key of the structure of the page, see
+        :class:`zkb.depgraph.DependencyGraph`.
+    :param dependencies: sources the page depends on, see
+        :class:`zkb.depgraph.DependencyGraph`.
+    :type dependencies: dict
+    """
+
+    def __init__(self, dest_file, url, template, context, key=None,
+                 dependencies=None):
+        super(OutputPage, self).__init__()
+        self.dest_file = dest_file
+        self.url = url
+        self.template = template
+        self.context = context
+        self.key = key
+        self.dependencies = {} if dependencies is None else dependencies
+
+
+#: Builder and pages being rendered by page rendering workers.
+_render_job = None
+
+
+def _render_page_task(index):
+    builder, pages = _render_job
+    return builder._render_page(pages[index])
+
+
 class DefaultSiteBuilder(SiteBuilder):
-    def __init__(self, config, fileproc=None):
-        super(DefaultSiteBuilder, self).__init__(config, fileproc)
+    def __init__(self, config, fileproc=None, **kwargs):
+        super(DefaultSiteBuilder, self).__init__(config, fileproc, **kwargs)
+        self._writes = 0
+        self._skipped_writes = 0
         self._load_resources()
 
+    def reload(self, changed_files):
+        """Override to load templates again if any of them is changed.
+
+        :param changed_files: real paths of changed files.
+        :type changed_files: iterable of str
+        """
+        template_dir = os.path.join(
+            os.path.realpath(self.config.template_dir), '')
+        if any(path.startswith(template_dir) for path in changed_files):
+            logger.info('Templates changed, loading again...')
+            self._load_resources()
+
     def _load_resources(self):
         def _format_date(value, date_format='short'):
             if date_format == 'meta':
@@ -275,8 +1137,9 @@ class DefaultSiteBuilder(SiteBuilder):
 
         loader = ChoiceLoader([
             FileSystemLoader(self.config.template_dir),
-            PackageLoader('zkb', 'templates/default')])
-        env = Environment(loader=loader, trim_blocks=True, lstrip_blocks=True)
+            PackageLoader('zkb', _PACKAGE_TEMPLATE_DIR)])
+        env = Environment(loader=loader, trim_blocks=True, lstrip_blocks=True,
+                          bytecode_cache=_get_template_cache(self.config))
         env.filters['date'] = _format_date
         env.filters['rot13'] = _rot13
         env.filters['safe_url'] = _get_safe_tag_url
@@ -284,19 +1147,17 @@ class DefaultSiteBuilder(SiteBuilder):
         self.index_template = env.get_template('index.html')
         self.archive_template = env.get_template('archive.html')
         self.tags_templates = env.get_template('tags.html')
-        resource_files = [
-            'stylesheets/style.css',
-            'stylesheets/codeblock.css',
-            'images/header-1.jpg',
-            'images/header-2.jpg']
-        self._package_resources = []
-        self._fs_resources = []
-        for item in resource_files:
-            if self.fileproc.exists(os.path.join(
-                    self.config.template_dir, *item.split('/'))):
-                self._fs_resources.append(item)
-            else:
-                self._package_resources.append(item)
+        hasher = hashlib.sha1()
+        for name in sorted(env.list_templates(extensions=['html'])):
+            source, _, _ = loader.get_source(env, name)
+            hasher.update(name.encode('utf-8'))
+            hasher.update(source.encode('utf-8'))
+        self._template_digest = hasher.hexdigest()
+        self._fs_resources = set(self.fileproc.get_resource_files(
+            self.config.template_dir, self.config.ignored_files))
+        self._package_resources = set(
+            filename for filename in _get_package_resources(
+                _PACKAGE_TEMPLATE_DIR) if filename not in self._fs_resources)
 
     def _add_path_info(self):
         """Add info of path and output directory for each article.
@@ -332,56 +1193,66 @@ class DefaultSiteBuilder(SiteBuilder):
                 self.config.output_dir,
                 *(root_parts + path_parts + [_INDEX_PAGE]))
 
-    def _build_special_pages(self):
-        """Build special pages.
+    def _get_special_pages(self):
+        """Get special pages to be rendered.
 
-        :param config: site configuration.
-        :type config: SiteConfig
+        :rtype: list of OutputPage
         """
+        pages = []
         for _, article in self.config.special_articles.iteritems():
-            logger.info('Rendering \'%s\'...' % article.url)
-            output = self.article_template.render({
-                'site': self.config,
-                'article': article,
-                'header_scripts': article.full['header_scripts']
-            })
-            self.fileproc.write(
-                article.output_file, self.config.encoding, output)
-
-    def _build_article_pages(self):
-        """Build article pages.
+            pages.append(OutputPage(article.output_file, article.url,
+                                    self.article_template, {
+                                        'site': self.config,
+                                        'article': article,
+                                        'header_scripts':
+                                            article.full['header_scripts']
+                                    }, (article.url,),
+                                    {article.source_file: depgraph.ALL}))
+        return pages
 
-        :param config: site configuration.
-        :type config: SiteConfig
+    def _get_article_pages(self):
+        """Get article pages to be rendered.
+
+        :rtype: list of OutputPage
         """
+        pages = []
         for prev_article, article, next_article in \
                 _get_prev_and_next(self.config.articles_by_date):
-            logger.info('Rendering \'%s\'...' % article.url)
-            output = self.article_template.render({
-                'site': self.config,
-                'article': article,
-                'prev': prev_article,
-                'next': next_article,
-                'header_scripts': article.full['header_scripts']
-            })
-            self.fileproc.write(
-                article.output_file, self.config.encoding, output)
-
-    def _build_archive_pages(self):
-        """Build archive pages.
+            dependencies = {article.source_file: depgraph.ALL}
+            key = [article.url]
+            for neighbour in (prev_article, next_article):
+                if neighbour is None:
+                    key.append(None)
+                else:
+                    key.append(neighbour.source_file)
+                    dependencies[neighbour.source_file] = (depgraph.HEADER,)
+            pages.append(OutputPage(article.output_file, article.url,
+                                    self.article_template, {
+                                        'site': self.config,
+                                        'article': article,
+                                        'prev': prev_article,
+                                        'next': next_article,
+                                        'header_scripts':
+                                            article.full['header_scripts']
+                                    }, key, dependencies))
+        return pages
 
-        :param config: site configuration.
-        :type config: SiteConfig
+    def _get_archive_pages(self):
+        """Get archive pages to be rendered.
+
+        :rtype: list of OutputPage
         """
         root_parts = filter(None, self.config.url.split('/'))
         tags = list(self.config.articles_by_tag.keys())
         tags.insert(0, '')
+        pages = []
         for tag in tags:
             if len(tag) == 0:
                 dest_file = os.path.join(
                     self.config.output_dir,
                     *(root_parts + ['archive', _INDEX_PAGE]))
                 dest_url = self.config.url + 'archive/' + _INDEX_PAGE
+                articles = self.config.articles_by_date
             else:
                 safe_dir = _get_safe_tag_url(tag)
                 dest_file = os.path.join(
@@ -389,39 +1260,42 @@ class DefaultSiteBuilder(SiteBuilder):
                     *(root_parts + ['tags', safe_dir, _INDEX_PAGE]))
                 dest_url = self.config.url + 'tags/' + safe_dir + \
                            '/' + _INDEX_PAGE
-            logger.info('Rendering \'%s\'...' % dest_url)
-            output = self.archive_template.render({
-                'site': self.config,
-                'tag': tag
-            })
-            self.fileproc.write(dest_file, self.config.encoding, output)
+                articles = self.config.articles_by_tag[tag]
+            sources = [article.source_file for article in articles]
+            pages.append(OutputPage(dest_file, dest_url,
+                                    self.archive_template, {
+                                        'site': self.config,
+                                        'tag': tag,
+                                        'archive': _group_by_year(articles)
+                                    }, (tag, sources),
+                                    dict.fromkeys(sources,
+                                                  (depgraph.HEADER,))))
+        return pages
 
-    def _build_tags_page(self):
-        """Build tags page.
+    def _get_tags_pages(self):
+        """Get tags page to be rendered.
 
-        :param config: site configuration.
-        :type config: SiteConfig
+        :rtype: list of OutputPage
         """
         root_parts = filter(None, self.config.url.split('/'))
         dest_file = os.path.join(self.config.output_dir,
                                  *(root_parts + ['tags', _INDEX_PAGE]))
         dest_url = self.config.url + 'tags/' + _INDEX_PAGE
-        logger.info('Rendering \'%s\'...' % dest_url)
-        output = self.tags_templates.render({
+        counts = sorted((tag, len(articles)) for tag, articles in
+                        self.config.articles_by_tag.iteritems())
+        return [OutputPage(dest_file, dest_url, self.tags_templates, {
             'site': self.config,
-        })
-        self.fileproc.write(
-            dest_file, self.config.encoding, output)
+        }, counts)]
 
-    def _build_index_pages(self):
-        """Build index pages.
+    def _get_index_pages(self):
+        """Get index pages to be rendered.
 
-        :param config: site configuration.
-        :type config: SiteConfig
+        :rtype: list of OutputPage
         """
         root_parts = filter(None, self.config.url.split('/'))
         chunks = _get_chunks(self.config.articles_by_date,
                              self.config.page_size)
+        pages = []
         for index, chunk in enumerate(chunks):
             if index == 0:
                 dest_file = os.path.join(self.config.output_dir,
@@ -450,62 +1324,325 @@ class DefaultSiteBuilder(SiteBuilder):
                 else:
                     data_to_insert = article.full['header_scripts']
                 header_scripts.update(data_to_insert)
-            logger.info('Rendering \'%s\'...' % dest_url)
-            output = self.index_template.render({
-                'site': self.config,
-                'articles': chunk,
-                'prev_url': prev_url,
-                'next_url': next_url,
-                'header_scripts': header_scripts
-            })
-            self.fileproc.write(dest_file, self.config.encoding, output)
+            sources = [article.source_file for article in chunk]
+            pages.append(OutputPage(dest_file, dest_url,
+                                    self.index_template, {
+                                        'site': self.config,
+                                        'articles': chunk,
+                                        'prev_url': prev_url,
+                                        'next_url': next_url,
+                                        'header_scripts': header_scripts
+                                    }, (sources, prev_url, next_url),
+                                    dict.fromkeys(sources, depgraph.ALL)))
+        return pages
+
+    def _render_page(self, page):
+        """Render a page and write it to its output file.
+
+        :param page: page to render.
+        :type page: OutputPage
+        """
+        logger.info('Rendering \'%s\'...' % page.url)
+        return self.fileproc.write_chunks(
+            page.dest_file, self.config.encoding,
+            page.template.generate(page.context))
+
+    def _count_writes(self, results):
+        """Count results of writing files.
+
+        :param results: values returned by :class:`FileProcessor` when
+            writing; False means writing is skipped.
+        :type results: iterable
+        """
+        for result in results:
+            if result is False:
+                self._skipped_writes += 1
+            else:
+                self._writes += 1
+
+    def _render_pages(self, pages):
+        """Render pages. If more than one job is allowed, pages are rendered
+        and written by worker processes forked from current process, so that
+        all articles are shared with workers without being transferred. Where
+        forking is not available, a thread pool is used instead.
+
+        :param pages: pages to render.
+        :type pages: list of OutputPage
+        """
+        global _render_job
+        if self.jobs <= 1 or len(pages) <= 1:
+            self._count_writes(self._render_page(page) for page in pages)
+            return
+        _render_job = (self, pages)
+        if hasattr(os, 'fork'):
+            pool = multiprocessing.Pool(min(self.jobs, len(pages)))
+        else:
+            pool = ThreadPool(min(self.jobs, len(pages)))
+        try:
+            chunk_size = max(1, len(pages) // (self.jobs * 4))
+            self._count_writes(pool.imap_unordered(
+                _render_page_task, xrange(len(pages)), chunk_size))
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+            _render_job = None
+
+    def _get_pages(self):
+        """Get all pages to be rendered.
+
+        :rtype: list of OutputPage
+        """
+        pages = []
+        pages.extend(self._get_special_pages())
+        pages.extend(self._get_article_pages())
+        pages.extend(self._get_archive_pages())
+        pages.extend(self._get_tags_pages())
+        pages.extend(self._get_index_pages())
+        return pages
+
+    def _get_graph(self, pages):
+        """Get the dependency graph of pages.
+
+        :param pages: all pages to be rendered.
+        :type pages: list of OutputPage
+        :rtype: depgraph.DependencyGraph
+        """
+        graph = depgraph.DependencyGraph(
+            (self._template_digest, self.config.about_url))
+        for page in pages:
+            graph.add(page.dest_file, page.key, page.dependencies)
+        return graph
+
+    def _build_pages(self):
+        """Build all pages with one pool of workers. If a build manifest is
+        available, only pages affected by changes since previous build are
+        rendered.
+        """
+        pages = self._get_pages()
+        if self.manifest is not None:
+            graph = self._get_graph(pages)
+            outdated = graph.get_outdated(self.manifest.graph, self.changes)
+            total = len(pages)
+            pages = [page for page in pages if page.dest_file in outdated
+                     or not self.fileproc.exists(page.dest_file)]
+            logger.info('%d of %d pages need rendering.' %
+                        (len(pages), total))
+            self.manifest.graph = graph
+        self._render_pages(pages)
 
     def _copy_resources(self):
-        """Copy resource files used in articles.
+        """Copy resource files used in articles. Resources are placed by hash
+        of their content, so identical files referenced at different paths
+        are copied only once.
 
         :param config: site configuration.
         :type config: SiteConfig
         """
         resources = {}
         for _, article in self.config.special_articles.iteritems():
-            resources.update(article.full['local_references'])
+            for source, dest in article.full['local_references'].iteritems():
+                resources[tuple(dest)] = source
         for article in self.config.articles_by_date:
-            resources.update(article.full['local_references'])
-        for source, dest in resources.iteritems():
+            for source, dest in article.full['local_references'].iteritems():
+                resources[tuple(dest)] = source
+
+        def _copy(item):
+            dest, source = item
             dest_file = os.path.join(self.config.output_dir, *dest)
-            url = self.config.url + '/'.join(*dest)
+            url = '/' + '/'.join(dest)
             logger.info('Writing resource \'%s\'...' % url)
-            self.fileproc.copy_file(source, dest_file)
+            return self.fileproc.copy_resource(source, dest_file)
+
+        if self.jobs <= 1 or len(resources) <= 1:
+            self._count_writes(_copy(item) for item in resources.iteritems())
+            return
+        # Copying is I/O bound, so threads are enough
+        pool = ThreadPool(min(self.jobs, len(resources)))
+        try:
+            self._count_writes(pool.map(_copy, resources.items()))
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
 
     def _copy_template_resources(self):
-        """Copy resource files.
+        """Copy resource files of templates, except those unchanged.
 
         :param config: site configuration.
         :type config: SiteConfig
         """
         root_parts = filter(None, self.config.url.split('/'))
         dest_dir = os.path.join(self.config.output_dir, *root_parts)
-        for filename in self._fs_resources:
+        for filename in sorted(self._fs_resources):
             logger.info('Writing resource \'%s\'...' %
                         (self.config.url + filename))
-            self.fileproc.copy_file(
+            self._count_writes([self.fileproc.sync_file(
                 os.path.join(self.config.template_dir, *filename.split('/')),
-                os.path.join(dest_dir, *filename.split('/')))
-        for filename in self._package_resources:
+                os.path.join(dest_dir, *filename.split('/')))])
+        for filename in sorted(self._package_resources):
             logger.info('Writing resource \'%s\'...' %
                         (self.config.url + filename))
             with pkg_resources.resource_stream(
-                    'zkb', 'templates/default/' + filename) as stream:
+                    'zkb', _PACKAGE_TEMPLATE_DIR + '/' + filename) as stream:
                 dest_filename = os.path.join(dest_dir, *filename.split('/'))
-                self.fileproc.write_stream(dest_filename, stream)
+                self._count_writes([self.fileproc.sync_stream(
+                    dest_filename, stream)])
 
     def _do_build(self):
+        self._writes = 0
+        self._skipped_writes = 0
         self._add_path_info()
-        self._build_special_pages()
-        self._build_article_pages()
-        self._build_archive_pages()
-        self._build_tags_page()
-        self._build_index_pages()
+        self._build_pages()
         self._copy_resources()
         self._copy_template_resources()
+        logger.info('%d files written, %d unchanged files skipped.' %
+                    (self._writes, self._skipped_writes))
         return 0
+
+
+class PreviewSiteBuilder(DefaultSiteBuilder):
+    """Site builder rendering pages on demand instead of writing all of them,
+    with the same URLs as :class:`DefaultSiteBuilder`.
+
+    Headers of all articles are scanned when the site is loaded, while bodies
+    of articles are only generated when a page showing them is requested.
+    Rendered pages are kept in memory until anything they depend on is
+    changed.
+    """
+
+    def __init__(self, config, fileproc=None, **kwargs):
+        if kwargs.get('manifest') is None:
+            # The manifest is only kept in memory to find changed articles.
+            kwargs['manifest'] = BuildManifest(None, config.get_digest())
+        super(PreviewSiteBuilder, self).__init__(config, fileproc, **kwargs)
+        self._body_tasks = {}
+        self._pages = {}
+        self._rendered = {}
+        self._resources = {}
+        self._graph = None
+
+    def load(self):
+        """Load all articles, or articles changed since previous loading, and
+        forget rendered pages affected by the changes.
+        """
+        sources = self._load_site()
+        self.manifest.retain(sources)
+        sources = set(sources)
+        for source in self._body_tasks.keys():
+            if source not in sources:
+                del self._body_tasks[source]
+        self._add_path_info()
+        pages = self._get_pages()
+        graph = self._get_graph(pages)
+        outdated = graph.get_outdated(self._graph, self.changes)
+        self._graph = graph
+        self._set_pages(pages)
+        for url in self._rendered.keys():
+            if url not in self._pages \
+                    or self._pages[url].dest_file in outdated:
+                del self._rendered[url]
+        self._resources = {}
+        for article in self._get_all_articles():
+            self._add_resources(article)
+
+    def render(self, url):
+        """Get content of a page, rendering it if it is not rendered yet.
+
+        :param url: URL of the page, where a URL ending with ``/`` means the
+            index page of the directory.
+        :type url: str
+        :return: encoded content of the page, or None if no page is at the
+            URL.
+        :rtype: str
+        """
+        if url.endswith('/'):
+            url += _INDEX_PAGE
+        page = self._pages.get(url)
+        if page is None:
+            return None
+        content = self._rendered.get(url)
+        if content is not None:
+            return content
+        if self._generate_page_bodies(page):
+            # Contexts of pages are made from generated bodies.
+            self._set_pages(self._get_pages())
+            page = self._pages[url]
+        logger.info('Rendering \'%s\'...' % url)
+        content = u''.join(page.template.generate(page.context)).encode(
+            self.config.encoding)
+        self._rendered[url] = content
+        return content
+
+    def get_resource(self, url):
+        """Get the file of a resource used by articles or templates.
+
+        :param url: URL of the resource.
+        :type url: str
+        :return: a tuple of two elements, the path of the file and whether it
+            is a resource of ZKB package, or None if no resource is at the
+            URL.
+        :rtype: tuple
+        """
+        if url in self._resources:
+            return self._resources[url], False
+        if not url.startswith(self.config.url):
+            return None
+        filename = url[len(self.config.url):]
+        if filename in self._fs_resources:
+            return os.path.join(self.config.template_dir,
+                                *filename.split('/')), False
+        if filename in self._package_resources:
+            return _PACKAGE_TEMPLATE_DIR + '/' + filename, True
+        return None
+
+    def _generate_bodies(self, tasks):
+        """Override to keep articles for generating their bodies on demand.
+        """
+        for task in tasks:
+            self._body_tasks[task[0].source_file] = task
+        return [task[0] for task in tasks]
+
+    def _generate_page_bodies(self, page):
+        """Generate bodies of articles shown on a page, if not generated yet.
+
+        :param page: the page.
+        :type page: OutputPage
+        :return: True if any body is generated.
+        :rtype: bool
+        """
+        generated = False
+        for source, aspects in page.dependencies.iteritems():
+            if depgraph.BODY in aspects and source in self._body_tasks:
+                article = _generate_body(self.config,
+                                         *self._body_tasks.pop(source))
+                self._add_resources(article)
+                generated = True
+        if generated:
+            _get_hash_cache(self.config).save()
+        return generated
+
+    def _set_pages(self, pages):
+        """Set pages which can be rendered.
+
+        :param pages: all pages.
+        :type pages: list of OutputPage
+        """
+        self._pages = dict((page.url, page) for page in pages)
+
+    def _get_all_articles(self):
+        """Get all articles including special ones.
+
+        :rtype: list of ArticleConfig
+        """
+        return self.config.special_articles.values() + \
+            self.config.articles_by_date
+
+    def _add_resources(self, article):
+        """Add resources referenced by an article.
+
+        :param article: the article.
+        :type article: ArticleConfig
+        """
+        for source, dest in article.full['local_references'].iteritems():
+            self._resources['/' + '/'.join(dest)] = source
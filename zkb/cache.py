@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""
+zkb.cache
+~~~~~~~~~
+
+Caches of generated content, kept in memory or on disk.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import os
+import hashlib
+import multiprocessing
+import cPickle as pickle
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from jinja2 import FileSystemBytecodeCache
+
+from zkb.log import logger
+
+
+_ENTRY_EXTENSION = '.pickle'
+_BLOCK_SIZE = 65536
+
+#: Files at least this large are hashed on a thread pool by
+# :func:`FileHashCache.get_hashes`.
+_LARGE_FILE_SIZE = 1024 * 1024
+
+
+def get_cache_key(*parts):
+    """Get a key of cache from several parts.
+
+    :param parts: parts of the key; each part must have a stable
+        :func:`repr`.
+    :rtype: str
+    """
+    return hashlib.sha1(repr(parts)).hexdigest()
+
+
+def get_file_hash(filename):
+    """Get SHA1 hash of a file.
+
+    :param filename: file name.
+    :type filename: str
+    :return: the hash, or None if the file cannot be read.
+    :rtype: str
+    """
+    hasher = hashlib.sha1()
+    try:
+        with open(filename, 'rb') as stream:
+            buf = stream.read(_BLOCK_SIZE)
+            while len(buf) > 0:
+                hasher.update(buf)
+                buf = stream.read(_BLOCK_SIZE)
+        return hasher.hexdigest()
+    except IOError as e:
+        logger.debug('Error while hashing file: %s' % e.strerror)
+    return None
+
+
+def _write_pickle(filename, value):
+    """Write a picklable value to a file atomically.
+
+    :param filename: the file.
+    :type filename: str
+    :param value: the value.
+    :raises IOError, OSError: if the file cannot be written.
+    """
+    dest_dir = os.path.dirname(filename)
+    temp_filename = '%s.%d.tmp' % (filename, os.getpid())
+    if len(dest_dir) > 0 and not os.path.exists(dest_dir):
+        os.makedirs(dest_dir)
+    with open(temp_filename, 'wb') as stream:
+        pickle.dump(value, stream, pickle.HIGHEST_PROTOCOL)
+    if os.path.exists(filename):
+        os.remove(filename)
+    os.rename(temp_filename, filename)
+
+
+class MemoryCache(object):
+    """A cache storing values in memory, evicting least recently used entries
+    when the number of entries exceeds its limit.
+
+    :param max_entries: maximum number of entries.
+    :type max_entries: int
+    """
+
+    def __init__(self, max_entries):
+        super(MemoryCache, self).__init__()
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Get value of an entry.
+
+        :param key: key of the entry.
+        :return: the value, or None if the entry does not exist.
+        """
+        value = self._entries.pop(key, None)
+        if value is not None:
+            self._entries[key] = value
+        return value
+
+    def set(self, key, value):
+        """Set value of an entry.
+
+        :param key: key of the entry.
+        :param value: the value.
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class DiskCache(object):
+    """A cache storing picklable values in separate files of a directory.
+
+    Modification time of an entry is updated whenever it is read, so that
+    :func:`trim` is able to evict least recently used entries when the total
+    size of the cache exceeds its limit. The cache may be shared by several
+    processes.
+
+    :param directory: directory where entries are stored.
+    :type directory: str
+    :param max_size: maximum total size of entries in bytes.
+    :type max_size: int
+    """
+
+    def __init__(self, directory, max_size):
+        super(DiskCache, self).__init__()
+        self.directory = directory
+        self.max_size = max_size
+
+    def _get_filename(self, key):
+        """Get the file where an entry is stored.
+
+        :param key: key returned by :func:`get_cache_key`.
+        :type key: str
+        :rtype: str
+        """
+        return os.path.join(self.directory, key[0:2],
+                            key[2:] + _ENTRY_EXTENSION)
+
+    def get(self, key):
+        """Get value of an entry.
+
+        :param key: key returned by :func:`get_cache_key`.
+        :type key: str
+        :return: the value, or None if the entry does not exist.
+        """
+        filename = self._get_filename(key)
+        try:
+            with open(filename, 'rb') as stream:
+                value = pickle.load(stream)
+        except IOError:
+            return None
+        except (EOFError, AttributeError, ImportError, IndexError,
+                pickle.UnpicklingError) as e:
+            logger.debug('Ignoring corrupted cache entry \'%s\': %s' %
+                         (filename, e))
+            return None
+        try:
+            os.utime(filename, None)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        """Set value of an entry.
+
+        :param key: key returned by :func:`get_cache_key`.
+        :type key: str
+        :param value: the value, which must be picklable.
+        """
+        filename = self._get_filename(key)
+        try:
+            _write_pickle(filename, value)
+        except (IOError, OSError) as e:
+            # Another process may be writing the same entry.
+            logger.debug('Failed to write cache entry \'%s\': %s' %
+                         (filename, e))
+
+    def trim(self):
+        """Remove least recently used entries until total size of the cache
+        does not exceed its limit.
+
+        :return: number of entries removed.
+        :rtype: int
+        """
+        entries = []
+        total_size = 0
+        for dirpath, _, filenames in os.walk(self.directory):
+            for name in filenames:
+                if not name.endswith(_ENTRY_EXTENSION):
+                    continue
+                filename = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(filename)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, filename))
+                total_size += st.st_size
+        if total_size <= self.max_size:
+            return 0
+        entries.sort()
+        removed = 0
+        for _, size, filename in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                continue
+            total_size -= size
+            removed += 1
+        logger.debug('%d entries removed from cache \'%s\'.' %
+                     (removed, self.directory))
+        return removed
+
+
+class FileHashCache(object):
+    """A memo of SHA1 hashes of files, so that a file referenced by many
+    articles is hashed only once.
+
+    Entries are keyed by real path of files, and an entry is used only if
+    size, modification time and inode of the file are the same as when it
+    was hashed. The memo may be persisted in a file to be used by following
+    builds; it is loaded on creation and written by :func:`save`.
+
+    Entries added by worker processes are not seen by other processes. They
+    can be taken with :func:`pop_updates` and merged into the memo of the
+    main process with :func:`update`.
+
+    :param filename: file where the memo is persisted, or None if the memo
+        should only be kept in memory.
+    :type filename: str
+    :param threads: maximum number of threads hashing large files at the same
+        time in :func:`get_hashes`. If None, number of CPUs will be used.
+    :type threads: int
+    """
+
+    def __init__(self, filename=None, threads=None):
+        super(FileHashCache, self).__init__()
+        self.filename = filename
+        if threads is None:
+            threads = multiprocessing.cpu_count()
+        self.threads = threads
+        self._entries = {}
+        self._updates = {}
+        self._dirty = False
+        if filename is not None:
+            self._load()
+
+    def _load(self):
+        """Load entries from the file where the memo is persisted.
+        """
+        try:
+            with open(self.filename, 'rb') as stream:
+                entries = pickle.load(stream)
+        except IOError:
+            return
+        except (EOFError, AttributeError, ImportError, IndexError,
+                pickle.UnpicklingError) as e:
+            logger.debug('Ignoring corrupted hash cache \'%s\': %s' %
+                         (self.filename, e))
+            return
+        if isinstance(entries, dict):
+            self._entries = entries
+
+    def save(self):
+        """Write the memo to its file if any entry is added, dropping entries
+        of files that no longer exist.
+        """
+        if self.filename is None or not self._dirty:
+            return
+        self._entries = dict(item for item in self._entries.iteritems()
+                             if os.path.exists(item[0]))
+        try:
+            _write_pickle(self.filename, self._entries)
+        except (IOError, OSError) as e:
+            logger.debug('Failed to write hash cache \'%s\': %s' %
+                         (self.filename, e))
+            return
+        self._dirty = False
+
+    def get_hash(self, filename):
+        """Get SHA1 hash of a file.
+
+        :param filename: the file.
+        :type filename: str
+        :return: the hash, or None if the file cannot be read.
+        :rtype: str
+        """
+        return self.get_hashes([filename])[filename]
+
+    def get_hashes(self, filenames):
+        """Get SHA1 hashes of several files. Large files not in the memo are
+        hashed on a thread pool.
+
+        :param filenames: the files.
+        :type filenames: iterable of str
+        :return: a dictionary whose keys are the files and values are their
+            hashes, or None for files which cannot be read.
+        :rtype: dict
+        """
+        hashes = {}
+        pending = []
+        for filename in set(filenames):
+            real_path = os.path.realpath(filename)
+            try:
+                st = os.stat(real_path)
+            except OSError:
+                hashes[filename] = None
+                continue
+            state = (st.st_size, st.st_mtime, st.st_ino)
+            entry = self._entries.get(real_path)
+            if entry is not None and entry[0] == state:
+                hashes[filename] = entry[1]
+            else:
+                pending.append((filename, real_path, state))
+        small = [item for item in pending if item[2][0] < _LARGE_FILE_SIZE]
+        large = [item for item in pending if item[2][0] >= _LARGE_FILE_SIZE]
+        if self.threads <= 1 or len(large) <= 1:
+            small.extend(large)
+            large = []
+        results = [(item, get_file_hash(item[1])) for item in small]
+        if len(large) > 0:
+            pool = ThreadPool(min(self.threads, len(large)))
+            try:
+                results.extend(zip(large, pool.map(
+                    get_file_hash, [item[1] for item in large])))
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+        for (filename, real_path, state), file_hash in results:
+            hashes[filename] = file_hash
+            if file_hash is not None:
+                self._entries[real_path] = (state, file_hash)
+                self._updates[real_path] = (state, file_hash)
+                self._dirty = True
+        return hashes
+
+    def pop_updates(self):
+        """Get entries added since previous call.
+
+        :return: the entries, to be passed to :func:`update`.
+        :rtype: dict
+        """
+        updates = self._updates
+        self._updates = {}
+        return updates
+
+    def update(self, updates):
+        """Merge entries returned by :func:`pop_updates` of another memo.
+
+        :param updates: the entries.
+        :type updates: dict
+        """
+        if len(updates) > 0:
+            self._entries.update(updates)
+            self._dirty = True
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """A cache storing compiled Jinja templates in separate files of a
+    directory, so that templates are not compiled again in following builds.
+    An entry is ignored by Jinja if source of its template has changed.
+
+    The cache may be shared by several processes; entries are replaced
+    atomically, and failures of writing them are ignored.
+
+    :param directory: directory where entries are stored.
+    :type directory: str
+    """
+
+    def __init__(self, directory):
+        super(TemplateBytecodeCache, self).__init__(directory, '%s.cache')
+
+    def dump_bytecode(self, bucket):
+        filename = self._get_cache_filename(bucket)
+        temp_filename = '%s.%d.tmp' % (filename, os.getpid())
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            with open(temp_filename, 'wb') as stream:
+                bucket.write_bytecode(stream)
+            if os.path.exists(filename):
+                os.remove(filename)
+            os.rename(temp_filename, filename)
+        except (IOError, OSError) as e:
+            logger.debug('Failed to write compiled template \'%s\': %s' %
+                         (filename, e))
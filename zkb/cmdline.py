@@ -22,6 +22,9 @@ from zkb.readers import HeaderedContentReader
 from zkb.builder import SiteBuilder
 from zkb.builder import FileProcessor
 from zkb.config import SiteConfig
+from zkb.manifest import BuildManifest, MANIFEST_FILE
+from zkb.watcher import create_watcher
+from zkb.preview import PreviewServer
 from zkb.log import logger
 
 
@@ -66,6 +69,9 @@ def init_git(args):
     if out_dir.startswith(src_dir):
         echo_command = 'echo %s > %s' % (config.output_dir, '.gitignore')
         subprocess.call(echo_command, shell=True, cwd=src_dir)
+    if os.path.realpath(config.cache_dir).startswith(src_dir):
+        echo_command = 'echo %s >> %s' % (config.cache_dir, '.gitignore')
+        subprocess.call(echo_command, shell=True, cwd=src_dir)
     echo_command = 'echo Hello world > %s' % 'README'
     subprocess.call(echo_command, shell=True, cwd=src_dir)
     subprocess.call('git add --all', shell=True, cwd=src_dir)
@@ -114,11 +120,78 @@ def customize(args):
 
 def build(args):
     config = _load_config(args.config)
-    result = SiteBuilder.from_config(config).build()
+    builder = _create_builder(config, args)
+    result = builder.build()
     if result == 0:
         logger.info('All done.')
     else:
         logger.error('Failed to generate partial or all content.')
+    if args.watch:
+        _watch(config, builder, args)
+
+
+def _create_builder(config, args, full=None):
+    """Create site builder for `build' command.
+
+    :param config: site configuration.
+    :type config: SiteConfig
+    :param args: arguments of the command.
+    :param full: True if previous build should be ignored, or None to follow
+        the arguments.
+    :type full: bool
+    :rtype: SiteBuilder
+    """
+    manifest_file = os.path.join(config.cache_dir, MANIFEST_FILE)
+    if full is None:
+        full = args.full
+    if full:
+        manifest = BuildManifest(manifest_file, config.get_digest())
+    else:
+        manifest = BuildManifest.load(manifest_file, config)
+    fileproc = FileProcessor(write_if_changed=args.write_if_changed,
+                             link_resources=args.link_resources)
+    return SiteBuilder.from_config(config, fileproc, manifest=manifest,
+                                   jobs=args.jobs, use_git=args.git)
+
+
+def _watch(config, builder, args):
+    """Watch article and template directories, and build the site again in
+    current process whenever files are changed, so that unchanged articles,
+    templates and caches are kept in memory.
+
+    :param config: site configuration.
+    :type config: SiteConfig
+    :param builder: the builder which built the site.
+    :type builder: SiteBuilder
+    :param args: arguments of the command.
+    """
+    config_file = os.path.realpath(args.config)
+    watcher = create_watcher([config.article_dir, config.template_dir],
+                             [config.output_dir, config.cache_dir],
+                             config.ignored_files)
+    logger.info('Watching for changes, press Ctrl+C to stop...')
+    try:
+        while True:
+            changed = watcher.wait()
+            logger.info('%d files changed, building again...' % len(changed))
+            try:
+                if config_file in changed:
+                    config = _load_config(args.config)
+                    builder = _create_builder(config, args, full=False)
+                else:
+                    builder.reload(changed)
+                result = builder.build()
+            except Exception as e:
+                logger.error('Failed to build: %s' % e)
+                continue
+            if result == 0:
+                logger.info('All done.')
+            else:
+                logger.error('Failed to generate partial or all content.')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
 
 
 def test(args):
@@ -131,6 +204,18 @@ def test(args):
     httpd.serve_forever()
 
 
+def preview(args):
+    server = PreviewServer((_ADDRESS, _PORT), _load_config, args.config)
+    webbrowser.open('http://%s:%d%s' % (_ADDRESS, _PORT, server.config.url))
+    logger.info('Serving at port %d...' % _PORT)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
 def deploy(args):
     config = _load_config(args.config)
     src_dir = os.path.realpath(config.article_dir)
@@ -178,12 +263,43 @@ def main():
     build_parser = subparsers.add_parser(
         'build', help='build blog')
     build_parser.add_argument('config', **config_param)
+    build_parser.add_argument('--full',
+                              help='ignore previous build and rebuild all '
+                                   'articles',
+                              action='store_true')
+    build_parser.add_argument('-j', '--jobs',
+                              help='number of processes for generating '
+                                   'articles; 0 for number of CPUs',
+                              type=int, default=1)
+    build_parser.add_argument('--write-if-changed',
+                              help='do not overwrite files whose content is '
+                                   'unchanged',
+                              action='store_true')
+    build_parser.add_argument('--link-resources',
+                              help='hard link resources used in articles '
+                                   'instead of copying them where possible',
+                              action='store_true')
+    build_parser.add_argument('--git',
+                              help='ask git for articles changed since '
+                                   'previous build instead of checking all '
+                                   'files',
+                              action='store_true')
+    build_parser.add_argument('-w', '--watch',
+                              help='keep building whenever articles or '
+                                   'templates are changed',
+                              action='store_true')
     build_parser.set_defaults(func=build)
     # `test' command
     test_parser = subparsers.add_parser(
         'test', help='start a local server to test blog')
     test_parser.add_argument('config', **config_param)
     test_parser.set_defaults(func=test)
+    # `preview' command
+    preview_parser = subparsers.add_parser(
+        'preview', help='start a local server rendering pages on demand to '
+                        'preview blog')
+    preview_parser.add_argument('config', **config_param)
+    preview_parser.set_defaults(func=preview)
     # `deploy' command
     deploy_parser = subparsers.add_parser(
         'deploy', help='deploy the blog to remote git repository')
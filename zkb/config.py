@@ -11,10 +11,12 @@ This module contains classes representing config file of the blog.
 
 import inspect
 import itertools
+import hashlib
 import yaml
 import os
 from time import strftime, localtime
 
+from zkb import __version__
 from zkb.utils import DEFAULT_ENCODING
 from zkb.utils import RequiredSettingIncorrectError
 
@@ -61,6 +63,23 @@ class ConfigBase(object):
             out.append(yaml.dump(out_dict, default_flow_style=False))
         return out
 
+    def get_digest(self):
+        """Get a digest of all settings that are not dynamic, together with
+        version of ZKB. Two configurations with the same digest produce the
+        same output.
+
+        :rtype: str
+        """
+
+        def _filter_static_config(value):
+            return isinstance(value, ConfigItem) \
+                and value.type != ConfigItem.DYNAMIC
+
+        items = []
+        for name, _ in inspect.getmembers(type(self), _filter_static_config):
+            items.append((name[1:], getattr(self, name[1:], None)))
+        return hashlib.sha1(repr((__version__, items))).hexdigest()
+
     def update(self, config):
         """Update configuration with dictionary.
 
@@ -104,6 +123,36 @@ class SiteConfig(ConfigBase):
         '_template',
         'Directory where all template files are places.',
         ConfigItem.PRIVATE)
+    _cache_dir = ConfigItem(
+        '_cache',
+        'Directory where build caches are placed.',
+        ConfigItem.PRIVATE)
+    _ignored_files = ConfigItem(
+        ['.*', 'node_modules'],
+        'Glob patterns of names of files and directories which are ignored '
+        'when looking for article sources.',
+        ConfigItem.PRIVATE)
+    _body_cache_size = ConfigItem(
+        64,
+        'Maximum size in megabytes of the cache of generated article bodies, '
+        'which is placed in cache directory. Set to 0 to disable the cache.',
+        ConfigItem.PRIVATE)
+    _highlight_cache_size = ConfigItem(
+        16,
+        'Maximum size in megabytes of the cache of highlighted code blocks, '
+        'which is placed in cache directory. Set to 0 to disable the cache.',
+        ConfigItem.PRIVATE)
+    _file_hash_cache = ConfigItem(
+        True,
+        'Whether hashes of files referenced by articles are kept in cache '
+        'directory, so that unchanged files are not hashed again in following '
+        'builds.',
+        ConfigItem.PRIVATE)
+    _template_cache = ConfigItem(
+        True,
+        'Whether compiled templates are cached in cache directory, so that '
+        'unchanged templates are not compiled again in following builds.',
+        ConfigItem.PRIVATE)
     _git_remote = ConfigItem(
         'http://example.com/blog.git',
         'Git remote repository where blog source is stored (on \'source\' '
@@ -206,6 +255,12 @@ class SiteConfig(ConfigBase):
         self.article_dir = SiteConfig._article_dir.default
         self.output_dir = SiteConfig._output_dir.default
         self.template_dir = SiteConfig._template_dir.default
+        self.cache_dir = SiteConfig._cache_dir.default
+        self.ignored_files = SiteConfig._ignored_files.default
+        self.body_cache_size = SiteConfig._body_cache_size.default
+        self.highlight_cache_size = SiteConfig._highlight_cache_size.default
+        self.file_hash_cache = SiteConfig._file_hash_cache.default
+        self.template_cache = SiteConfig._template_cache.default
         self.git_remote = SiteConfig._git_remote.default
         self.author = SiteConfig._author.default
         self.email = SiteConfig._email.default
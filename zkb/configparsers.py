@@ -9,6 +9,9 @@ Parsers of header in headered file.
 :License: BSD, see LICENSE for details.
 """
 
+import re
+import json
+
 import yaml
 
 
@@ -32,10 +35,18 @@ class ConfigParser(object):
 
 class YamlConfigParser(ConfigParser):
     """Parser for YAML config.
+
+    :param use_libyaml: True if the loader of LibYAML should be used when it
+        is available; False if the pure Python loader should always be used.
+    :type use_libyaml: bool
     """
 
-    def __init__(self):
+    def __init__(self, use_libyaml=True):
         super(YamlConfigParser, self).__init__()
+        if use_libyaml:
+            self._loader = getattr(yaml, 'CLoader', yaml.Loader)
+        else:
+            self._loader = yaml.Loader
 
     def parse(self, config):
         """Override to parse an YAML-formatted header config to dictionary.
@@ -45,4 +56,140 @@ class YamlConfigParser(ConfigParser):
         :return: result of parsing. None if parsing failed.
         :rtype: dict or None
         """
-        return yaml.load(config)
+        return yaml.load(config, Loader=self._loader)
+
+
+class JsonConfigParser(ConfigParser):
+    """Parser for JSON config.
+    """
+
+    def __init__(self):
+        super(JsonConfigParser, self).__init__()
+
+    def parse(self, config):
+        """Override to parse an JSON-formatted header config to dictionary.
+
+        :param config: a string representing the JSON-formatted header.
+        :type config: str
+        :return: result of parsing. None if the header is empty.
+        :rtype: dict or None
+        :raises ValueError: if the header is not valid JSON.
+        """
+        if len(config.strip()) == 0:
+            return None
+        return json.loads(config)
+
+
+#: Regular expression for matching a line of key/value config.
+_KEY_VALUE_PATTERN = re.compile(
+    r'^(?P<key>[A-Za-z_][\w-]*):(?:[ \t]+(?P<value>.*?))?[ \t]*$')
+
+#: Regular expression for matching integers in key/value config.
+_INTEGER_PATTERN = re.compile(r'^[-+]?(0|[1-9][0-9]*)$')
+
+#: Regular expression for matching plain scalars in key/value config, which
+# must not start with YAML indicators or anything like a float without
+# integer part, and must not contain anything starting a comment or a
+# mapping.
+_PLAIN_STRING_PATTERN = re.compile(
+    r'''^(?![,\[\]{}#&*!|>'"%@`=~])(?![-?:]([ \t]|$))(?![-+]?\.)'''
+    r'''(?!<<)(?!.*(:[ \t]|[ \t]\#|:$)).+$''',
+    re.UNICODE)
+
+#: Regular expression for matching plain scalars in key/value config which
+# may be numbers or dates.
+_NUMERIC_START_PATTERN = re.compile(r'^[-+]?[0-9]')
+
+#: Resolver of types of plain scalars in key/value config which may be
+# numbers or dates, the same as YAML does.
+_YAML_RESOLVER = yaml.resolver.Resolver()
+
+#: Loader of dates in key/value config.
+_YAML_SAFE_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+#: Values of key/value config which are converted to other types, the same
+# as YAML does.
+_KEY_VALUE_CONSTANTS = {}
+for _names, _constant in (('null Null NULL', None),
+                          ('yes Yes YES true True TRUE on On ON', True),
+                          ('no No NO false False FALSE off Off OFF', False)):
+    _KEY_VALUE_CONSTANTS.update(dict.fromkeys(_names.split(), _constant))
+
+
+class KeyValueConfigParser(ConfigParser):
+    """Parser for key/value config, which is a restricted subset of YAML.
+
+    Each line of the config is either a comment starting with ``#``, or a key
+    and a value separated by ``: ``. A value can be an integer, a boolean, a
+    null value, a date, a string quoted by ``'``, or a string not looking like
+    any of others. Nested values, lists, floats and other numbers are not
+    supported. Values are parsed to the same objects as YAML does.
+    """
+
+    def __init__(self):
+        super(KeyValueConfigParser, self).__init__()
+
+    def parse(self, config):
+        """Override to parse a key/value header config to dictionary.
+
+        :param config: a string representing the key/value header.
+        :type config: str
+        :return: result of parsing. None if the header is empty.
+        :rtype: dict or None
+        :raises ValueError: if a line of the header is not supported.
+        """
+        result = None
+        for line in config.splitlines():
+            if len(line) == 0 or line.startswith('#'):
+                continue
+            m = _KEY_VALUE_PATTERN.match(line)
+            if m is None:
+                raise ValueError('Unsupported line in header: %r' % line)
+            if m.group('key') in _KEY_VALUE_CONSTANTS:
+                raise ValueError('Unsupported key in header: %r' % line)
+            if result is None:
+                result = {}
+            result[m.group('key')] = self._parse_value(m.group('value'), line)
+        return result
+
+    def _parse_value(self, value, line):
+        """Parse value of a line.
+
+        :param value: the value.
+        :type value: str
+        :param line: the entire line, for reporting errors.
+        :type line: str
+        :return: the parsed value.
+        :raises ValueError: if the value is not supported.
+        """
+        if value is None or len(value) == 0:
+            return None
+        if value in _KEY_VALUE_CONSTANTS:
+            return _KEY_VALUE_CONSTANTS[value]
+        if _INTEGER_PATTERN.match(value):
+            return int(value)
+        if len(value) >= 2 and value.startswith("'") and value.endswith("'") \
+                and "'" not in value[1:-1].replace("''", ''):
+            return self._to_str(value[1:-1].replace("''", "'"))
+        if _PLAIN_STRING_PATTERN.match(value):
+            if _NUMERIC_START_PATTERN.match(value) is None:
+                return self._to_str(value)
+            tag = _YAML_RESOLVER.resolve(yaml.ScalarNode, value, (True, False))
+            if tag == u'tag:yaml.org,2002:str':
+                return self._to_str(value)
+            if tag == u'tag:yaml.org,2002:timestamp':
+                return yaml.load(value, Loader=_YAML_SAFE_LOADER)
+        raise ValueError('Unsupported value in header: %r' % line)
+
+    def _to_str(self, value):
+        """Convert a string to :class:`str` if it only contains ASCII
+        characters, the same as YAML does.
+
+        :param value: the string.
+        :type value: basestring
+        :rtype: basestring
+        """
+        try:
+            return str(value)
+        except UnicodeError:
+            return value
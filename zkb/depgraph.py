@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+zkb.depgraph
+~~~~~~~~~~~~
+
+Dependency graph between article sources and output pages.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import hashlib
+
+
+#: Aspect of an article covering its header, such as title, date and tags.
+HEADER = 'header'
+
+#: Aspect of an article covering its generated body.
+BODY = 'body'
+
+#: Both aspects of an article.
+ALL = (HEADER, BODY)
+
+
+def _get_key_digest(key):
+    return hashlib.sha1(repr(key)).hexdigest()
+
+
+class DependencyGraph(object):
+    """Records, for every output page, the sources the page depends on.
+
+    Each output page has a *key* describing its structure, such as the ordered
+    list of articles shown on the page and the links to its neighbour pages.
+    Each dependency of a page is a source together with aspects of the source
+    the page uses. A page is outdated when its key changes, or when any aspect
+    it uses changes on any of its dependencies.
+
+    :param site_key: key of everything shared by all pages, such as
+        templates. All pages are outdated if the site key changes.
+    """
+
+    def __init__(self, site_key=None):
+        super(DependencyGraph, self).__init__()
+        self.site_key = _get_key_digest(site_key)
+        self.nodes = {}
+        self._dependents = {}
+
+    def add(self, output, key, dependencies):
+        """Add an output page to the graph.
+
+        :param output: output file of the page.
+        :type output: str
+        :param key: key of the structure of the page; must have a stable
+            :func:`repr`.
+        :param dependencies: a dictionary whose keys are sources and values
+            are tuples of aspects of the source used by the page.
+        :type dependencies: dict
+        """
+        self.nodes[output] = (_get_key_digest(key), dependencies)
+        for source, aspects in dependencies.iteritems():
+            if source not in self._dependents:
+                self._dependents[source] = []
+            self._dependents[source].append((output, aspects))
+
+    def get_dependents(self, source):
+        """Get output pages depending on a source.
+
+        :param source: the source.
+        :type source: str
+        :rtype: list of str
+        """
+        return [output for output, _ in self._dependents.get(source, [])]
+
+    def get_outdated(self, previous, changes):
+        """Get output pages that should be rendered again.
+
+        :param previous: graph of previous build, or None if unknown.
+        :type previous: DependencyGraph
+        :param changes: a dictionary whose keys are sources changed since
+            previous build and values are sets of changed aspects.
+        :type changes: dict
+        :rtype: set of str
+        """
+        if previous is None or previous.site_key != self.site_key:
+            return set(self.nodes.iterkeys())
+        outdated = set()
+        for output, (key, _) in self.nodes.iteritems():
+            previous_node = previous.nodes.get(output)
+            if previous_node is None or previous_node[0] != key:
+                outdated.add(output)
+        for source, changed in changes.iteritems():
+            for output, aspects in self._dependents.get(source, []):
+                if not changed.isdisjoint(aspects):
+                    outdated.add(output)
+        return outdated
+
+    def __getstate__(self):
+        return {'site_key': self.site_key, 'nodes': self.nodes}
+
+    def __setstate__(self, state):
+        self.site_key = state['site_key']
+        self.nodes = state['nodes']
+        self._dependents = {}
+        for output, (_, dependencies) in self.nodes.iteritems():
+            for source, aspects in dependencies.iteritems():
+                if source not in self._dependents:
+                    self._dependents[source] = []
+                self._dependents[source].append((output, aspects))
@@ -36,7 +36,9 @@ class Logger(object):
                 content = '%s: %s' % (_get_level_string(level), content)
             if self.show_time:
                 content = '[%s] %s' % (time.ctime(), content)
-            print(content, file=self.redirect)
+            # Write line in one call so that lines from worker processes do
+            # not interleave
+            print(content + '\n', end='', file=self.redirect)
 
     def trace(self, content):
         self._log(content, Logger.LOG_TRACE)
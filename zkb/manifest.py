@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+zkb.manifest
+~~~~~~~~~~~~
+
+Persistent record of a previous build, used to skip work on unchanged
+articles.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import os
+import hashlib
+import cPickle as pickle
+
+from zkb.log import logger
+
+
+#: Name of the manifest file inside the cache directory.
+MANIFEST_FILE = 'manifest.pickle'
+
+#: Version of the manifest format. Manifests of other versions are discarded.
+_MANIFEST_VERSION = 2
+
+
+def get_content_hash(content):
+    """Get SHA1 hash of the raw content of a file.
+
+    :param content: raw content.
+    :type content: str
+    :rtype: str
+    """
+    return hashlib.sha1(content).hexdigest()
+
+
+def get_header_digest(header, article=None):
+    """Get a digest of a parsed article header, together with fields of the
+    scanned article derived from the header or from the source file, which
+    are shown in pages of other articles. For example, date of an article
+    without date in its header is modification time of its source, so the
+    digest changes when the source is modified.
+
+    :param header: header dictionary.
+    :type header: dict
+    :param article: article returned by scanning the header, or None if the
+        article is a draft.
+    :type article: ArticleConfig
+    :rtype: str
+    """
+    items = sorted(header.iteritems()) if header is not None else []
+    if article is not None:
+        items.append((article.title, article.date, article.slug,
+                      article.tags, article.locale, article.article_type))
+    return hashlib.sha1(repr(items)).hexdigest()
+
+
+class ManifestEntry(object):
+    """Build record of a single source file.
+
+    :param source: path of the source file.
+    :type source: str
+    :param size: size of the source file in bytes.
+    :type size: int
+    :param mtime: modification time of the source file.
+    :type mtime: float
+    :param content_hash: SHA1 hash of the raw content of the source file.
+    :type content_hash: str
+    :param header_digest: digest of the parsed header.
+    :type header_digest: str
+    :param article: generated article, or None if the source is a draft.
+    :type article: ArticleConfig
+    """
+
+    def __init__(self, source, size, mtime, content_hash, header_digest,
+                 article):
+        super(ManifestEntry, self).__init__()
+        self.source = source
+        self.size = size
+        self.mtime = mtime
+        self.content_hash = content_hash
+        self.header_digest = header_digest
+        self.article = article
+        self.references = {}
+        self.outputs = []
+        self.dated_by_mtime = False
+
+
+class BuildManifest(object):
+    """Persistent manifest of all source files processed in previous build.
+
+    A manifest is bound to the site configuration it was built with. When the
+    configuration or the version of ZKB changes, the manifest is discarded and
+    everything will be built again.
+
+    Besides entries of sources, the manifest keeps the dependency graph of
+    output pages written by the site builder, and the git commit checked out
+    when the sources were built, together with files changed since that
+    commit, if any.
+
+    :param filename: file where the manifest is stored.
+    :type filename: str
+    :param config_digest: digest of the site configuration.
+    :type config_digest: str
+    """
+
+    def __init__(self, filename, config_digest=None):
+        super(BuildManifest, self).__init__()
+        self.filename = filename
+        self.config_digest = config_digest
+        self.entries = {}
+        self.graph = None
+        self.commit = None
+        self.changed_files = None
+
+    @classmethod
+    def load(cls, filename, config):
+        """Load manifest from file. An empty manifest is returned if the file
+        does not exist or was written with different configuration.
+
+        :param filename: file where the manifest is stored.
+        :type filename: str
+        :param config: site configuration.
+        :type config: SiteConfig
+        :rtype: BuildManifest
+        """
+        manifest = cls(filename, config.get_digest())
+        try:
+            with open(filename, 'rb') as stream:
+                data = pickle.load(stream)
+        except IOError:
+            return manifest
+        except (EOFError, AttributeError, ImportError, IndexError,
+                pickle.UnpicklingError) as e:
+            logger.warn('Ignoring corrupted build manifest: %s' % e)
+            return manifest
+        if data.get('version') != _MANIFEST_VERSION:
+            logger.info('Build manifest is outdated, rebuilding all...')
+            return manifest
+        if data.get('config') != manifest.config_digest:
+            logger.info('Site config changed, rebuilding all...')
+            return manifest
+        manifest.entries = data['entries']
+        manifest.graph = data.get('graph')
+        manifest.commit, manifest.changed_files = data.get('git',
+                                                           (None, None))
+        return manifest
+
+    def save(self):
+        """Write manifest to file.
+        """
+        logger.debug('Writing build manifest to \'%s\'...' % self.filename)
+        dest_dir = os.path.dirname(self.filename)
+        if len(dest_dir) != 0 and not os.path.exists(dest_dir):
+            os.makedirs(dest_dir)
+        data = {'version': _MANIFEST_VERSION,
+                'config': self.config_digest,
+                'entries': self.entries,
+                'graph': self.graph,
+                'git': (self.commit, self.changed_files)}
+        temp_filename = self.filename + '.tmp'
+        with open(temp_filename, 'wb') as stream:
+            pickle.dump(data, stream, pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        os.rename(temp_filename, self.filename)
+
+    def find(self, source, size, mtime, stat=os.stat):
+        """Find an up-to-date entry by size and modification time of source.
+
+        :param source: path of the source file.
+        :type source: str
+        :param size: current size of the source file.
+        :type size: int
+        :param mtime: current modification time of the source file.
+        :type mtime: float
+        :param stat: function to get stat result of referenced files.
+        :return: the entry, or None if the source is unknown or changed.
+        :rtype: ManifestEntry
+        """
+        entry = self.entries.get(source)
+        if entry is None or entry.size != size or entry.mtime != mtime:
+            return None
+        if not self._references_unchanged(entry, stat):
+            return None
+        return entry
+
+    def find_by_content(self, source, size, mtime, content_hash,
+                        stat=os.stat):
+        """Find an up-to-date entry by content hash of source. If found, size
+        and modification time of the entry are refreshed. Entries of articles
+        dated by modification time of their sources are never found, since
+        their dates and URLs change with modification time.
+
+        :param source: path of the source file.
+        :type source: str
+        :param size: current size of the source file.
+        :type size: int
+        :param mtime: current modification time of the source file.
+        :type mtime: float
+        :param content_hash: SHA1 hash of current content.
+        :type content_hash: str
+        :param stat: function to get stat result of referenced files.
+        :return: the entry, or None if the source is unknown or changed.
+        :rtype: ManifestEntry
+        """
+        entry = self.entries.get(source)
+        if entry is None or entry.content_hash != content_hash \
+                or entry.dated_by_mtime:
+            return None
+        if not self._references_unchanged(entry, stat):
+            return None
+        entry.size = size
+        entry.mtime = mtime
+        return entry
+
+    def _references_unchanged(self, entry, stat):
+        """Check whether resources referenced by an entry are unchanged.
+
+        :param entry: manifest entry.
+        :type entry: ManifestEntry
+        :param stat: function to get stat result of referenced files.
+        :rtype: bool
+        """
+        for filename, (size, mtime) in entry.references.iteritems():
+            try:
+                st = stat(filename)
+            except OSError:
+                return False
+            if st.st_size != size or st.st_mtime != mtime:
+                return False
+        return True
+
+    def update(self, entry, stat=os.stat):
+        """Add or replace an entry, recording resources referenced by the
+        generated article.
+
+        :param entry: manifest entry.
+        :type entry: ManifestEntry
+        :param stat: function to get stat result of referenced files.
+        """
+        entry.references = {}
+        if entry.article is not None:
+            references = dict(entry.article.full['local_references'])
+            if entry.article.abstract is not None:
+                references.update(
+                    entry.article.abstract.get('local_references', {}))
+            for filename in references:
+                try:
+                    st = stat(filename)
+                except OSError:
+                    continue
+                entry.references[filename] = (st.st_size, st.st_mtime)
+        self.entries[entry.source] = entry
+
+    def retain(self, sources):
+        """Remove entries of sources that no longer exist.
+
+        :param sources: paths of all current source files.
+        :type sources: iterable
+        """
+        sources = set(sources)
+        for source in self.entries.keys():
+            if source not in sources:
+                del self.entries[source]
@@ -80,6 +80,12 @@ class BlockHtmlFormatter(object):
         """
         pass
 
+    def reset(self):
+        """Reset states of the formatter kept for the document being
+        formatted, so that the formatter can be reused for a new document.
+        """
+        pass
+
 
 class BlockHtmlFormatterTreeprocessor(Treeprocessor):
     """HTML block formatter tree processor for Python markdown extension.
@@ -152,6 +158,13 @@ class BlockHtmlFormatterExtension(Extension):
         md.treeprocessors.add('blockformatter', formatter, '<inline')
         md.registerExtension(self)
 
+    def reset(self):
+        """Reset all formatters. This method is called by Python Markdown when
+        the Markdown instance is reset for a new document.
+        """
+        for _, formatter in self.formatters.iteritems():
+            formatter.reset()
+
     def get_requisites(self):
         """Get the requisites for all formatters.
 
@@ -15,13 +15,17 @@ HTML formatter for customizing code blocks in Markdown source.
 """
 
 import re
-import StringIO
+import hashlib
+import timeit
 
+import pygments
 from pygments import highlight
 from pygments.lexers import get_lexer_by_name, guess_lexer
 from pygments.lexers.special import TextLexer
 from pygments.formatters.html import HtmlFormatter
 
+from zkb import __version__
+from zkb.cache import MemoryCache, get_cache_key
 from zkb.mdext.blockformatter import BlockHtmlFormatter
 
 
@@ -37,6 +41,115 @@ _HEADER_PATTERN = re.compile(r'''
     (linenos:(?P<linenos>true|false))?  # Optional show/hide line no. setting.
     ''', re.VERBOSE)
 
+#: Maximum number of highlighted blocks kept in memory by each formatter.
+_MEMORY_CACHE_SIZE = 256
+
+#: Versions of packages affecting highlighted blocks, used in cache keys.
+_CACHE_VERSIONS = (__version__, pygments.__version__)
+
+#: Number of characters at the beginning of a block used to guess language.
+_GUESS_PREFIX_SIZE = 4096
+
+#: Maximum number of guessed languages remembered by lexer registry.
+_GUESS_CACHE_SIZE = 1024
+
+
+class LexerRegistry(object):
+    """Resolver of Pygments lexers, which caches lexers resolved by name and
+    languages guessed from code.
+
+    Lexers are shared by all aliases of the same language. Language is
+    guessed from a bounded prefix of the code, and remembered by the hash of
+    the prefix. Number of guesses and time spent on guessing are recorded, and
+    can be retrieved by :func:`pop_stats`.
+    """
+
+    def __init__(self):
+        super(LexerRegistry, self).__init__()
+        self._lexers = {}
+        self._instances = {}
+        self._guesses = MemoryCache(_GUESS_CACHE_SIZE)
+        self._text_lexer = TextLexer()
+        self._guessed = 0
+        self._memoized = 0
+        self._guess_time = 0.0
+
+    def _share(self, lexer):
+        """Get the shared lexer of the same class.
+
+        :param lexer: a new lexer.
+        :rtype: Lexer
+        """
+        if lexer is None:
+            return None
+        return self._instances.setdefault(type(lexer), lexer)
+
+    def get_by_name(self, name):
+        """Get lexer by name or alias of a language.
+
+        :param name: name or alias of the language.
+        :type name: str
+        :return: the lexer, or None if the language is unknown.
+        :rtype: Lexer
+        """
+        if name not in self._lexers:
+            try:
+                lexer = get_lexer_by_name(name)
+            except ValueError:
+                lexer = None
+            self._lexers[name] = self._share(lexer)
+        return self._lexers[name]
+
+    def guess(self, code):
+        """Guess lexer from the beginning of code.
+
+        :param code: the code.
+        :type code: str
+        :return: the lexer, or None if the language cannot be guessed.
+        :rtype: Lexer
+        """
+        prefix = code[:_GUESS_PREFIX_SIZE]
+        key = hashlib.sha1(prefix.encode('utf-8')).hexdigest()
+        lexer = self._guesses.get(key)
+        if lexer is not None:
+            self._memoized += 1
+            return lexer or None
+        start = timeit.default_timer()
+        try:
+            lexer = self._share(guess_lexer(prefix))
+        except ValueError:
+            lexer = None
+        self._guess_time += timeit.default_timer() - start
+        self._guessed += 1
+        # Unknown language is remembered as False.
+        self._guesses.set(key, lexer or False)
+        return lexer
+
+    def get_text_lexer(self):
+        """Get lexer for plain text.
+
+        :rtype: Lexer
+        """
+        return self._text_lexer
+
+    def pop_stats(self):
+        """Get statistics of language guessing since last call.
+
+        :return: a tuple of three elements, respectively number of guesses,
+            number of guesses answered by remembered results, and time spent
+            on guessing in seconds.
+        :rtype: tuple
+        """
+        stats = (self._guessed, self._memoized, self._guess_time)
+        self._guessed = 0
+        self._memoized = 0
+        self._guess_time = 0.0
+        return stats
+
+
+#: Lexer registry shared by all code block formatters in current process.
+lexer_registry = LexerRegistry()
+
 
 class CodeBlockPygmentsHtmlFormatter(HtmlFormatter):
     """Extension of Pygments HTML formatter for custom formatting of the code.
@@ -48,6 +161,7 @@ class CodeBlockPygmentsHtmlFormatter(HtmlFormatter):
     def __init__(self, **options):
         super(CodeBlockPygmentsHtmlFormatter, self).__init__(**options)
         self.noclasses = False  # Force using a class in our implementation
+        self.hl_lines = set(self.hl_lines)
 
     def _get_highlight_class(self, lineno):
         if lineno in self.hl_lines:
@@ -62,69 +176,75 @@ class CodeBlockPygmentsHtmlFormatter(HtmlFormatter):
             extra = ''
         return extra
 
+    def _get_highlight_classes(self):
+        """Get highlight classes of all marked lines.
+
+        :return: a dictionary whose keys are line numbers and values are
+            highlight classes.
+        :rtype: dict
+        """
+        return dict((lineno, self._get_highlight_class(lineno))
+                    for lineno in self.hl_lines)
+
     def _highlight_lines(self, tokensource):
         """Highlighted the lines specified in the `hl_lines` option by
         post-processing the token stream coming from `_format_lines`.
         """
+        classes = self._get_highlight_classes()
         for i, (t, value) in enumerate(tokensource):
             if t != 1:
                 yield t, value
             yield 1, ('<div class="line%s">%s</div>' %
-                      (self._get_highlight_class(i + self.linenostart), value))
+                      (classes.get(i + self.linenostart, ''), value))
+
+    def _get_gutter_line(self, lineno, hl, mw):
+        """Get the line number element of a line in the gutter.
+
+        :param lineno: line number.
+        :type lineno: int
+        :param hl: highlight class of the line.
+        :type hl: str
+        :param mw: width of line numbers.
+        :type mw: int
+        :rtype: str
+        """
+        if lineno % self.linenostep != 0:
+            return '<div class="line-number%s">\n</div>' % hl
+        if self.linenospecial and lineno % self.linenospecial == 0:
+            hl = ' special' + hl
+        if self.anchorlinenos:
+            return ('<div class="line-number%s"><a href="#%s-%d">%*d</a>\n'
+                    '</div>' % (hl, self.lineanchors, lineno, mw, lineno))
+        return '<div class="line-number%s">%*d\n</div>' % (hl, mw, lineno)
 
     def _wrap_tablelinenos(self, inner):
-        dummyoutfile = StringIO.StringIO()
+        code = []
         lncount = 0
         for t, line in inner:
             if t:
                 lncount += 1
-            dummyoutfile.write(line)
+            code.append(line)
 
         fl = self.linenostart
-        mw = len(str(lncount + fl - 1))
-        sp = self.linenospecial
-        st = self.linenostep
-        la = self.lineanchors
-        aln = self.anchorlinenos
-        if sp:
-            lines = []
-            for i in range(fl, fl + lncount):
-                hl = self._get_highlight_class(i)
-                if i % st == 0:
-                    if i % sp == 0:
-                        if aln:
-                            lines.append('<div class="line-number special%s">'
-                                         '<a href="#%s-%d">%*d</a>\n'
-                                         '</div>' % (hl, la, i, mw, i))
-                        else:
-                            lines.append('<div class="line-number special%s">'
-                                         '%*d\n</div>' % (hl, mw, i))
-                    else:
-                        if aln:
-                            lines.append('<div class="line-number%s">'
-                                         '<a href="#%s-%d">%*d</a>\n'
-                                         '</div>' % (hl, la, i, mw, i))
-                        else:
-                            lines.append('<div class="line-number%s">'
-                                         '%*d\n</div>' % (hl, mw, i))
-                else:
-                    lines.append('<div class="line-number%s">\n</div>' % hl)
-            ls = ''.join(lines)
+        end = fl + lncount
+        mw = len(str(end - 1))
+        get_class = self._get_highlight_classes().get
+        if self.linenostep != 1 or self.linenospecial:
+            lines = [self._get_gutter_line(i, get_class(i, ''), mw)
+                     for i in xrange(fl, end)]
+        elif self.anchorlinenos:
+            # Every line is numbered in the same way, so that one template
+            # can be used for all lines.
+            template = ('<div class="line-number%s"><a href="#' +
+                        self.lineanchors.replace('%', '%%') +
+                        '-%d">%' + str(mw) + 'd</a>\n</div>')
+            lines = [template % (get_class(i, ''), i, i)
+                     for i in xrange(fl, end)]
         else:
-            lines = []
-            for i in range(fl, fl + lncount):
-                hl = self._get_highlight_class(i)
-                if i % st == 0:
-                    if aln:
-                        lines.append('<div class="line-number%s">'
-                                     '<a href="#%s-%d">%*d</a>\n'
-                                     '</div>' % (hl, la, i, mw, i))
-                    else:
-                        lines.append('<div class="line-number%s">%*d\n'
-                                     '</div>' % (hl, mw, i))
-                else:
-                    lines.append('<div class="line-number%s">\n</div>' % hl)
-            ls = ''.join(lines)
+            template = '<div class="line-number%s">%' + str(mw) + 'd\n</div>'
+            lines = [template % (get_class(i, ''), i)
+                     for i in xrange(fl, end)]
+        ls = ''.join(lines)
 
         # in case you wonder about the seemingly redundant <div> here: since
         # the content in the other cell also is wrapped in a div, some browsers
@@ -132,7 +252,7 @@ class CodeBlockPygmentsHtmlFormatter(HtmlFormatter):
         yield 0, ('<figure class="%s"><table>' % self.cssclass +
                   '<tr><td class="line-numbers"><div><pre>' +
                   ls + '</pre></div></td><td class="code">')
-        yield 0, dummyoutfile.getvalue()
+        yield 0, ''.join(code)
         yield 0, '</td></tr></table></figure>'
 
     def _wrap_div(self, inner):
@@ -181,30 +301,53 @@ class CodeBlockHtmlFormatter(BlockHtmlFormatter):
     :type guess_lang: bool
     :param css_class: CSS class name of code blocks.
     :type css_class: str
+    :param cache: persistent cache of highlighted blocks, such as a
+        :class:`~zkb.cache.DiskCache`, or None if highlighted blocks should
+        only be kept in memory.
     """
 
-    def __init__(self, linenos=True, guess_lang=False, css_class="codeblock"):
+    def __init__(self, linenos=True, guess_lang=False, css_class="codeblock",
+                 cache=None):
         super(CodeBlockHtmlFormatter, self).__init__()
         self.linenos = linenos
         self.guess_lang = guess_lang
         self.css_class = css_class
+        self.cache = cache
+        self._memory_cache = MemoryCache(_MEMORY_CACHE_SIZE)
 
     def get_tag(self):
         return "p"
 
     def format(self, header, block):
-        lang, line_start, hl_lines, linenos = self._parse_header(header)
-        lexer = None
-        try:
-            lexer = get_lexer_by_name(lang)
-        except ValueError:
-            try:
-                if self.guess_lang:
-                    lexer = guess_lexer(block)
-            except ValueError:
-                pass
+        options = self._parse_header(header)
+        key = get_cache_key(_CACHE_VERSIONS, options, self.guess_lang,
+                            self.css_class,
+                            hashlib.sha1(block.encode('utf-8')).hexdigest())
+        output = self._memory_cache.get(key)
+        if output is None and self.cache is not None:
+            output = self.cache.get(key)
+            if output is not None:
+                self._memory_cache.set(key, output)
+        if output is None:
+            output = self._highlight(block, *options)
+            self._memory_cache.set(key, output)
+            if self.cache is not None:
+                self.cache.set(key, output)
+        return output
+
+    def _highlight(self, block, lang, line_start, hl_lines, linenos):
+        """Highlight a code block.
+
+        :param block: source code in the block.
+        :type block: str
+        :return: highlighted HTML.
+        :rtype: str
+        """
+        lexer = lexer_registry.get_by_name(lang)
+        if lexer is None and self.guess_lang:
+            lexer = lexer_registry.guess(block)
         if lexer is None:
-            lexer = TextLexer()
+            lexer = lexer_registry.get_text_lexer()
         formatter = CodeBlockPygmentsHtmlFormatter(linenos=linenos,
                                                    cssclass=self.css_class,
                                                    hl_lines=hl_lines,
@@ -263,7 +406,7 @@ class CodeBlockHtmlFormatter(BlockHtmlFormatter):
                                                int(entry[1]) + 1))
                     except ValueError:
                         pass
-                hl_lines = list(marks)
+                hl_lines = sorted(marks)
             if m.group('linenos'):
                 if m.group('linenos') == 'true':
                     linenos = True
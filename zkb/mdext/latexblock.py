@@ -27,6 +27,9 @@ class LatexBlockHtmlFormatter(BlockHtmlFormatter):
         self.active = True
         return '\\[' + block + '\\]'
 
+    def reset(self):
+        self.active = False
+
     def get_requisites(self):
         if not self.active:
             return None
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+zkb.preview
+~~~~~~~~~~~
+
+Previewing the site with a local server rendering pages on demand.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import os
+import time
+import urllib
+import urlparse
+import mimetypes
+import BaseHTTPServer
+
+import pkg_resources
+
+from zkb.builder import PreviewSiteBuilder
+from zkb.config import ArticleConfig
+from zkb.watcher import create_watcher
+from zkb.log import logger
+
+
+#: Minimum seconds between two checks of changed files.
+_CHECK_INTERVAL = 1.0
+
+
+class PreviewServer(BaseHTTPServer.HTTPServer):
+    """Local HTTP server previewing the site. Changes of articles, templates
+    and the config file are checked before serving each request.
+
+    :param address: a tuple of host and port to listen at.
+    :type address: tuple
+    :param load_config: a function loading site configuration.
+    :param config_file: the config file.
+    :type config_file: str
+    :param builder_args: other keyword arguments of the site builder.
+    """
+
+    def __init__(self, address, load_config, config_file, **builder_args):
+        BaseHTTPServer.HTTPServer.__init__(self, address,
+                                           _PreviewRequestHandler)
+        self._load_config = load_config
+        self._config_file = os.path.realpath(config_file)
+        self._builder_args = builder_args
+        self._last_check = 0
+        self._load()
+
+    def _load(self):
+        """Load configuration and all articles.
+        """
+        self.config = self._load_config(self._config_file)
+        self.builder = PreviewSiteBuilder(self.config, **self._builder_args)
+        self.builder.load()
+        self._watcher = create_watcher(
+            [self.config.article_dir, self.config.template_dir],
+            [self.config.output_dir, self.config.cache_dir],
+            self.config.ignored_files)
+
+    def _check_changes(self):
+        """Load changed files since previous check.
+        """
+        if time.time() - self._last_check < _CHECK_INTERVAL:
+            return
+        changed = self._watcher.wait(0)
+        if len(changed) > 0:
+            logger.info('%d files changed, loading again...' % len(changed))
+            if self._config_file in changed:
+                self._watcher.close()
+                self._load()
+            else:
+                self.builder.reload(changed)
+                self.builder.load()
+        self._last_check = time.time()
+
+    def get(self, path):
+        """Get the response to a request.
+
+        :param path: path of the request.
+        :type path: str
+        :return: a tuple of three elements, respectively status code, headers
+            and content of the response.
+        :rtype: tuple
+        """
+        self._check_changes()
+        url = urllib.unquote(urlparse.urlsplit(path).path).decode('utf-8')
+        content = self.builder.render(url)
+        if content is not None:
+            return 200, self._get_headers('text/html'), content
+        if not url.endswith('/') \
+                and self.builder.render(url + '/') is not None:
+            return 301, {'Location': url + '/'}, ''
+        resource = self.builder.get_resource(url)
+        if resource is not None:
+            filename, in_package = resource
+            try:
+                if in_package:
+                    content = pkg_resources.resource_string('zkb', filename)
+                else:
+                    with open(filename, 'rb') as f:
+                        content = f.read()
+                content_type, _ = mimetypes.guess_type(filename)
+                return 200, self._get_headers(content_type), content
+            except IOError as e:
+                logger.error('Failed to read resource \'%s\': %s' %
+                             (filename, e))
+        not_found = self.config.special_articles.get(
+            ArticleConfig.NOT_FOUND_PAGE)
+        content = None
+        if not_found is not None:
+            content = self.builder.render(not_found.url)
+        if content is None:
+            return 404, {}, ''
+        return 404, self._get_headers('text/html'), content
+
+    def _get_headers(self, content_type):
+        """Get headers of content.
+
+        :param content_type: MIME type of the content, or None if unknown.
+        :type content_type: str
+        :rtype: dict
+        """
+        if content_type is None:
+            return {}
+        if content_type.startswith('text/'):
+            content_type += '; charset=' + self.config.encoding
+        return {'Content-Type': content_type}
+
+
+class _PreviewRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+    def _respond(self, write_content):
+        try:
+            status, headers, content = self.server.get(self.path)
+        except Exception as e:
+            logger.error('Failed to serve \'%s\': %s' % (self.path, e))
+            status, headers, content = 500, {}, ''
+        self.send_response(status)
+        for name, value in headers.iteritems():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if write_content:
+            self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
@@ -9,15 +9,76 @@ Readers for reading article sources.
 :License: BSD, see LICENSE for details.
 """
 
+import re
 import codecs
 
 from zkb.configparsers import YamlConfigParser
+from zkb.configparsers import JsonConfigParser
+from zkb.configparsers import KeyValueConfigParser
 from zkb.utils import DEFAULT_ENCODING
 from zkb.utils import UnknownEncodingError
 
 
 _DEFAULT_MORE_SEPARATOR = '--MORE--'
 
+#: Regular expression for matching line breaks, other than line feeds, that
+# are recognized by :func:`unicode.splitlines`.
+_BYTE_LINE_BREAK_PATTERN = re.compile('[\r\x0b\x0c\x1c-\x1e]')
+_UNICODE_LINE_BREAK_PATTERN = re.compile(
+    u'[\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]')
+
+#: Regular expression for matching a JSON member specifying encoding.
+_JSON_ENCODING_PATTERN = re.compile(r'"encoding"\s*:\s*"([\w.:-]+)"')
+
+#: Cache of encodings checked by :func:`_is_ascii_compatible`.
+_ascii_compatible_encodings = {}
+
+#: Regular expression for matching a top-level YAML line specifying encoding.
+_YAML_ENCODING_PATTERN = re.compile(
+    r'''^(['"]?)encoding\1[ \t]*:[ \t]*(['"]?)([\w.:-]+)\2[ \t]*(\#.*)?$''')
+
+
+def _is_ascii_compatible(encoding):
+    """Check whether an encoding encodes all ASCII characters as themselves,
+    so that line breaks can be found before decoding.
+
+    :param encoding: the encoding.
+    :type encoding: str
+    :rtype: bool
+    :raises UnknownEncodingError: if the encoding is not supported.
+    """
+    if encoding not in _ascii_compatible_encodings:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise UnknownEncodingError(encoding)
+        except TypeError:
+            return False
+        ascii_chars = ''.join(chr(i) for i in xrange(128))
+        try:
+            compatible = ascii_chars.decode(encoding) == ascii_chars
+        except (UnicodeError, LookupError):
+            compatible = False
+        _ascii_compatible_encodings[encoding] = compatible
+    return _ascii_compatible_encodings[encoding]
+
+
+def _split_lines(text):
+    """Split text into lines separated by line feeds, ignoring the line feed at
+    the end of text.
+
+    :param text: the text.
+    :type text: unicode
+    :return: list of lines, or None if text contains other line breaks.
+    :rtype: list
+    """
+    if _UNICODE_LINE_BREAK_PATTERN.search(text):
+        return None
+    lines = text.split(u'\n')
+    if lines[-1] == u'':
+        lines.pop()
+    return lines
+
 
 class HeaderedContentReader(object):
     """Base class of reader for reading and parsing a headered file.
@@ -46,6 +107,18 @@ class HeaderedContentReader(object):
                 _READER_EXTENSIONS[extension], **kwargs)
         return None
 
+    @classmethod
+    def get_type(cls, extension):
+        """Get type of reader based on file extension.
+
+        :param extension: file extension.
+        :type extension: str
+        :return: type of the reader, or None if the extension cannot be
+            recognized.
+        :rtype: str
+        """
+        return _READER_EXTENSIONS.get(extension.lower())
+
     @classmethod
     def from_type(cls, file_format, **kwargs):
         """Create a HeaderedContentReader based on its type.
@@ -62,18 +135,25 @@ class HeaderedContentReader(object):
             return constructor(**kwargs)
         return None
 
-    def _get_encoding(self, header):
+    def _get_encoding(self, header, complete=False):
         """Gets the encoding of the file specified in header of the file.
 
         This method is called by :func:`read` when parsing header. Do not call
         this method manually.
 
+        The method is called after each line of the header is read, until
+        encoding is determined, so it should only check the newest line in a
+        cheap way. It is called once more with *complete* being True after the
+        entire header is read, if encoding is still unknown.
+
         Having different header format, this class does not actually parse the
         header, but define an interface so that subclasses can override this
         method to extract correct encoding information.
 
         :param header: a list contains header lines.
         :type header: list
+        :param complete: True if all lines of the header have been read.
+        :type complete: bool
         :return: a string representing encoding judged from header lines; None
             if encoding cannot be determined.
         :rtype: str
@@ -119,7 +199,7 @@ class HeaderedContentReader(object):
         """
         pass
 
-    def read(self, stream, read_payload=True, base=None):
+    def read(self, stream, read_payload=True, base=None, parsed_header=None):
         """Reads a headered file and parse its header.
 
         A headered file contains a header and its payload, separated by a blank
@@ -158,6 +238,10 @@ class HeaderedContentReader(object):
         :param base: if provided, a copy of *base* will be returned with
             key/value updated with data read from file header.
         :type base: dict or None
+        :param parsed_header: if provided, the header parsed by a previous call
+            reading the same file, which is returned instead of parsing the
+            header again.
+        :type parsed_header: dict or None
         :return: a tuple containing three objects; respectively these are a
             dict parsed from header, the content of the payload before MORE
             separator, and the full content of the payload. Payload will
@@ -166,6 +250,124 @@ class HeaderedContentReader(object):
         :raises UnknownEncodingError: if encoding specified in header is not
             supported.
         """
+        result = self._read_bytes(stream, read_payload, base, parsed_header)
+        if result is None:
+            result = self._read_lines(stream, read_payload, base,
+                                      parsed_header)
+        return result
+
+    def _read_bytes(self, stream, read_payload, base, parsed_header=None):
+        """Reads a headered file at byte level, finding the end of header and
+        MORE separator before decoding, so that each part of the file is
+        decoded only once.
+
+        Files in encodings that are not ASCII compatible, or containing line
+        breaks other than line feeds and CRLF, cannot be read in this way.
+
+        :param stream: a stream to read.
+        :type stream: stream
+        :param read_payload: True if payload of the file should be read; False
+            if only header should be read.
+        :type read_payload: bool
+        :param base: if provided, a copy of *base* will be returned with
+            key/value updated with data read from file header.
+        :type base: dict or None
+        :param parsed_header: the header parsed before, or None.
+        :type parsed_header: dict or None
+        :return: the same tuple as :func:`read`, or None if the file should
+            be read by :func:`_read_lines`.
+        :rtype: tuple
+        """
+        encoding = self._default_encoding
+        if not _is_ascii_compatible(encoding):
+            return None
+        stream.seek(0)
+        data = stream.read()
+        if '\r' in data:
+            data = data.replace('\r\n', '\n')
+        if _BYTE_LINE_BREAK_PATTERN.search(data):
+            return None
+        # Find separator of header and payload
+        if data.startswith('\n'):
+            header_data, payload_data = '', data[1:]
+        else:
+            index = data.find('\n\n')
+            if index == -1:
+                header_data, payload_data = data, ''
+            else:
+                header_data, payload_data = data[:index], data[index + 2:]
+        del data
+        header = _split_lines(header_data.decode(encoding, 'replace'))
+        if header is None:
+            return None
+        specified = None
+        lines = []
+        for line in header:
+            lines.append(line)
+            specified = self._get_encoding(lines)
+            if specified is not None:
+                break
+        if specified is None:
+            specified = self._get_encoding(header, True)
+        if specified is not None and specified != encoding:
+            if not _is_ascii_compatible(specified):
+                return None
+            encoding = specified
+            header = _split_lines(header_data.decode(encoding, 'replace'))
+            if header is None:
+                return None
+        if parsed_header is None:
+            header_result = self._parse_header(header, base)
+        else:
+            header_result = parsed_header
+        if not read_payload:
+            return header_result, None, None
+        if payload_data.endswith('\n'):
+            payload_data = payload_data[:-1]
+        more_separator = self._get_more_header(header_result)
+        index = -1
+        if isinstance(more_separator, basestring) and \
+                len(more_separator) != 0:
+            separator = more_separator.encode(encoding)
+            index = ('\n' + payload_data + '\n').find(
+                '\n' + separator + '\n')
+        if index == -1:
+            payload_result = payload_data.decode(encoding, 'replace')
+            if _UNICODE_LINE_BREAK_PATTERN.search(payload_result):
+                return None
+            return header_result, None, payload_result
+        # Payload is separated by the line at index.
+        abstract = payload_data[:max(index - 1, 0)].decode(encoding, 'replace')
+        rest = payload_data[index + len(separator) + 1:].decode(
+            encoding, 'replace')
+        if _UNICODE_LINE_BREAK_PATTERN.search(abstract) or \
+                _UNICODE_LINE_BREAK_PATTERN.search(rest):
+            return None
+        if index == 0:
+            full = rest
+        elif index + len(separator) >= len(payload_data):
+            full = abstract
+        else:
+            full = abstract + u'\n' + rest
+        return header_result, abstract, full
+
+    def _read_lines(self, stream, read_payload, base, parsed_header=None):
+        """Reads a headered file line by line, restarting from the beginning
+        of the stream when header specifies another encoding.
+
+        :param stream: a stream to read.
+        :type stream: stream
+        :param read_payload: True if payload of the file should be read; False
+            if only header should be read.
+        :type read_payload: bool
+        :param base: if provided, a copy of *base* will be returned with
+            key/value updated with data read from file header.
+        :type base: dict or None
+        :param parsed_header: the header parsed before, or None.
+        :type parsed_header: dict or None
+        :return: the same tuple as :func:`read`.
+        :rtype: tuple
+        """
         encoding = self._default_encoding
         encoding_determined = False
         file_loaded = False
@@ -185,6 +387,12 @@ class HeaderedContentReader(object):
                 line = reader.readline()
                 if not line:
                     # All content has been read
+                    if not reading_payload and not encoding_determined:
+                        encoding_determined = True
+                        specified = self._get_encoding(header, True)
+                        if specified is not None and specified != encoding:
+                            encoding = specified
+                            break
                     file_loaded = True
                     break
                 line = line.strip('\r\n')
@@ -192,6 +400,12 @@ class HeaderedContentReader(object):
                 # Check for separator of header and payload
                 if not reading_payload and len(line) == 0:
                     # Found separator of header and payload
+                    if not encoding_determined:
+                        encoding_determined = True
+                        specified = self._get_encoding(header, True)
+                        if specified is not None and specified != encoding:
+                            encoding = specified
+                            break
                     if not read_payload:
                         file_loaded = True
                         break
@@ -213,7 +427,10 @@ class HeaderedContentReader(object):
                                 # encoding
                                 encoding = specified
                                 break
-        header_result = self._parse_header(header, base)
+        if parsed_header is None:
+            header_result = self._parse_header(header, base)
+        else:
+            header_result = parsed_header
         if not read_payload:
             return header_result, None, None
         more_separator = self._get_more_header(header_result)
@@ -238,19 +455,42 @@ class YamlHeaderedContentReader(HeaderedContentReader):
 
     def __init__(self, encoding=DEFAULT_ENCODING):
         super(YamlHeaderedContentReader, self).__init__(encoding)
-        self._yaml_parser = YamlConfigParser()
+        self._parser = self._create_parser()
+
+    def _create_parser(self):
+        """Create the parser of header.
+
+        :rtype: ConfigParser
+        """
+        return YamlConfigParser()
 
-    def _get_encoding(self, header):
+    def _get_encoding(self, header, complete=False):
         """Override to extract the encoding of YAML format header.
 
+        While reading the header, only the newest line is matched against a
+        top-level ``encoding`` key. After the entire header is read, it is
+        parsed only if ``encoding`` appears in the header at all.
+
         :param header: a list contains header lines.
         :type header: list
+        :param complete: True if all lines of the header have been read.
+        :type complete: bool
         :return: a string representing encoding judged from header lines; None
             if encoding cannot be determined.
         :rtype: str
         """
-        parsed = self._yaml_parser.parse('\n'.join(header))
-        if parsed is not None and 'encoding' in parsed:
+        if not complete:
+            if len(header) == 0:
+                return None
+            m = _YAML_ENCODING_PATTERN.match(header[-1])
+            if m:
+                return m.group(3)
+            return None
+        content = '\n'.join(header)
+        if 'encoding' not in content:
+            return None
+        parsed = self._parser.parse(content)
+        if isinstance(parsed, dict) and 'encoding' in parsed:
             return parsed['encoding']
 
     def _parse_header(self, header, base=None):
@@ -265,7 +505,7 @@ class YamlHeaderedContentReader(HeaderedContentReader):
         :return: a new dict based on base dict and header value.
         :rtype: dict
         """
-        parsed = self._yaml_parser.parse('\n'.join(header))
+        parsed = self._parser.parse('\n'.join(header))
         result = {} if base is None else base.copy()
         result.update(parsed if parsed is not None else {})
         return result
@@ -283,11 +523,75 @@ class YamlHeaderedContentReader(HeaderedContentReader):
             return header['more_separator']
         return _DEFAULT_MORE_SEPARATOR
 
+
+class KeyValueHeaderedContentReader(YamlHeaderedContentReader):
+    """Reader for headered file with header of key/value format, which is a
+    restricted subset of YAML but faster to parse.
+
+    :param encoding: default encoding when read the stream for the first time.
+    :type encoding: str
+    """
+
+    def _create_parser(self):
+        """Override to create the parser of key/value header.
+
+        :rtype: ConfigParser
+        """
+        return KeyValueConfigParser()
+
+
+class JsonHeaderedContentReader(YamlHeaderedContentReader):
+    """Reader for headered file with header of JSON format. Encoding and MORE
+    separator are specified in the header with the same keys as YAML header.
+
+    :param encoding: default encoding when read the stream for the first time.
+    :type encoding: str
+    """
+
+    def _create_parser(self):
+        """Override to create the parser of JSON header.
+
+        :rtype: ConfigParser
+        """
+        return JsonConfigParser()
+
+    def _get_encoding(self, header, complete=False):
+        """Override to extract the encoding of JSON format header.
+
+        While reading the header, only the newest line is searched for an
+        ``encoding`` member. After the entire header is read, it is parsed only
+        if ``encoding`` appears in the header at all.
+
+        :param header: a list contains header lines.
+        :type header: list
+        :param complete: True if all lines of the header have been read.
+        :type complete: bool
+        :return: a string representing encoding judged from header lines; None
+            if encoding cannot be determined.
+        :rtype: str
+        """
+        if not complete:
+            if len(header) == 0:
+                return None
+            m = _JSON_ENCODING_PATTERN.search(header[-1])
+            if m:
+                return m.group(1)
+            return None
+        return super(JsonHeaderedContentReader, self)._get_encoding(header,
+                                                                    True)
+
+
 _READER_EXTENSIONS = {
     '.yml': 'yaml',
-    '.yaml': 'yaml'
+    '.yaml': 'yaml',
+    '.kv': 'kv',
+    '.json': 'json'
 }
 
 _CONFIG_READERS = {
-    'yaml': YamlHeaderedContentReader.__name__
+    'yaml': YamlHeaderedContentReader.__name__,
+    'kv': KeyValueHeaderedContentReader.__name__,
+    'json': JsonHeaderedContentReader.__name__
 }
+
+SUPPORTED_READER_EXTENSIONS = _READER_EXTENSIONS.keys()
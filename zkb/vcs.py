@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+zkb.vcs
+~~~~~~~
+
+Querying the git repository where article sources are stored.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import subprocess
+
+from zkb.log import logger
+
+
+def _run_git(dirname, *args):
+    """Run a git command and get its output.
+
+    :param dirname: directory where the command runs.
+    :type dirname: str
+    :param args: arguments of the command.
+    :return: output of the command, or None if git is not available or the
+        command failed.
+    :rtype: str
+    """
+    try:
+        process = subprocess.Popen(('git',) + args, cwd=dirname,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        output, error = process.communicate()
+    except OSError as e:
+        logger.debug('Failed to run git: %s' % e)
+        return None
+    if process.returncode != 0:
+        logger.debug('Command \'git %s\' failed: %s' %
+                     (' '.join(args), error.strip()))
+        return None
+    return output
+
+
+def get_head_commit(dirname):
+    """Get the commit checked out in the repository containing a directory.
+
+    :param dirname: the directory.
+    :type dirname: str
+    :return: hash of the commit, or None if the directory is not in a git
+        repository or there is no commit yet.
+    :rtype: str
+    """
+    output = _run_git(dirname, 'rev-parse', '--verify', '-q', 'HEAD')
+    if output is None:
+        return None
+    return output.strip()
+
+
+def get_changed_files(dirname, commit):
+    """Get files in a directory whose content in working tree differs from a
+    commit, including files not tracked and not ignored by git.
+
+    :param dirname: the directory.
+    :type dirname: str
+    :param commit: hash of the commit.
+    :type commit: str
+    :return: paths of changed files relative to the directory and separated by
+        ``/``, or None if the changes are unknown.
+    :rtype: list of str
+    """
+    changed = _run_git(dirname, 'diff', '--name-only', '--relative',
+                       '--no-renames', '-z', commit, '--')
+    if changed is None:
+        return None
+    untracked = _run_git(dirname, 'ls-files', '--others',
+                         '--exclude-standard', '-z')
+    if untracked is None:
+        return None
+    return filter(None, changed.split('\0') + untracked.split('\0'))
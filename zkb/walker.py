@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+zkb.walker
+~~~~~~~~~~
+
+Walking a directory tree for source files, skipping ignored directories
+without entering them.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import os
+import re
+import stat
+import fnmatch
+
+try:
+    from scandir import scandir
+except ImportError:
+    scandir = None
+
+
+class _DirEntry(object):
+    """Entry of a directory, used in place of entries returned by
+    :func:`scandir.scandir` when the module is not available.
+
+    :param root: the directory.
+    :type root: str
+    :param name: name of the entry.
+    :type name: str
+    """
+
+    def __init__(self, root, name):
+        super(_DirEntry, self).__init__()
+        self.name = name
+        self.path = os.path.join(root, name)
+        self._lstat = os.lstat(self.path)
+        self._stat = None
+
+    def is_dir(self, follow_symlinks=True):
+        if follow_symlinks:
+            try:
+                return stat.S_ISDIR(self.stat().st_mode)
+            except OSError:
+                return False
+        return stat.S_ISDIR(self._lstat.st_mode)
+
+    def is_file(self, follow_symlinks=True):
+        if follow_symlinks:
+            try:
+                return stat.S_ISREG(self.stat().st_mode)
+            except OSError:
+                return False
+        return stat.S_ISREG(self._lstat.st_mode)
+
+    def stat(self, follow_symlinks=True):
+        if not follow_symlinks or not stat.S_ISLNK(self._lstat.st_mode):
+            return self._lstat
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+def _scandir(path):
+    """List entries of a directory.
+
+    :param path: the directory.
+    :type path: str
+    :rtype: iterable
+    """
+    if scandir is not None:
+        return scandir(path)
+    return [_DirEntry(path, name) for name in os.listdir(path)]
+
+
+def compile_patterns(patterns):
+    """Compile glob patterns into a single regular expression.
+
+    :param patterns: glob patterns.
+    :type patterns: list of str
+    :return: the regular expression, or None if there is no pattern.
+    """
+    if not patterns:
+        return None
+    return re.compile('|'.join('(?:%s)' % fnmatch.translate(
+        os.path.normcase(pattern)) for pattern in patterns))
+
+
+def get_real_paths(paths):
+    """Get normalized real paths of several paths.
+
+    :param paths: the paths, or None.
+    :type paths: list of str
+    :rtype: set of str
+    """
+    return set(os.path.normcase(os.path.realpath(path))
+               for path in paths or [])
+
+
+def walk_files(dirname, ignored_dirs=None, ignored_patterns=None,
+               extensions=None):
+    """Walk a directory tree top-down for regular files.
+
+    Ignored directories and subtrees matching ignored patterns are pruned
+    before they are entered. Symbolic links to directories are not followed,
+    the same as :func:`os.walk` does.
+
+    :param dirname: root of the tree.
+    :type dirname: str
+    :param ignored_dirs: directories whose subtrees are ignored.
+    :type ignored_dirs: list of str
+    :param ignored_patterns: glob patterns; files and directories whose names
+        match any of them are ignored.
+    :type ignored_patterns: list of str
+    :param extensions: lowercase extensions of files to be yielded, or None to
+        yield all files.
+    :type extensions: collection of str
+    :return: an iterator of tuples of path and stat result of each file.
+    :rtype: iterator
+    """
+    ignored = get_real_paths(ignored_dirs)
+    pattern = compile_patterns(ignored_patterns)
+    # Real path of subdirectories are joined from that of their parents, as
+    # symbolic links are not followed.
+    pending = [(dirname, os.path.realpath(dirname))]
+    while len(pending) > 0:
+        root, real_root = pending.pop()
+        if os.path.normcase(real_root) in ignored:
+            continue
+        try:
+            entries = _scandir(root)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            if pattern is not None and pattern.match(os.path.normcase(name)):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append((entry.path,
+                                    os.path.join(real_root, name)))
+                    continue
+                if extensions is not None and \
+                        os.path.splitext(name)[1].lower() not in extensions:
+                    continue
+                if entry.is_file():
+                    yield entry.path, entry.stat()
+            except OSError:
+                # The entry has been removed or is a broken link.
+                continue
+        pending.extend(reversed(subdirs))
+
+
+def filter_files(dirname, paths, ignored_dirs=None, ignored_patterns=None,
+                 extensions=None):
+    """Filter files in a directory tree the same way as :func:`walk_files`
+    does, without walking the tree.
+
+    :param dirname: root of the tree.
+    :type dirname: str
+    :param paths: paths of files relative to the root and separated by ``/``.
+    :type paths: iterable of str
+    :param ignored_dirs: directories whose subtrees are ignored.
+    :type ignored_dirs: list of str
+    :param ignored_patterns: glob patterns; files and directories whose names
+        match any of them are ignored.
+    :type ignored_patterns: list of str
+    :param extensions: lowercase extensions of files to be yielded, or None to
+        yield all files.
+    :type extensions: collection of str
+    :return: an iterator of tuples of path and stat result of each existing
+        file which is not ignored.
+    :rtype: iterator
+    """
+    ignored = get_real_paths(ignored_dirs)
+    pattern = compile_patterns(ignored_patterns)
+    real_dirname = os.path.realpath(dirname)
+    for path in paths:
+        parts = path.split('/')
+        if extensions is not None and \
+                os.path.splitext(parts[-1])[1].lower() not in extensions:
+            continue
+        if pattern is not None and any(pattern.match(os.path.normcase(part))
+                                       for part in parts):
+            continue
+        real_path = real_dirname
+        for part in parts[:-1]:
+            real_path = os.path.join(real_path, part)
+            if os.path.normcase(real_path) in ignored:
+                break
+        else:
+            full_path = os.path.join(dirname, *parts)
+            try:
+                st = os.stat(full_path)
+            except OSError:
+                # The file has been removed.
+                continue
+            if stat.S_ISREG(st.st_mode):
+                yield full_path, st
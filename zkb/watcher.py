@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+zkb.watcher
+~~~~~~~~~~~
+
+Watching directory trees for changed files, with inotify where available and
+by polling otherwise.
+
+:Copyright: Copyright 2014 Yang LIU <zesikliu@gmail.com>
+:License: BSD, see LICENSE for details.
+"""
+
+import os
+import time
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+from zkb.walker import walk_files, compile_patterns, get_real_paths
+from zkb.log import logger
+
+
+#: Seconds to wait for more changes after a change is noticed, as saving a
+# file usually makes several changes in a short time.
+_SETTLE_TIME = 0.2
+
+
+class Watcher(object):
+    """Base class of all watchers.
+
+    Changes of files in ignored directories, and of files and directories
+    whose names match any of ignored patterns, are not reported.
+
+    :param roots: directories to be watched.
+    :type roots: list of str
+    :param ignored_dirs: directories whose subtrees are not watched.
+    :type ignored_dirs: list of str
+    :param ignored_patterns: glob patterns of names of files and directories
+        not watched.
+    :type ignored_patterns: list of str
+    """
+
+    def __init__(self, roots, ignored_dirs=None, ignored_patterns=None):
+        super(Watcher, self).__init__()
+        real_roots = []
+        for root in sorted(get_real_paths(roots)):
+            # Skip directories inside others, which are already watched.
+            if not any(root.startswith(os.path.join(other, ''))
+                       for other in real_roots):
+                real_roots.append(root)
+        self.roots = real_roots
+        self.ignored_dirs = ignored_dirs
+        self.ignored_patterns = ignored_patterns
+
+    def wait(self, timeout=None):
+        """Wait until some files are changed.
+
+        :param timeout: maximum seconds to wait, or None to wait forever.
+        :type timeout: float
+        :return: real paths of changed files, which is empty if nothing is
+            changed before timeout.
+        :rtype: set of str
+        """
+        pass
+
+    def close(self):
+        """Stop watching.
+        """
+        pass
+
+
+class PollingWatcher(Watcher):
+    """Watcher comparing size and modification time of all files
+    periodically.
+
+    :param interval: seconds between two checks.
+    :type interval: float
+    """
+
+    def __init__(self, roots, ignored_dirs=None, ignored_patterns=None,
+                 interval=1.0):
+        super(PollingWatcher, self).__init__(roots, ignored_dirs,
+                                             ignored_patterns)
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+
+    def _take_snapshot(self):
+        """Get size and modification time of all watched files.
+
+        :return: a dictionary whose keys are paths of files and values are
+            tuples of their size and modification time.
+        :rtype: dict
+        """
+        snapshot = {}
+        for root in self.roots:
+            for path, st in walk_files(root, self.ignored_dirs,
+                                       self.ignored_patterns):
+                snapshot[path] = (st.st_size, st.st_mtime)
+        return snapshot
+
+    def _get_changes(self):
+        """Take a new snapshot, and get files changed since previous one.
+
+        :rtype: set of str
+        """
+        snapshot = self._take_snapshot()
+        changed = set(path for path, value in snapshot.iteritems()
+                      if self._snapshot.get(path) != value)
+        changed.update(path for path in self._snapshot
+                       if path not in snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    def wait(self, timeout=None):
+        if timeout is not None:
+            deadline = time.time() + timeout
+        changed = self._get_changes()
+        while len(changed) == 0:
+            if timeout is None:
+                time.sleep(self.interval)
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return changed
+                time.sleep(min(self.interval, remaining))
+            changed = self._get_changes()
+        while True:
+            time.sleep(_SETTLE_TIME)
+            more = self._get_changes()
+            if len(more) == 0:
+                return changed
+            changed.update(more)
+
+
+class InotifyWatcher(Watcher):
+    """Watcher receiving changes from inotify, which requires the `pyinotify`
+    package.
+    """
+
+    def __init__(self, roots, ignored_dirs=None, ignored_patterns=None):
+        super(InotifyWatcher, self).__init__(roots, ignored_dirs,
+                                             ignored_patterns)
+        self._ignored = get_real_paths(ignored_dirs)
+        self._pattern = compile_patterns(ignored_patterns)
+        self._changed = set()
+        mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_CREATE | \
+            pyinotify.IN_DELETE | pyinotify.IN_MODIFY | \
+            pyinotify.IN_MOVED_FROM | pyinotify.IN_MOVED_TO
+        self._manager = pyinotify.WatchManager()
+        self._notifier = pyinotify.Notifier(self._manager, self._on_event)
+        for root in self.roots:
+            self._manager.add_watch(root, mask, rec=True, auto_add=True,
+                                    exclude_filter=self._is_ignored)
+
+    def _is_ignored(self, path):
+        """Check whether a path is not watched.
+
+        :param path: real path of a file or directory.
+        :type path: str
+        :rtype: bool
+        """
+        path = os.path.normcase(path)
+        if self._pattern is not None \
+                and self._pattern.match(os.path.basename(path)):
+            return True
+        while True:
+            if path in self._ignored:
+                return True
+            parent = os.path.dirname(path)
+            if parent == path:
+                return False
+            path = parent
+
+    def _on_event(self, event):
+        """Record the file of an event.
+
+        :param event: the event.
+        :type event: pyinotify.Event
+        """
+        if not event.dir and not self._is_ignored(event.pathname):
+            self._changed.add(event.pathname)
+
+    def _read_events(self, timeout):
+        """Read and process events.
+
+        :param timeout: maximum seconds to wait, or None to wait forever.
+        :type timeout: float
+        """
+        if timeout is not None:
+            timeout = max(0, int(timeout * 1000))
+        if self._notifier.check_events(timeout):
+            self._notifier.read_events()
+            self._notifier.process_events()
+
+    def wait(self, timeout=None):
+        if timeout is not None:
+            deadline = time.time() + timeout
+        while len(self._changed) == 0:
+            if timeout is None:
+                self._read_events(None)
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._read_events(remaining)
+        if len(self._changed) == 0:
+            return set()
+        count = -1
+        while count != len(self._changed):
+            count = len(self._changed)
+            self._read_events(_SETTLE_TIME)
+        changed = self._changed
+        self._changed = set()
+        return changed
+
+    def close(self):
+        self._notifier.stop()
+
+
+def create_watcher(roots, ignored_dirs=None, ignored_patterns=None):
+    """Create a watcher with inotify if `pyinotify` is available, or a
+    watcher polling changes otherwise.
+
+    :param roots: directories to be watched.
+    :type roots: list of str
+    :param ignored_dirs: directories whose subtrees are not watched.
+    :type ignored_dirs: list of str
+    :param ignored_patterns: glob patterns of names of files and directories
+        not watched.
+    :type ignored_patterns: list of str
+    :rtype: Watcher
+    """
+    if pyinotify is not None:
+        try:
+            return InotifyWatcher(roots, ignored_dirs, ignored_patterns)
+        except (OSError, pyinotify.PyinotifyError) as e:
+            logger.warn('Failed to watch with inotify, polling instead: %s' %
+                        e)
+    return PollingWatcher(roots, ignored_dirs, ignored_patterns)